@@ -0,0 +1,102 @@
+"""
+Benchmark for sharded mode (src/sharding.py)
+
+    python benchmarks/bench_sharding.py --shards 1 2 4 8 --clients 32 --duration 10
+
+Runs the same booking workload against a single RestaurantDatabase and
+against ShardedDatabase with each shard count, every run on a fresh scratch
+copy of the catalog. Client threads book random restaurants, dates and
+times and cancel a quarter of their bookings. Reports operations per second
+and latency percentiles; with enough cores the sharded throughput grows
+with the number of shards.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from database import RestaurantDatabase  # noqa: E402
+from sharding import ShardedDatabase  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+TIMES = ["12:00", "13:00", "19:00", "19:30", "20:00", "21:00"]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_clients(db, clients, duration):
+    restaurant_ids = [r["id"] for r in db.get_all_restaurants()]
+    first_day = datetime.now() + timedelta(days=1)
+    latencies = [[] for _ in range(clients)]
+    deadline = time.perf_counter() + duration
+
+    def client(seconds):
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            date = (first_day + timedelta(days=rng.randint(0, 60))).strftime("%Y-%m-%d")
+            start = time.perf_counter()
+            result = db.create_reservation("Bench", "bench@example.com", rng.choice(restaurant_ids),
+                                           date, rng.choice(TIMES), rng.randint(1, 4))
+            if result["success"] and rng.random() < 0.25:
+                db.cancel_reservation(result["reservation"]["id"])
+            seconds.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(latencies[i],)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return [s for seconds in latencies for s in seconds], elapsed
+
+
+def report(label, seconds, elapsed):
+    print(f"{label:<20}{len(seconds):>9}{len(seconds) / elapsed:>11.0f}"
+          f"{statistics.mean(seconds) * 1e3:>11.2f}{percentile(seconds, 0.5) * 1e3:>10.2f}"
+          f"{percentile(seconds, 0.99) * 1e3:>10.2f}")
+
+
+def bench(label, make_db, clients, duration):
+    data_dir = tempfile.mkdtemp(prefix="shard-bench-")
+    try:
+        shutil.copy(os.path.join(DATA_DIR, "restaurants.csv"), data_dir)
+        db = make_db(data_dir)
+        try:
+            seconds, elapsed = run_clients(db, clients, duration)
+        finally:
+            if hasattr(db, "close"):
+                db.close()
+        report(label, seconds, elapsed)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark booking throughput with and without sharding")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent client threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, {args.duration:.0f}s per run, {os.cpu_count()} CPUs")
+    print(f"{'':<20}{'ops':>9}{'ops/s':>11}{'mean ms':>11}{'p50 ms':>10}{'p99 ms':>10}")
+    bench("single process", RestaurantDatabase, args.clients, args.duration)
+    for shards in args.shards:
+        bench(f"{shards} shard(s)", lambda data_dir: ShardedDatabase(data_dir, shards=shards),
+              args.clients, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Microbenchmark for the shared time model (src/timeutil.py)
+
+    python benchmarks/bench_time_parsing.py --number 200000
+
+Times one "is this restaurant open for this request" check three ways: the
+former strptime path (request date and time plus both opening hours parsed
+on every check), the fast parser with its cache cleared, and the cached
+parser against hours pre-parsed by the catalog. Also times a
+recommend_restaurants call, which runs the check once per restaurant.
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from catalog import Catalog  # noqa: E402
+from database import RestaurantDatabase  # noqa: E402
+from timeutil import is_open, parse_date, parse_time  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+
+def strptime_check(restaurant, date, time):
+    datetime.strptime(date, "%Y-%m-%d")
+    request_time = datetime.strptime(time, "%H:%M").time()
+    opening_time = datetime.strptime(restaurant["opening_time"], "%H:%M").time()
+    closing_time = datetime.strptime(restaurant["closing_time"], "%H:%M").time()
+    return opening_time <= request_time <= closing_time
+
+
+def uncached_check(restaurant, date, time):
+    parse_date.cache_clear()
+    parse_time.cache_clear()
+    parse_date(date)
+    return is_open(parse_time(restaurant["opening_time"]), parse_time(restaurant["closing_time"]), parse_time(time))
+
+
+def cached_check(hours, date, time):
+    parse_date(date)
+    return is_open(*hours, parse_time(time))
+
+
+def report(label, seconds, number, baseline=None):
+    per_call = seconds / number * 1e6
+    speedup = f"{baseline / seconds:>9.1f}x" if baseline else ""
+    print(f"{label:<28}{per_call:>10.3f}{speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark opening-hours checks before and after pre-parsing")
+    parser.add_argument("--number", type=int, default=200000, help="Checks per measurement")
+    args = parser.parse_args()
+
+    catalog = Catalog.load(os.path.join(DATA_DIR, "restaurants.csv"))
+    restaurant_id, restaurant = next(iter(catalog.by_id.items()))
+    hours = catalog.hours[restaurant_id]
+    date = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d")
+    time = "19:30"
+
+    print(f"{'per check':<28}{'µs':>10}{'speedup':>10}")
+    baseline = timeit.timeit(lambda: strptime_check(restaurant, date, time), number=args.number)
+    report("strptime every time", baseline, args.number)
+    seconds = timeit.timeit(lambda: uncached_check(restaurant, date, time), number=args.number)
+    report("fast parser, cold cache", seconds, args.number, baseline)
+    seconds = timeit.timeit(lambda: cached_check(hours, date, time), number=args.number)
+    report("cached, pre-parsed hours", seconds, args.number, baseline)
+
+    db = RestaurantDatabase()
+    calls = max(1, args.number // 1000)
+    seconds = timeit.timeit(lambda: db.recommend_restaurants(date=date, time=time, party_size=2), number=calls)
+    print(f"\nrecommend_restaurants over {len(catalog.by_id)} restaurants: {seconds / calls * 1e3:.2f} ms per call")
+
+
+if __name__ == "__main__":
+    main()
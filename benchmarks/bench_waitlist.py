@@ -0,0 +1,138 @@
+"""
+Benchmark for the waitlist engine (src/waitlist.py)
+
+    python benchmarks/bench_waitlist.py --parties 100000 --evenings 20
+
+Part 1 compares best-fit selection in SlotWaitlist with a linear scan of the
+same queue. Part 2 simulates busy evenings against a RestaurantDatabase on a
+scratch copy of the catalog: every evening slot is booked to capacity, a queue
+of parties waits for each slot, and random cancellations free seats. It
+reports how long each cancellation takes until the freed seats are rebooked,
+and the promotion time alone (from the cancellation event to the first
+promoted booking). Both include writing the reservations file.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from database import RestaurantDatabase  # noqa: E402
+from events import RESERVATION_CANCELLED  # noqa: E402
+from waitlist import SlotWaitlist, WAITLIST_PROMOTED  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+EVENING_TIMES = ["19:00", "19:30", "20:00", "20:30", "21:00"]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(label, seconds):
+    print(f"{label:<34}{len(seconds):>8}{statistics.mean(seconds) * 1e6:>12.1f}"
+          f"{percentile(seconds, 0.5) * 1e6:>11.1f}{percentile(seconds, 0.99) * 1e6:>11.1f}")
+
+
+def bench_selection(parties, lookups):
+    """Best-fit pops from one long queue: SlotWaitlist against a linear scan"""
+    entries = [{"id": str(i), "party_size": random.randint(1, 8)} for i in range(parties)]
+    slot = SlotWaitlist()
+    for entry in entries:
+        slot.add(entry)
+    queue = list(entries)
+
+    def linear_pop(free_seats):
+        best = None
+        for index, entry in enumerate(queue):
+            if entry["party_size"] <= free_seats and (best is None or entry["party_size"] > queue[best]["party_size"]):
+                best = index
+        return queue.pop(best) if best is not None else None
+
+    indexed, scanned = [], []
+    for _ in range(lookups):
+        free_seats = random.randint(1, 8)
+        start = time.perf_counter()
+        slot.pop_best(free_seats)
+        indexed.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        linear_pop(free_seats)
+        scanned.append(time.perf_counter() - start)
+
+    print(f"Selecting from a queue of {parties} parties")
+    print(f"{'':<34}{'ops':>8}{'mean us':>12}{'p50 us':>11}{'p99 us':>11}")
+    report("SlotWaitlist.pop_best", indexed)
+    report("linear scan", scanned)
+
+
+def bench_evenings(evenings, restaurants, waiting_per_slot, cancellations):
+    """Heavy-churn evenings: full slots, long queues, random cancellations"""
+    data_dir = tempfile.mkdtemp(prefix="waitlist-bench-")
+    try:
+        shutil.copy(os.path.join(DATA_DIR, "restaurants.csv"), data_dir)
+        db = RestaurantDatabase(data_dir)
+        promoted = []
+        cancelled_at = []
+        db.events.subscribe(WAITLIST_PROMOTED, lambda event: promoted.append(event))
+        db.events.subscribe(RESERVATION_CANCELLED, lambda event: cancelled_at.append(event["timestamp"]))
+        # Future dates, so every slot can be booked
+        first_day = datetime.now() + timedelta(days=1)
+        restaurant_ids = [r["id"] for r in db.get_all_restaurants()][:restaurants]
+
+        for day in range(evenings):
+            date = (first_day + timedelta(days=day)).strftime("%Y-%m-%d")
+            for restaurant_id in restaurant_ids:
+                for time_ in EVENING_TIMES:
+                    while db.create_reservation("Guest", "guest@example.com", restaurant_id, date, time_,
+                                                random.randint(2, 6))["success"]:
+                        pass
+                    for _ in range(waiting_per_slot):
+                        db.join_waitlist("Waiting", "waiting@example.com", restaurant_id, date, time_,
+                                         random.randint(1, 6))
+
+        print(f"\n{len(db.reservations)} reservations and {len(db.waitlist)} waiting parties "
+              f"over {evenings} evenings at {len(restaurant_ids)} restaurants")
+        latencies = []
+        promotions = []
+        for _ in range(cancellations):
+            reservation = random.choice(db.reservations)
+            before = len(promoted)
+            start = time.perf_counter()
+            db.cancel_reservation(reservation["id"])
+            if len(promoted) > before:
+                latencies.append(time.perf_counter() - start)
+                promotions.append(promoted[before]["timestamp"] - cancelled_at[-1])
+        print(f"{cancellations} cancellations refilled {len(promoted)} parties from the waitlist")
+        if latencies:
+            print(f"{'':<34}{'ops':>8}{'mean us':>12}{'p50 us':>11}{'p99 us':>11}")
+            report("cancel until seats are rebooked", latencies)
+            report("freed seats to first promotion", promotions)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the FoodieSpot waitlist engine")
+    parser.add_argument("--parties", type=int, default=100000, help="Queue length for the selection benchmark")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--evenings", type=int, default=5)
+    parser.add_argument("--restaurants", type=int, default=10)
+    parser.add_argument("--waiting", type=int, default=20, help="Waiting parties per slot")
+    parser.add_argument("--cancellations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    bench_selection(args.parties, args.lookups)
+    bench_evenings(args.evenings, args.restaurants, args.waiting, args.cancellations)
+
+
+if __name__ == "__main__":
+    main()
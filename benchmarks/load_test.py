@@ -0,0 +1,172 @@
+"""
+Load test for the reservation API server (src/api_server.py)
+
+Start a local instance against a scratch copy of the data, then run:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:8080 --concurrency 50 --duration 30
+
+Each virtual user keeps one keep-alive connection and loops over a weighted
+mix of operations. Throughput and latency percentiles are reported per
+operation. Chat is excluded by default because it calls the real LLM.
+Cancelling needs a customer token for loadtest@example.com:
+
+    python src/api_server.py --issue-token loadtest@example.com
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import aiohttp
+
+LOCATIONS = ["Hauz Khas", "Connaught Place", "Malviya Nagar", "Chandni Chowk", "Marine Drive"]
+CUISINES = ["North Indian", "Punjabi", "South Indian", "Mughlai", "Bengali"]
+TIMES = ["12:00", "13:00", "19:00", "19:30", "20:00", "21:00"]
+
+
+def random_slot():
+    date = (datetime.now() + timedelta(days=random.randint(1, 30))).strftime("%Y-%m-%d")
+    return date, random.choice(TIMES), random.randint(1, 6)
+
+
+async def op_search(session, base_url):
+    params = {"location": random.choice(LOCATIONS)} if random.random() < 0.5 else {"cuisine": random.choice(CUISINES)}
+    async with session.get(f"{base_url}/restaurants", params=params) as response:
+        await response.read()
+        return response.status
+
+
+async def op_availability(session, base_url):
+    date, time_, party_size = random_slot()
+    params = {"date": date, "time": time_, "party_size": party_size}
+    async with session.get(f"{base_url}/restaurants/{random.randint(1, 30)}/availability", params=params) as response:
+        await response.read()
+        return response.status
+
+
+async def op_recommend(session, base_url):
+    date, time_, party_size = random_slot()
+    body = {"location": random.choice(LOCATIONS), "date": date, "time": time_, "party_size": party_size}
+    async with session.post(f"{base_url}/recommendations", json=body) as response:
+        await response.read()
+        return response.status
+
+
+async def op_book_and_cancel(session, base_url):
+    date, time_, party_size = random_slot()
+    body = {
+        "customer_name": "Load Test",
+        "customer_email": "loadtest@example.com",
+        "restaurant_id": random.randint(1, 30),
+        "date": date,
+        "time": time_,
+        "party_size": party_size,
+    }
+    async with session.post(f"{base_url}/reservations", json=body) as response:
+        result = await response.json()
+        if response.status != 201:
+            return response.status
+    reservation_id = result["reservation"]["id"]
+    async with session.delete(f"{base_url}/reservations/{reservation_id}") as response:
+        await response.read()
+        return response.status
+
+
+async def op_batch(session, base_url):
+    requests = []
+    for _ in range(5):
+        date, time_, party_size = random_slot()
+        requests.append({"op": "check_availability", "args": {
+            "restaurant_id": random.randint(1, 30), "date": date, "time": time_, "party_size": party_size
+        }})
+    async with session.post(f"{base_url}/batch", json={"requests": requests}) as response:
+        await response.read()
+        return response.status
+
+
+async def op_chat(session, base_url):
+    body = {"message": f"Show me {random.choice(CUISINES)} restaurants in {random.choice(LOCATIONS)}"}
+    async with session.post(f"{base_url}/chat", json=body) as response:
+        await response.read()
+        return response.status
+
+
+OPERATIONS = {
+    "search": op_search,
+    "availability": op_availability,
+    "recommend": op_recommend,
+    "book_and_cancel": op_book_and_cancel,
+    "batch": op_batch,
+    "chat": op_chat,
+}
+
+
+async def virtual_user(base_url, mix, deadline, latencies, statuses, token=None):
+    names, weights = zip(*mix.items())
+    # One connection per user, reused for every request (HTTP keep-alive)
+    connector = aiohttp.TCPConnector(limit=1, force_close=False)
+    headers = {"Authorization": f"Bearer {token}"} if token else None
+    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+        while time.monotonic() < deadline:
+            name = random.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = await OPERATIONS[name](session, base_url)
+            except aiohttp.ClientError as e:
+                status = type(e).__name__
+            latencies[name].append(time.perf_counter() - start)
+            statuses[name][status] += 1
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(args):
+    mix = json.loads(args.mix)
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Unknown operations in mix: {sorted(unknown)}")
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    deadline = time.monotonic() + args.duration
+    started = time.monotonic()
+    await asyncio.gather(*(
+        virtual_user(args.url.rstrip("/"), mix, deadline, latencies, statuses, args.token)
+        for _ in range(args.concurrency)
+    ))
+    elapsed = time.monotonic() - started
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{total} requests in {elapsed:.1f}s with {args.concurrency} users: {total / elapsed:.1f} req/s")
+    print(f"{'operation':<16}{'count':>8}{'req/s':>9}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for name, values in sorted(latencies.items()):
+        print(f"{name:<16}{len(values):>8}{len(values) / elapsed:>9.1f}"
+              f"{statistics.mean(values) * 1000:>10.1f}{percentile(values, 0.5) * 1000:>9.1f}"
+              f"{percentile(values, 0.95) * 1000:>9.1f}{percentile(values, 0.99) * 1000:>9.1f}"
+              f"  {dict(statuses[name])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the FoodieSpot reservation API")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=20, help="Number of virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test duration in seconds")
+    parser.add_argument("--mix", default='{"search": 40, "availability": 30, "recommend": 10, '
+                                         '"book_and_cancel": 10, "batch": 10}',
+                        help="JSON map of operation weights (add \"chat\" to include the LLM)")
+    parser.add_argument("--token", default=os.environ.get("LOAD_TEST_TOKEN"),
+                        help="Customer token for loadtest@example.com, needed to cancel bookings")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import threading
+from datetime import date as Date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from catalog import CATALOG_RELOADED
+from events import RESERVATION_CANCELLED, RESERVATION_MODIFIED
+from timeutil import format_time, is_open, parse_date, parse_time
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+# Days added whenever a reservation falls outside the allocated range
+DAY_CHUNK = 366
+WEEKDAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def slot_label(slot: int) -> str:
+    return format_time(slot * SLOT_MINUTES)
+
+
+class OccupancyCube:
+    """
+    Booked seats per restaurant, day and time slot, kept in NumPy arrays
+
+    `seats[r, d, s]` and `parties[r, d, s]` hold the booked seats and the
+    number of reservations of restaurant row `r` on day `origin + d` in the
+    `SLOT_MINUTES` slot `s`. The cube is built once from the ledger and then
+    follows the database's reservation events, so queries never rescan
+    reservations; they slice and reduce the arrays instead.
+    """
+
+    def __init__(self, db):
+        """
+        Args:
+            db: RestaurantDatabase to follow
+        """
+        self.db = db
+        # Bumped on every change, for callers caching derived results
+        self.version = 0
+        self._lock = threading.RLock()
+        self._rows = {}
+        self.restaurant_ids = []
+        self.names = []
+        self.capacity = np.zeros(0)
+        self.open_slots = np.zeros((0, SLOTS_PER_DAY), dtype=bool)
+        self.origin = None
+        self.seats = np.zeros((0, 0, SLOTS_PER_DAY), dtype=np.int32)
+        self.parties = np.zeros((0, 0, SLOTS_PER_DAY), dtype=np.int32)
+
+        self._sync_catalog(db.catalog)
+        reservations, self._unsubscribe = db.follow_reservations(self._on_reservation_event)
+        for reservation in reservations:
+            self._apply(reservation, 1)
+        db.events.subscribe(CATALOG_RELOADED, lambda event: self._sync_catalog(self.db.catalog))
+
+    def close(self):
+        self._unsubscribe()
+
+    def _sync_catalog(self, catalog):
+        """Add rows for new restaurants and refresh capacities and opening hours"""
+        with self._lock:
+            new_ids = [rid for rid in catalog.by_id if rid not in self._rows]
+            if new_ids:
+                for rid in new_ids:
+                    self._rows[rid] = len(self.restaurant_ids)
+                    self.restaurant_ids.append(rid)
+                    self.names.append("")
+                grow = ((0, len(new_ids)), (0, 0), (0, 0))
+                self.seats = np.pad(self.seats, grow)
+                self.parties = np.pad(self.parties, grow)
+                self.capacity = np.pad(self.capacity, (0, len(new_ids)))
+                self.open_slots = np.pad(self.open_slots, ((0, len(new_ids)), (0, 0)))
+
+            slot_starts = np.arange(SLOTS_PER_DAY) * SLOT_MINUTES
+            for rid, restaurant in catalog.by_id.items():
+                row = self._rows[rid]
+                self.names[row] = restaurant["name"]
+                self.capacity[row] = restaurant["capacity"]
+                if rid in catalog.hours:
+                    self.open_slots[row] = is_open(*catalog.hours[rid], slot_starts)
+            self.version += 1
+
+    def _day_index(self, ordinal: int) -> int:
+        """Index of a day, growing the day axis in either direction when needed"""
+        if self.origin is None:
+            self.origin = ordinal - DAY_CHUNK // 2
+        days = self.seats.shape[1]
+        if ordinal < self.origin:
+            extra = -(-(self.origin - ordinal) // DAY_CHUNK) * DAY_CHUNK
+            self.seats = np.pad(self.seats, ((0, 0), (extra, 0), (0, 0)))
+            self.parties = np.pad(self.parties, ((0, 0), (extra, 0), (0, 0)))
+            self.origin -= extra
+        elif ordinal >= self.origin + days:
+            extra = -(-(ordinal - self.origin - days + 1) // DAY_CHUNK) * DAY_CHUNK
+            self.seats = np.pad(self.seats, ((0, 0), (0, extra), (0, 0)))
+            self.parties = np.pad(self.parties, ((0, 0), (0, extra), (0, 0)))
+        return ordinal - self.origin
+
+    def _apply(self, reservation: Dict[str, Any], sign: int):
+        try:
+            row = self._rows[int(reservation["restaurant_id"])]
+            ordinal = parse_date(reservation["date"]).toordinal()
+            slot = parse_time(reservation["time"]) // SLOT_MINUTES
+            party_size = int(reservation["party_size"])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._lock:
+            day = self._day_index(ordinal)
+            self.seats[row, day, slot] += sign * party_size
+            self.parties[row, day, slot] += sign
+            self.version += 1
+
+    def _on_reservation_event(self, event):
+        payload = event["payload"]
+        if event["topic"] == RESERVATION_MODIFIED:
+            self._apply(payload["previous"], -1)
+            self._apply(payload["reservation"], 1)
+        else:
+            self._apply(payload["reservation"], -1 if event["topic"] == RESERVATION_CANCELLED else 1)
+
+    def _window(self, start: Date, end: Date):
+        """Seats and parties for days start..end inclusive (zeros outside the recorded range)"""
+        days = (end - start).days + 1
+        seats = np.zeros((len(self.restaurant_ids), days, SLOTS_PER_DAY), dtype=np.int32)
+        parties = np.zeros_like(seats)
+        if self.origin is not None:
+            first = max(start.toordinal() - self.origin, 0)
+            last = min(end.toordinal() - self.origin + 1, self.seats.shape[1])
+            if first < last:
+                offset = first - (start.toordinal() - self.origin)
+                seats[:, offset:offset + last - first] = self.seats[:, first:last]
+                parties[:, offset:offset + last - first] = self.parties[:, first:last]
+        return seats, parties
+
+    def utilization(self, start: Date, end: Date) -> np.ndarray:
+        """
+        Booked share of capacity for every restaurant, day and slot in a date range
+
+        Returns:
+            np.ndarray: (restaurants, days, slots) array in `restaurant_ids` order,
+            NaN where the restaurant is closed
+        """
+        with self._lock:
+            seats, _ = self._window(start, end)
+            capacity = np.where(self.capacity > 0, self.capacity, np.nan)
+            utilization = seats / capacity[:, None, None]
+            return np.where(self.open_slots[:, None, :], utilization, np.nan)
+
+    def day_occupancy(self, restaurant_id: int, day: Date) -> Optional[Dict[str, Any]]:
+        """Per-slot bookings of one restaurant on one day"""
+        with self._lock:
+            row = self._rows.get(int(restaurant_id))
+            if row is None:
+                return None
+            seats, parties = self._window(day, day)
+            capacity = self.capacity[row]
+            open_slots = np.flatnonzero(self.open_slots[row])
+            slot_seats = seats[row, 0, open_slots]
+            return {
+                "restaurant_id": int(restaurant_id),
+                "name": self.names[row],
+                "date": day.isoformat(),
+                "capacity": int(capacity),
+                "booked_seats_peak": int(slot_seats.max(initial=0)),
+                "utilization_peak": float(slot_seats.max(initial=0) / capacity) if capacity else 0.0,
+                "slots": [
+                    {
+                        "time": slot_label(slot),
+                        "booked_seats": int(seats[row, 0, slot]),
+                        "reservations": int(parties[row, 0, slot]),
+                        "utilization": float(seats[row, 0, slot] / capacity) if capacity else 0.0,
+                    }
+                    for slot in open_slots
+                ],
+            }
+
+    def summary(self, start: Date, end: Date) -> List[Dict[str, Any]]:
+        """Utilization statistics for every restaurant over a date range"""
+        with self._lock:
+            seats, parties = self._window(start, end)
+            utilization = self.utilization(start, end)
+            weekdays = (np.arange(seats.shape[1]) + start.weekday()) % 7
+            names = list(self.names)
+            ids = list(self.restaurant_ids)
+        open_count = (~np.isnan(utilization)).sum(axis=(1, 2))
+        mean = np.nansum(utilization, axis=(1, 2)) / np.maximum(open_count, 1)
+        peak = np.nan_to_num(utilization, nan=0.0).max(axis=(1, 2))
+        by_slot = seats.sum(axis=1)
+        by_weekday = np.zeros((len(ids), 7))
+        np.add.at(by_weekday, (slice(None), weekdays), seats.sum(axis=2))
+        covers = seats.sum(axis=(1, 2))
+        summary = []
+        for row, rid in enumerate(ids):
+            summary.append({
+                "restaurant_id": rid,
+                "name": names[row],
+                "reservations": int(parties[row].sum()),
+                "covers": int(covers[row]),
+                "mean_utilization": float(mean[row]),
+                "peak_utilization": float(peak[row]),
+                "busiest_slot": slot_label(int(by_slot[row].argmax())) if covers[row] else None,
+                "busiest_weekday": WEEKDAY_NAMES[int(by_weekday[row].argmax())] if covers[row] else None,
+            })
+        return summary
+
+    def weekday_heatmap(self, start: Date, end: Date, restaurant_id: Optional[int] = None) -> np.ndarray:
+        """
+        Mean utilization by weekday and slot
+
+        Args:
+            restaurant_id: Restaurant to chart (all restaurants, weighted by capacity, if None)
+
+        Returns:
+            np.ndarray: (7, slots) array, NaN where nothing is open
+        """
+        with self._lock:
+            seats, _ = self._window(start, end)
+            rows = [self._rows[int(restaurant_id)]] if restaurant_id is not None else slice(None)
+            seats = seats[rows].astype(float)
+            open_slots = self.open_slots[rows]
+            capacity = self.capacity[rows]
+        weekdays = (np.arange(seats.shape[1]) + start.weekday()) % 7
+        day_counts = np.bincount(weekdays, minlength=7)
+        booked = np.zeros((7, SLOTS_PER_DAY))
+        np.add.at(booked, weekdays, seats.sum(axis=0))
+        offered = (open_slots * capacity[:, None]).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            heatmap = booked / (day_counts[:, None] * offered[None, :])
+        return np.where(offered[None, :] > 0, heatmap, np.nan)
+
+    def forecast(self, restaurant_id: int, day: Date, weeks: int = 8, halflife: float = 2.0) -> Optional[Dict[str, Any]]:
+        """
+        Expected bookings per slot on a day from the same weekday in earlier weeks
+
+        Recent weeks weigh more (weights halve every `halflife` weeks). The
+        forecast never drops below what is already booked for that day.
+        """
+        with self._lock:
+            row = self._rows.get(int(restaurant_id))
+            if row is None:
+                return None
+            history, _ = self._window(day - timedelta(weeks=weeks), day)
+            booked = history[row, -1].astype(float)
+            capacity = self.capacity[row]
+            open_slots = np.flatnonzero(self.open_slots[row])
+        past = history[row, -1 - 7 * np.arange(1, weeks + 1)].astype(float)
+        weights = 0.5 ** (np.arange(weeks) / halflife)
+        expected = np.maximum(weights @ past / weights.sum(), booked)
+        return {
+            "restaurant_id": int(restaurant_id),
+            "date": day.isoformat(),
+            "capacity": int(capacity),
+            "expected_peak_utilization": float(expected[open_slots].max(initial=0) / capacity) if capacity else 0.0,
+            "slots": [
+                {
+                    "time": slot_label(slot),
+                    "booked_seats": int(booked[slot]),
+                    "expected_seats": round(float(expected[slot]), 1),
+                    "expected_utilization": float(expected[slot] / capacity) if capacity else 0.0,
+                }
+                for slot in open_slots
+            ],
+        }
+
+
+def render_heatmap(heatmap: np.ndarray, title: str = "Utilization by weekday and time"):
+    """
+    Draw a weekday by time-slot heatmap as returned by OccupancyCube.weekday_heatmap
+
+    Returns:
+        matplotlib.figure.Figure
+    """
+    columns = np.flatnonzero(~np.all(np.isnan(heatmap), axis=0))
+    if len(columns) == 0:
+        columns = np.arange(SLOTS_PER_DAY)
+    data = heatmap[:, columns[0]:columns[-1] + 1]
+    # Figure without pyplot: no global state, safe to use from Streamlit's script threads
+    figure = Figure(figsize=(max(6, data.shape[1] * 0.35), 3.2))
+    axes = figure.subplots()
+    image = axes.imshow(np.ma.masked_invalid(data), aspect="auto", cmap="YlOrRd", vmin=0, vmax=1)
+    axes.set_yticks(range(7), WEEKDAY_NAMES)
+    ticks = range(0, data.shape[1], 2)
+    axes.set_xticks(ticks, [slot_label(columns[0] + t) for t in ticks], rotation=90)
+    axes.set_title(title)
+    figure.colorbar(image, ax=axes, label="Share of seats booked")
+    figure.tight_layout()
+    return figure
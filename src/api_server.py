@@ -0,0 +1,360 @@
+"""
+Headless HTTP/JSON API in front of RestaurantDatabase and LLMAgent
+
+Run from the src directory:
+
+    python api_server.py --port 8080
+
+Endpoints:
+    GET    /healthz                                  Liveness check for load balancers
+    GET    /restaurants?location=&cuisine=...        Search restaurants
+    GET    /restaurants/{id}                         Restaurant details
+    GET    /restaurants/{id}/availability?date=&time=&party_size=
+    POST   /recommendations                          Recommend restaurants (JSON body)
+    POST   /reservations                             Create a reservation
+    GET    /reservations                             Reservations of the signed-in customer
+    GET    /reservations/{id}                        Reservation details (owner only)
+    PATCH  /reservations/{id}                        Modify a reservation (owner only)
+    DELETE /reservations/{id}                        Cancel a reservation (owner only)
+    POST   /waitlist                                 Join the waitlist of a fully booked time
+    DELETE /waitlist/{id}                            Leave the waitlist (owner only)
+    POST   /batch                                    Run several operations in one request
+    POST   /chat                                     Talk to the reservation assistant
+    GET    /chat/{session_id}                        Messages of a chat session
+
+Operations go through the same ToolRegistry as the agent, so arguments are
+validated and coerced identically. Reading or changing existing reservations
+and waitlist entries needs `Authorization: Bearer <token>` with a customer
+token (see auth.py) for the customer who made them.
+"""
+import argparse
+import asyncio
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from auth import auth_secret_from_env, customer_token, verify_customer_token
+from database import RestaurantDatabase
+from sharding import ShardedDatabase
+from events import connect_event_socket
+from llm_agent import LLMAgent, build_tool_registry
+from llm_client import LLMClientPool
+from metrics import METRICS
+from session_store import AgentSessions, SessionStore
+from tool_results import encode_tool_result
+
+MAX_BATCH_SIZE = 50
+# Operations on existing reservations and waitlist entries, allowed only for their customer
+OWNER_OPERATIONS = {
+    "get_reservation", "get_reservations_by_email", "modify_reservation", "cancel_reservation", "leave_waitlist",
+}
+
+
+def json_response(data, status=200):
+    return web.json_response(data, status=status, dumps=encode_tool_result)
+
+
+class ReservationAPI:
+    """Request handlers; blocking database and LLM calls run in a thread pool"""
+
+    def __init__(self, db, agent_factory=None, chat_workers=32, session_store=None, auth_secret=None):
+        self.db = db
+        # Signs customer tokens; without it every owner-only operation is refused
+        self.auth_secret = auth_secret
+        self.tools = build_tool_registry(db)
+        # Chat history is saved per turn, so sessions resume after a restart or on another worker
+        self.session_store = session_store or SessionStore.from_env(db.data_dir)
+        self.sessions = AgentSessions(
+            agent_factory or self._default_agent,
+            idle_seconds=float(os.environ.get("SESSION_IDLE_SECONDS", "1800"))
+        )
+        # Chat turns wait seconds on the LLM; keep them off the pool used by database calls
+        self._chat_executor = ThreadPoolExecutor(max_workers=chat_workers, thread_name_prefix="chat")
+        self._llm_pool = None
+
+    def _default_agent(self, session_id):
+        # All sessions share one client pool (called under the session map lock)
+        if self._llm_pool is None:
+            self._llm_pool = LLMClientPool.from_env()
+        return LLMAgent(db_instance=self.db, llm_pool=self._llm_pool,
+                        session_id=session_id, session_store=self.session_store)
+
+    def _caller(self, request):
+        """Email of the customer named by a valid `Authorization: Bearer <token>` header, or None"""
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            return None
+        return verify_customer_token(token, self.auth_secret)
+
+    def _check_owner(self, operation, args, caller):
+        """
+        Refuse operations on other customers' reservations and waitlist entries
+
+        Reads the database, so call it off the event loop. Listing
+        reservations is narrowed to the caller's own email.
+
+        Returns:
+            Tuple: (status, body) to answer with instead, or None if allowed
+        """
+        if operation not in OWNER_OPERATIONS:
+            return None
+        if caller is None:
+            return 401, {"error": "A customer token is required (Authorization: Bearer <token>)"}
+        if operation == "get_reservations_by_email":
+            if str(args.get("customer_email") or caller).strip().lower() != caller:
+                return 403, {"error": "Only the signed-in customer's reservations can be listed"}
+            args["customer_email"] = caller
+            return None
+        if operation == "leave_waitlist":
+            entry = self.db.get_waitlist_entry(str(args.get("waitlist_id")))
+            missing = {"success": False, "message": "Waitlist entry not found"}
+        else:
+            entry = self.db.get_reservation(str(args.get("reservation_id")))
+            missing = {"success": False, "message": "Reservation not found"}
+        # Another customer's entry is reported as missing, so IDs cannot be probed
+        if entry is None or str(entry.get("customer_email", "")).lower() != caller:
+            return 404, missing
+        return None
+
+    async def _call(self, operation, args, idempotency_key=None):
+        """Validate and run one registry operation off the event loop"""
+        loop = asyncio.get_running_loop()
+        with METRICS.timer("api_operation_seconds", op=operation):
+            return await loop.run_in_executor(None, self.tools.dispatch, operation, args, idempotency_key)
+
+    @staticmethod
+    def _status_for(result, success_status=200):
+        if "invalid_arguments" in result:
+            return 400
+        if "error" in result:
+            return 404 if result["error"].startswith("Unknown function") else 500
+        if result.get("success") is False:
+            return 404 if str(result.get("message")).endswith("not found") else 409
+        return success_status
+
+    async def _respond(self, operation, args, success_status=200, idempotency_key=None, caller=None):
+        if operation in OWNER_OPERATIONS:
+            loop = asyncio.get_running_loop()
+            denied = await loop.run_in_executor(None, self._check_owner, operation, args, caller)
+            if denied is not None:
+                return json_response(denied[1], status=denied[0])
+        result = await self._call(operation, args, idempotency_key)
+        return json_response(result, status=self._status_for(result, success_status))
+
+    @staticmethod
+    async def _json_body(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text='{"error": "Request body must be JSON"}',
+                                     content_type="application/json")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text='{"error": "Request body must be a JSON object"}',
+                                     content_type="application/json")
+        return body
+
+    async def healthz(self, request):
+        return json_response({"status": "ok", "restaurants": len(self.db.restaurants),
+                              "catalog_version": self.db.catalog_version,
+                              "ledger_version": self.db.ledger_version})
+
+    async def search_restaurants(self, request):
+        return await self._respond("search_restaurants", dict(request.query))
+
+    async def get_restaurant(self, request):
+        loop = asyncio.get_running_loop()
+        try:
+            restaurant_id = int(request.match_info["restaurant_id"])
+        except ValueError:
+            return json_response({"error": "Restaurant ID must be an integer"}, status=400)
+        restaurant = await loop.run_in_executor(None, self.db.get_restaurant_by_id, restaurant_id)
+        if restaurant is None:
+            return json_response({"error": "Restaurant not found"}, status=404)
+        return json_response({"restaurant": restaurant})
+
+    async def check_availability(self, request):
+        args = dict(request.query, restaurant_id=request.match_info["restaurant_id"])
+        result = await self._call("check_availability", args)
+        # "Not available" is a valid answer, not an error
+        status = 400 if "invalid_arguments" in result else (500 if "error" in result else 200)
+        return json_response(result, status=status)
+
+    async def recommend_restaurants(self, request):
+        return await self._respond("recommend_restaurants", await self._json_body(request))
+
+    async def create_reservation(self, request):
+        return await self._respond("create_reservation", await self._json_body(request), success_status=201,
+                                   idempotency_key=request.headers.get("Idempotency-Key"))
+
+    async def list_reservations(self, request):
+        args = {"customer_email": request.query["email"]} if "email" in request.query else {}
+        return await self._respond("get_reservations_by_email", args, caller=self._caller(request))
+
+    async def get_reservation(self, request):
+        return await self._respond("get_reservation", {"reservation_id": request.match_info["reservation_id"]},
+                                   caller=self._caller(request))
+
+    async def modify_reservation(self, request):
+        args = dict(await self._json_body(request), reservation_id=request.match_info["reservation_id"])
+        return await self._respond("modify_reservation", args, idempotency_key=request.headers.get("Idempotency-Key"),
+                                   caller=self._caller(request))
+
+    async def cancel_reservation(self, request):
+        return await self._respond("cancel_reservation", {"reservation_id": request.match_info["reservation_id"]},
+                                   idempotency_key=request.headers.get("Idempotency-Key"),
+                                   caller=self._caller(request))
+
+    async def join_waitlist(self, request):
+        return await self._respond("join_waitlist", await self._json_body(request), success_status=201)
+
+    async def leave_waitlist(self, request):
+        return await self._respond("leave_waitlist", {"waitlist_id": request.match_info["waitlist_id"]},
+                                   caller=self._caller(request))
+
+    async def batch(self, request):
+        """
+        Run up to MAX_BATCH_SIZE operations in one round trip
+
+        Body: {"requests": [{"op": "check_availability", "args": {...}}, ...]}
+        Operations use the tool names and run in order; each result carries its own status.
+        Bookings, modifications and cancellations may carry an "idempotency_key".
+        Owner-only operations need the same customer token as their own routes.
+        """
+        body = await self._json_body(request)
+        requests = body.get("requests")
+        if not isinstance(requests, list) or not requests:
+            return json_response({"error": "requests must be a non-empty list"}, status=400)
+        if len(requests) > MAX_BATCH_SIZE:
+            return json_response({"error": f"At most {MAX_BATCH_SIZE} requests per batch"}, status=400)
+        caller = self._caller(request)
+
+        def run_all():
+            results = []
+            for item in requests:
+                if not isinstance(item, dict) or "op" not in item:
+                    results.append({"status": 400, "result": {"error": "Each request needs an op"}})
+                    continue
+                args = dict(item.get("args") or {})
+                denied = self._check_owner(item["op"], args, caller)
+                if denied is not None:
+                    results.append({"status": denied[0], "result": denied[1]})
+                    continue
+                result = self.tools.dispatch(item["op"], args, item.get("idempotency_key"))
+                results.append({"status": self._status_for(result), "result": result})
+            return results
+
+        loop = asyncio.get_running_loop()
+        with METRICS.timer("api_operation_seconds", op="batch"):
+            results = await loop.run_in_executor(None, run_all)
+        return json_response({"results": results})
+
+    async def chat(self, request):
+        body = await self._json_body(request)
+        message = body.get("message")
+        if not isinstance(message, str) or not message.strip():
+            return json_response({"error": "message is required"}, status=400)
+        session_id = str(body.get("session_id") or uuid.uuid4())
+        caller = self._caller(request)
+        loop = asyncio.get_running_loop()
+        # A cold session builds its agent and reads its transcript from SQLite
+        agent, session_lock = await loop.run_in_executor(None, self.sessions.get, session_id)
+
+        def run_turn():
+            # Turns of one session are serialized; different sessions run in parallel
+            with session_lock:
+                # Only a verified customer may act on their reservations through the fast path
+                reply = agent.handle_conversation(message, customer_email=caller)
+                return reply, agent.service_unavailable
+
+        reply, unavailable = await loop.run_in_executor(self._chat_executor, run_turn)
+        return json_response({
+            "session_id": session_id,
+            "reply": reply,
+            "service_unavailable": unavailable
+        }, status=503 if unavailable else 200)
+
+    async def chat_history(self, request):
+        session_id = request.match_info["session_id"]
+        loop = asyncio.get_running_loop()
+        messages = await loop.run_in_executor(None, self.session_store.transcript, session_id)
+        if not messages:
+            return json_response({"error": "Session not found"}, status=404)
+        return json_response({"session_id": session_id, "messages": messages})
+
+
+def create_app(db=None, agent_factory=None, auth_secret=None):
+    """
+    Build the aiohttp application
+
+    Args:
+        db: RestaurantDatabase to serve (a default instance is created if omitted)
+        agent_factory: Callable returning the LLMAgent for a chat session ID
+        auth_secret: Secret verifying customer tokens (API_AUTH_SECRET by default)
+    """
+    db = db or RestaurantDatabase()
+    api = ReservationAPI(db, agent_factory, auth_secret=auth_secret or auth_secret_from_env())
+    app = web.Application(client_max_size=256 * 1024)
+    app["api"] = api
+    app.add_routes([
+        web.get("/healthz", api.healthz),
+        web.get("/restaurants", api.search_restaurants),
+        web.get("/restaurants/{restaurant_id}", api.get_restaurant),
+        web.get("/restaurants/{restaurant_id}/availability", api.check_availability),
+        web.post("/recommendations", api.recommend_restaurants),
+        web.post("/reservations", api.create_reservation),
+        web.get("/reservations", api.list_reservations),
+        web.get("/reservations/{reservation_id}", api.get_reservation),
+        web.patch("/reservations/{reservation_id}", api.modify_reservation),
+        web.delete("/reservations/{reservation_id}", api.cancel_reservation),
+        web.post("/waitlist", api.join_waitlist),
+        web.delete("/waitlist/{waitlist_id}", api.leave_waitlist),
+        web.post("/batch", api.batch),
+        web.post("/chat", api.chat),
+        web.get("/chat/{session_id}", api.chat_history),
+    ])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FoodieSpot reservation API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data-dir", default=None, help="Directory holding restaurants.csv and reservations.json")
+    parser.add_argument("--keepalive-timeout", type=float, default=75.0,
+                        help="Seconds an idle keep-alive connection stays open")
+    parser.add_argument("--reuse-port", action="store_true",
+                        help="Set SO_REUSEPORT so several processes can share the port (Linux)")
+    parser.add_argument("--event-socket", default=os.environ.get("EVENT_SOCKET"),
+                        help="Unix socket path for sharing reservation events between processes")
+    parser.add_argument("--catalog-reload-interval", type=float,
+                        default=float(os.environ.get("CATALOG_RELOAD_INTERVAL", "5")),
+                        help="Seconds between checks for restaurants.csv changes (0 disables)")
+    parser.add_argument("--shards", type=int, default=int(os.environ.get("DB_SHARDS", "0")),
+                        help="Partition restaurants across this many worker processes (0 runs unsharded)")
+    parser.add_argument("--issue-token", metavar="EMAIL",
+                        help="Print the customer token for EMAIL (signed with API_AUTH_SECRET) and exit")
+    args = parser.parse_args()
+
+    secret = auth_secret_from_env()
+    if args.issue_token:
+        if not secret:
+            raise SystemExit("Set API_AUTH_SECRET to issue customer tokens")
+        print(customer_token(args.issue_token, secret))
+        return
+    if not secret:
+        print("API_AUTH_SECRET is not set: reservation lookups, changes and cancellations will be refused")
+
+    db = ShardedDatabase(args.data_dir, args.shards) if args.shards > 0 else RestaurantDatabase(args.data_dir)
+    if args.catalog_reload_interval > 0:
+        db.watch_catalog(args.catalog_reload_interval)
+    if args.event_socket:
+        connect_event_socket(db.events, args.event_socket)
+    app = create_app(db)
+    web.run_app(app, host=args.host, port=args.port, keepalive_timeout=args.keepalive_timeout,
+                reuse_port=args.reuse_port or None)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,19 @@ import streamlit as st
 import pandas as pd
 import os
 import json
+import uuid
+from collections import deque
 from datetime import datetime, timedelta
+from analytics import OccupancyCube, render_heatmap
 from database import RestaurantDatabase
+from sharding import ShardedDatabase
+from events import connect_event_socket
 from llm_agent import LLMAgent
+from llm_client import LLMClientPool
+from metrics import start_metrics_server, start_json_dump
+from profiling import PROFILER
+from semantic_cache import SemanticCache
+from session_store import AgentSessions, SessionStore
 import matplotlib.pyplot as plt
 from PIL import Image
 
@@ -16,21 +26,164 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Start the metrics exporters once per process (opt-in through environment variables)
+@st.cache_resource
+def start_metrics_exporters():
+    exporters = {}
+    if os.environ.get("METRICS_PORT"):
+        exporters["server"] = start_metrics_server(
+            int(os.environ["METRICS_PORT"]),
+            host=os.environ.get("METRICS_HOST", "127.0.0.1")
+        )
+    if os.environ.get("METRICS_JSON_PATH"):
+        exporters["json_dump"] = start_json_dump(
+            os.environ["METRICS_JSON_PATH"],
+            interval=float(os.environ.get("METRICS_JSON_INTERVAL", "60"))
+        )
+    return exporters
+
+start_metrics_exporters()
+
 # Initialize database
 @st.cache_resource
 def get_database():
-    return RestaurantDatabase()
+    # DB_SHARDS partitions restaurants across that many worker processes
+    shards = int(os.environ.get("DB_SHARDS", "0"))
+    database = ShardedDatabase(shards=shards) if shards > 0 else RestaurantDatabase()
+    # Pick up restaurants.csv edits without restarting (0 disables)
+    reload_interval = float(os.environ.get("CATALOG_RELOAD_INTERVAL", "5"))
+    if reload_interval > 0:
+        database.watch_catalog(reload_interval)
+    # Optionally share reservation events with other app/API processes on this host
+    if os.environ.get("EVENT_SOCKET"):
+        connect_event_socket(database.events, os.environ["EVENT_SOCKET"])
+    return database
 
 db = get_database()
 
-# Initialize LLM Agent (this will need an API key)
+# Occupancy cubes for the analytics view, kept up to date from reservation events
+@st.cache_resource
+def get_occupancy_cube():
+    return OccupancyCube(db)
+
+# Recent reservation events, shared by all sessions of this process
 @st.cache_resource
-def get_llm_agent():
-    return LLMAgent(db_instance=db)
+def get_activity_feed():
+    feed = deque(maxlen=200)
+    db.events.subscribe("reservation.*", feed.append)
+    db.events.subscribe("waitlist.promoted", feed.append)
+    return feed
+
+activity_feed = get_activity_feed()
+
+# Chat histories, saved per turn so conversations survive restarts and reloads
+@st.cache_resource
+def get_session_store():
+    return SessionStore.from_env(db.data_dir)
+
+# One LLM agent per chat session (this will need an API key); idle sessions are dropped from memory
+@st.cache_resource
+def get_agent_sessions():
+    # Optional local cache of tool plans for repeated requests
+    semantic_cache = None
+    if os.environ.get("SEMANTIC_CACHE", "").lower() in ("1", "true", "yes"):
+        semantic_cache = SemanticCache(
+            max_entries=int(os.environ.get("SEMANTIC_CACHE_SIZE", "512")),
+            ttl_seconds=float(os.environ.get("SEMANTIC_CACHE_TTL", "3600"))
+        )
+    llm_pool = []
+
+    def make_agent(session_id):
+        # All sessions share one client pool, created with the first agent
+        if not llm_pool:
+            llm_pool.append(LLMClientPool.from_env())
+        return LLMAgent(db_instance=db, semantic_cache=semantic_cache, llm_pool=llm_pool[0],
+                        session_id=session_id, session_store=get_session_store())
+    return AgentSessions(make_agent, idle_seconds=float(os.environ.get("SESSION_IDLE_SECONDS", "1800")))
+
+PRICE_RANGES = ["All", "₹ (Under 500)", "₹₹ (500-1000)", "₹₹₹ (1000-1500)", "₹₹₹₹ (1500+)"]
+BROWSE_PAGE_SIZE = int(os.environ.get("BROWSE_PAGE_SIZE", "10"))
+
+# Browse view caches; the catalog version argument invalidates them when the catalog changes
+@st.cache_data
+def get_filter_options(_db, catalog_version):
+    restaurants = _db.restaurants
+    return (sorted(restaurants["cuisine"].unique().tolist()),
+            sorted(restaurants["location"].unique().tolist()))
+
+@st.cache_data(max_entries=256)
+def get_restaurant_cards(_db, catalog_version, cuisine_filter, location_filter, price_filter):
+    restaurants = _db.restaurants
+    mask = pd.Series(True, index=restaurants.index)
+    if cuisine_filter != "All":
+        mask &= restaurants["cuisine"] == cuisine_filter
+    if location_filter != "All":
+        mask &= restaurants["location"] == location_filter
+    if price_filter != "All":
+        mask &= restaurants["price_range"] == price_filter
+    
+    cards = []
+    for restaurant in restaurants[mask].to_dict('records'):
+        cards.append({
+            "id": restaurant['id'],
+            "name": restaurant['name'],
+            "cuisine": restaurant['cuisine'],
+            "location": restaurant['location'],
+            "html": f"""
+            <div class="restaurant-card">
+                <div class="restaurant-title">{restaurant['name']} - {restaurant['price_range']}</div>
+                <div>{restaurant['cuisine']} cuisine • {restaurant['location']}</div>
+                <div>Rating: {'⭐' * int(restaurant['rating'])} ({restaurant['rating']})</div>
+                <div>Capacity: {restaurant['capacity']} seats • Hours: {restaurant['opening_time']} to {restaurant['closing_time']}</div>
+                <div><em>Special feature: {restaurant['special_features']}</em></div>
+            </div>
+            """
+        })
+    return cards
+
+# The ledger version argument invalidates this whenever a reservation changes
+@st.cache_data(max_entries=64)
+def get_reservation_cards(_db, ledger_version, email):
+    cards = []
+    for reservation in _db.get_reservations_by_email(email):
+        cards.append({
+            "id": reservation['id'],
+            "html": f"""
+            <div class="restaurant-card">
+                <div class="restaurant-title">{reservation['restaurant_name']}</div>
+                <div>Date: {reservation['date']} at {reservation['time']}</div>
+                <div>Party size: {reservation['party_size']} people</div>
+                <div>Reservation ID: {reservation['id']}</div>
+                <div>Special requests: {reservation['special_requests'] or 'None'}</div>
+            </div>
+            """
+        })
+    return cards
+
+EVENT_MESSAGES = {
+    "reservation.created": "New reservation at {restaurant_name} on {date} at {time}",
+    "reservation.modified": "Reservation at {restaurant_name} changed to {date} at {time}",
+    "reservation.cancelled": "Reservation at {restaurant_name} on {date} at {time} was cancelled",
+    "waitlist.promoted": "A table opened up: you are off the waitlist at {restaurant_name} on {date} at {time}",
+}
+
+def show_new_activity(email):
+    """Toast reservation changes for this customer made since the session last looked"""
+    last_seen = st.session_state.get("last_seen_event")
+    events = list(activity_feed)
+    if last_seen is not None:
+        for event in events:
+            reservation = event["payload"]["reservation"]
+            if (event["seq"] > last_seen
+                    and str(reservation.get("customer_email", "")).lower() == email.lower()):
+                st.toast(EVENT_MESSAGES[event["topic"]].format(**reservation))
+    st.session_state.last_seen_event = events[-1]["seq"] if events else db.events.sequence
 
 # Create session state variables
-if 'conversation_history' not in st.session_state:
-    st.session_state.conversation_history = []
+# The chat session ID is kept in the URL, so reloading the page resumes the conversation
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = st.query_params.get("session") or uuid.uuid4().hex
+    st.query_params["session"] = st.session_state.session_id
 if 'current_view' not in st.session_state:
     st.session_state.current_view = "chat"
 if 'reservation_details' not in st.session_state:
@@ -98,6 +251,8 @@ with st.sidebar:
         st.session_state.current_view = "browse"
     if st.button("📝 My Reservations", use_container_width=True):
         st.session_state.current_view = "reservations"
+    if st.button("📊 Analytics", use_container_width=True):
+        st.session_state.current_view = "analytics"
     
     st.divider()
     
@@ -111,208 +266,236 @@ with st.sidebar:
     st.caption("Version 1.0.0")
 
 # Main content area
-if st.session_state.current_view == "chat":
-    st.header("Chat with Our Reservation Assistant")
+def render_main():
+    if st.session_state.current_view == "chat":
+        st.header("Chat with Our Reservation Assistant")
     
-    # Display chat history
-    for message in st.session_state.conversation_history:
-        if message["role"] == "user":
-            with st.container():
-                st.markdown(f"""
-                <div class="chat-message user">
-                    <div class="message">
-                        {message["content"]}
+        # Display chat history
+        for message in get_session_store().transcript(st.session_state.session_id):
+            if message["role"] == "user":
+                with st.container():
+                    st.markdown(f"""
+                    <div class="chat-message user">
+                        <div class="message">
+                            {message["content"]}
+                        </div>
                     </div>
-                </div>
-                """, unsafe_allow_html=True)
-        else:
-            with st.container():
-                st.markdown(f"""
-                <div class="chat-message assistant">
-                    <div class="message">
-                        {message["content"]}
+                    """, unsafe_allow_html=True)
+            else:
+                with st.container():
+                    st.markdown(f"""
+                    <div class="chat-message assistant">
+                        <div class="message">
+                            {message["content"]}
+                        </div>
                     </div>
-                </div>
-                """, unsafe_allow_html=True)
+                    """, unsafe_allow_html=True)
     
-    # Chat input
-    with st.container():
-        user_input = st.chat_input("Type your message here...")
-        if user_input:
-            # Add user message to chat history
-            st.session_state.conversation_history.append({"role": "user", "content": user_input})
-            
-            try:
-                # Initialize LLM agent if not done already
-                llm_agent = get_llm_agent()
+        # Chat input
+        with st.container():
+            user_input = st.chat_input("Type your message here...")
+            if user_input:
+                try:
+                    # The session's agent, resumed from its saved history if needed
+                    llm_agent, session_lock = get_agent_sessions().get(st.session_state.session_id)
                 
-                # Process with LLM
-                with st.spinner("Thinking..."):
-                    response = llm_agent.handle_conversation(user_input)
+                    # Process with LLM (the agent saves both messages to the session history)
+                    with st.spinner("Thinking..."), session_lock:
+                        llm_agent.handle_conversation(user_input, customer_email=user_email)
                 
-                # Add assistant response to chat history
-                st.session_state.conversation_history.append({"role": "assistant", "content": response})
+                    # Offer alternative options when no LLM endpoint could answer
+                    if llm_agent.service_unavailable:
+                        # Show alternative options to the user
+                        with st.expander("⚠️ AI Service Unavailable - View Alternatives", expanded=True):
+                            st.info("""
+                            While our AI assistant is temporarily unavailable, you can still:
+                            1. Browse restaurants directly by clicking "Browse Restaurants" in the sidebar
+                            2. Check your existing reservations via "My Reservations" 
+                            3. Contact our support team at support@foodiespot.com
+                            """)
+                            col1, col2 = st.columns(2)
+                            if col1.button("Browse Restaurants Instead"):
+                                st.session_state.current_view = "browse"
+                                st.rerun()
+                            if col2.button("Check My Reservations"):
+                                st.session_state.current_view = "reservations"
+                                st.rerun()
                 
-                # Check if the response contains rate limit error keywords to offer alternative options
-                if "rate limit" in response.lower() or "usage limit" in response.lower() or "try again later" in response.lower():
-                    # Show alternative options to the user
-                    with st.expander("⚠️ AI Service Unavailable - View Alternatives", expanded=True):
-                        st.info("""
-                        While our AI assistant is temporarily unavailable, you can still:
-                        1. Browse restaurants directly by clicking "Browse Restaurants" in the sidebar
-                        2. Check your existing reservations via "My Reservations" 
-                        3. Contact our support team at support@foodiespot.com
-                        """)
-                        col1, col2 = st.columns(2)
-                        if col1.button("Browse Restaurants Instead"):
-                            st.session_state.current_view = "browse"
-                            st.rerun()
-                        if col2.button("Check My Reservations"):
-                            st.session_state.current_view = "reservations"
-                            st.rerun()
+                    # Force a rerun to update the UI
+                    st.rerun()
                 
-                # Force a rerun to update the UI
-                st.rerun()
-                
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
-                st.session_state.conversation_history.append({"role": "assistant", "content": f"I'm sorry, but I encountered an error: {str(e)}"})
-                st.rerun()
+                except Exception as e:
+                    st.error(f"I'm sorry, but I encountered an error: {str(e)}")
 
-elif st.session_state.current_view == "browse":
-    st.header("Browse Our Restaurants")
-    
-    # Filtering options
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        cuisine_filter = st.selectbox(
-            "Cuisine",
-            options=["All"] + sorted(db.restaurants["cuisine"].unique().tolist())
-        )
-    
-    with col2:
-        location_filter = st.selectbox(
-            "Location",
-            options=["All"] + sorted(db.restaurants["location"].unique().tolist())
-        )
-    
-    with col3:
-        price_filter = st.selectbox(
-            "Price Range",
-            options=["All", "₹ (Under 500)", "₹₹ (500-1000)", "₹₹₹ (1000-1500)", "₹₹₹₹ (1500+)"]
-        )
+    elif st.session_state.current_view == "browse":
+        st.header("Browse Our Restaurants")
+        
+        # Filter options are cached per catalog version
+        cuisine_options, location_options = get_filter_options(db, db.catalog_version)
     
-    # Apply filters
-    filtered_restaurants = db.restaurants.copy()
+        # Filtering options
+        col1, col2, col3 = st.columns(3)
     
-    if cuisine_filter != "All":
-        filtered_restaurants = filtered_restaurants[filtered_restaurants["cuisine"] == cuisine_filter]
+        with col1:
+            cuisine_filter = st.selectbox(
+                "Cuisine",
+                options=["All"] + cuisine_options
+            )
     
-    if location_filter != "All":
-        filtered_restaurants = filtered_restaurants[filtered_restaurants["location"] == location_filter]
+        with col2:
+            location_filter = st.selectbox(
+                "Location",
+                options=["All"] + location_options
+            )
     
-    if price_filter != "All":
-        filtered_restaurants = filtered_restaurants[filtered_restaurants["price_range"] == price_filter]
+        with col3:
+            price_filter = st.selectbox(
+                "Price Range",
+                options=PRICE_RANGES
+            )
     
-    # Display restaurants
-    if len(filtered_restaurants) > 0:
-        for _, restaurant in filtered_restaurants.iterrows():
-            with st.container():
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.markdown(f"""
-                    <div class="restaurant-card">
-                        <div class="restaurant-title">{restaurant['name']} - {restaurant['price_range']}</div>
-                        <div>{restaurant['cuisine']} cuisine • {restaurant['location']}</div>
-                        <div>Rating: {'⭐' * int(restaurant['rating'])} ({restaurant['rating']})</div>
-                        <div>Capacity: {restaurant['capacity']} seats • Hours: {restaurant['opening_time']} to {restaurant['closing_time']}</div>
-                        <div><em>Special feature: {restaurant['special_features']}</em></div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                with col2:
-                    if st.button("Book Now", key=f"book_{restaurant['id']}"):
-                        # Store restaurant details and switch to reservation form
-                        st.session_state.reservation_details = {
-                            "restaurant_id": restaurant['id'],
-                            "restaurant_name": restaurant['name'],
-                            "cuisine": restaurant['cuisine'],
-                            "location": restaurant['location']
-                        }
-                        st.session_state.current_view = "make_reservation"
-                        st.rerun()
-    else:
-        st.info("No restaurants found with the selected filters.")
+        # Rendered cards are cached per catalog version and filter combination
+        cards = get_restaurant_cards(db, db.catalog_version, cuisine_filter, location_filter, price_filter)
+        
+        # Start from the first page whenever the filters change
+        filter_key = (cuisine_filter, location_filter, price_filter)
+        if st.session_state.get("browse_filters") != filter_key:
+            st.session_state.browse_filters = filter_key
+            st.session_state.browse_page = 1
+        
+        # Display restaurants, one page at a time
+        if len(cards) > 0:
+            page_count = max(1, -(-len(cards) // BROWSE_PAGE_SIZE))
+            page = min(st.session_state.get("browse_page", 1), page_count)
+            page_start = (page - 1) * BROWSE_PAGE_SIZE
+            st.caption(f"Showing {page_start + 1}-{min(page_start + BROWSE_PAGE_SIZE, len(cards))} of {len(cards)} restaurants")
+            
+            for card in cards[page_start:page_start + BROWSE_PAGE_SIZE]:
+                with st.container():
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        st.markdown(card["html"], unsafe_allow_html=True)
+                    with col2:
+                        if st.button("Book Now", key=f"book_{card['id']}"):
+                            # Store restaurant details and switch to reservation form
+                            st.session_state.reservation_details = {
+                                "restaurant_id": card['id'],
+                                "restaurant_name": card['name'],
+                                "cuisine": card['cuisine'],
+                                "location": card['location'],
+                                # Idempotency key of this form, so a repeated submit books only once
+                                "form_token": uuid.uuid4().hex
+                            }
+                            st.session_state.current_view = "make_reservation"
+                            st.rerun()
+            
+            # Pagination controls
+            if page_count > 1:
+                col1, col2, col3 = st.columns([1, 2, 1])
+                if col1.button("← Previous", disabled=page <= 1):
+                    st.session_state.browse_page = page - 1
+                    st.rerun()
+                col2.markdown(f"<div style='text-align: center'>Page {page} of {page_count}</div>", unsafe_allow_html=True)
+                if col3.button("Next →", disabled=page >= page_count):
+                    st.session_state.browse_page = page + 1
+                    st.rerun()
+        else:
+            st.info("No restaurants found with the selected filters.")
 
-elif st.session_state.current_view == "make_reservation":
-    restaurant = st.session_state.reservation_details
-    st.header(f"Make a Reservation at {restaurant['restaurant_name']}")
-    st.subheader(f"{restaurant['cuisine']} cuisine • {restaurant['location']}")
+    elif st.session_state.current_view == "make_reservation":
+        restaurant = st.session_state.reservation_details
+        st.header(f"Make a Reservation at {restaurant['restaurant_name']}")
+        st.subheader(f"{restaurant['cuisine']} cuisine • {restaurant['location']}")
+    
+        # Reservation form
+        date = st.date_input(
+            "Date",
+            value=datetime.now() + timedelta(days=1)
+        ).strftime("%Y-%m-%d")
     
-    # Reservation form
-    date = st.date_input(
-        "Date",
-        value=datetime.now() + timedelta(days=1)
-    ).strftime("%Y-%m-%d")
+        time = st.time_input(
+            "Time",
+            value=datetime.strptime("19:00", "%H:%M")
+        ).strftime("%H:%M")
     
-    time = st.time_input(
-        "Time",
-        value=datetime.strptime("19:00", "%H:%M")
-    ).strftime("%H:%M")
+        party_size = st.number_input(
+            "Number of People",
+            min_value=1,
+            max_value=20,
+            value=2
+        )
     
-    party_size = st.number_input(
-        "Number of People",
-        min_value=1,
-        max_value=20,
-        value=2
-    )
+        special_requests = st.text_area(
+            "Special Requests",
+            placeholder="Any special requests for your reservation?"
+        )
     
-    special_requests = st.text_area(
-        "Special Requests",
-        placeholder="Any special requests for your reservation?"
-    )
+        # Create columns for buttons
+        col1, col2, col3 = st.columns(3)
     
-    # Create columns for buttons
-    col1, col2 = st.columns(2)
+        # Check availability button in the first column
+        check_availability = col1.button("Check Availability")
     
-    # Check availability button in the first column
-    check_availability = col1.button("Check Availability")
+        # Confirm reservation button in the second column (always visible)
+        confirm_reservation = col2.button("Confirm Reservation")
     
-    # Confirm reservation button in the second column (always visible)
-    confirm_reservation = col2.button("Confirm Reservation")
+        # Waitlist for fully booked times
+        join_waitlist = col3.button("Join Waitlist")
     
-    # Check availability when the button is clicked
-    if check_availability:
-        # Check if the chosen time is available
-        availability = db.get_available_tables(
-            restaurant_id=restaurant["restaurant_id"],
-            date=date,
-            time=time,
-            party_size=party_size
-        )
+        # Check availability when the button is clicked
+        if check_availability:
+            # Check if the chosen time is available
+            availability = db.get_available_tables(
+                restaurant_id=restaurant["restaurant_id"],
+                date=date,
+                time=time,
+                party_size=party_size
+            )
         
-        if availability["available"]:
-            st.success(f"Great news! We have availability for {party_size} people on {date} at {time}.")
-        else:
-            st.error(availability["reason"])
+            if availability["available"]:
+                st.success(f"Great news! We have availability for {party_size} people on {date} at {time}.")
+            else:
+                st.error(availability["reason"])
             
-            # Suggest alternative times if the restaurant is open but full
-            if "Not enough seats" in availability["reason"]:
-                st.info("Would you like to try a different time or date?")
+                # Suggest alternative times if the restaurant is open but full
+                if "Not enough seats" in availability["reason"]:
+                    st.info("Would you like to try a different time or date, or join the waitlist?")
     
-    # Handle reservation confirmation separately
-    if confirm_reservation:
-        # First check availability again to ensure it's still available
-        availability = db.get_available_tables(
-            restaurant_id=restaurant["restaurant_id"],
-            date=date,
-            time=time,
-            party_size=party_size
-        )
+        # Handle reservation confirmation separately
+        if confirm_reservation:
+            # First check availability again to ensure it's still available
+            availability = db.get_available_tables(
+                restaurant_id=restaurant["restaurant_id"],
+                date=date,
+                time=time,
+                party_size=party_size
+            )
         
-        if availability["available"]:
-            # Create the reservation
-            result = db.create_reservation(
+            if availability["available"]:
+                # Create the reservation
+                result = db.create_reservation(
+                    customer_name=user_name,
+                    customer_email=user_email,
+                    restaurant_id=restaurant["restaurant_id"],
+                    date=date,
+                    time=time,
+                    party_size=party_size,
+                    special_requests=special_requests,
+                    idempotency_key=f"ui-booking:{restaurant['form_token']}"
+                )
+            
+                if result["success"]:
+                    st.success(result["message"])
+                    # Set the view to reservations and rerun
+                    st.session_state.current_view = "reservations"
+                    st.rerun()
+                else:
+                    st.error(result["message"])
+            else:
+                st.error("Please check availability first. " + availability["reason"])
+    
+        if join_waitlist:
+            result = db.join_waitlist(
                 customer_name=user_name,
                 customer_email=user_email,
                 restaurant_id=restaurant["restaurant_id"],
@@ -321,59 +504,89 @@ elif st.session_state.current_view == "make_reservation":
                 party_size=party_size,
                 special_requests=special_requests
             )
-            
             if result["success"]:
                 st.success(result["message"])
-                # Set the view to reservations and rerun
-                st.session_state.current_view = "reservations"
-                st.rerun()
             else:
                 st.error(result["message"])
-        else:
-            st.error("Please check availability first. " + availability["reason"])
     
-    # Button to go back to browse
-    if st.button("Back to Browse"):
-        st.session_state.current_view = "browse"
-        st.rerun()
+        # Button to go back to browse
+        if st.button("Back to Browse"):
+            st.session_state.current_view = "browse"
+            st.rerun()
 
-elif st.session_state.current_view == "reservations":
-    st.header("My Reservations")
+    elif st.session_state.current_view == "reservations":
+        st.header("My Reservations")
     
-    # Get user's reservations by email
-    # import pdb; pdb.set_trace()
-    reservations = db.get_reservations_by_email(user_email)
+        show_new_activity(user_email)
+        reservations = get_reservation_cards(db, db.ledger_version, user_email)
     
-    
-    if reservations:
-        for reservation in reservations:
-            with st.container():
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.markdown(f"""
-                    <div class="restaurant-card">
-                        <div class="restaurant-title">{reservation['restaurant_name']}</div>
-                        <div>Date: {reservation['date']} at {reservation['time']}</div>
-                        <div>Party size: {reservation['party_size']} people</div>
-                        <div>Reservation ID: {reservation['id']}</div>
-                        <div>Special requests: {reservation['special_requests'] or 'None'}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                with col2:
-                    if st.button("Cancel", key=f"cancel_{reservation['id']}"):
-                        # Cancel the reservation
-                        result = db.cancel_reservation(reservation['id'])
-                        if result["success"]:
-                            st.success(result["message"])
-                            st.rerun()
-                        else:
-                            st.error(result["message"])
-    else:
-        st.info(f"No reservations found for {user_email}. Make a reservation to see it here!")
+        if reservations:
+            for reservation in reservations:
+                with st.container():
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        st.markdown(reservation["html"], unsafe_allow_html=True)
+                    with col2:
+                        if st.button("Cancel", key=f"cancel_{reservation['id']}"):
+                            # Cancel the reservation
+                            result = db.cancel_reservation(reservation['id'],
+                                                           idempotency_key=f"ui-cancel:{reservation['id']}")
+                            if result["success"]:
+                                st.success(result["message"])
+                                st.rerun()
+                            else:
+                                st.error(result["message"])
+        else:
+            st.info(f"No reservations found for {user_email}. Make a reservation to see it here!")
         
-        # Button to go to browse restaurants
-        if st.button("Browse Restaurants to Book"):
-            st.session_state.current_view = "browse"
-            st.rerun()
+            # Button to go to browse restaurants
+            if st.button("Browse Restaurants to Book"):
+                st.session_state.current_view = "browse"
+                st.rerun()
+
+    elif st.session_state.current_view == "analytics":
+        st.header("Occupancy Analytics")
+        cube = get_occupancy_cube()
+        restaurant_names = {r["id"]: r["name"] for r in db.get_all_restaurants()}
+    
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            restaurant_choice = st.selectbox(
+                "Restaurant", [None] + list(restaurant_names),
+                format_func=lambda rid: "All restaurants" if rid is None else restaurant_names[rid]
+            )
+        with col2:
+            start_date = st.date_input("From", value=datetime.now().date() - timedelta(days=90))
+        with col3:
+            end_date = st.date_input("To", value=datetime.now().date() + timedelta(days=30))
+    
+        if start_date > end_date:
+            st.error("The start date must be before the end date.")
+        else:
+            heatmap = cube.weekday_heatmap(start_date, end_date, restaurant_id=restaurant_choice)
+            title = restaurant_names.get(restaurant_choice, "All restaurants")
+            st.pyplot(render_heatmap(heatmap, f"{title}: share of seats booked by weekday and time"))
+    
+            summary = pd.DataFrame(cube.summary(start_date, end_date))
+            summary = summary[summary["restaurant_id"].isin(restaurant_names)]
+            st.subheader("Utilization by restaurant")
+            st.dataframe(
+                summary.drop(columns=["restaurant_id"]).sort_values("mean_utilization", ascending=False),
+                hide_index=True, use_container_width=True
+            )
+    
+        if restaurant_choice is not None:
+            st.subheader("How full will it be?")
+            target_date = st.date_input("Date", value=datetime.now().date() + timedelta(days=1), key="forecast_date")
+            forecast = cube.forecast(restaurant_choice, target_date)
+            if forecast and forecast["slots"]:
+                st.caption(f"Expected peak: {forecast['expected_peak_utilization']:.0%} of "
+                           f"{forecast['capacity']} seats (same weekday over the last 8 weeks, at least what is booked)")
+                chart = pd.DataFrame(forecast["slots"]).set_index("time")[["booked_seats", "expected_seats"]]
+                st.bar_chart(chart)
+
+# Slow reruns are profiled when PROFILE_SLOW_TURN_MS is set
+with PROFILER.profile("streamlit_rerun", view=st.session_state.current_view):
+    render_main()
 
 # Run the app with: streamlit run app.py
\ No newline at end of file
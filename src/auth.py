@@ -0,0 +1,34 @@
+import hashlib
+import hmac
+import os
+from typing import Optional
+
+# Shared secret used to sign customer tokens for the HTTP API
+AUTH_SECRET_ENV = "API_AUTH_SECRET"
+
+
+def auth_secret_from_env() -> Optional[str]:
+    return os.environ.get(AUTH_SECRET_ENV) or None
+
+
+def customer_token(email: str, secret: str) -> str:
+    """
+    Bearer token identifying a customer to the HTTP API
+
+    The token is the customer's email and an HMAC-SHA256 of it under the
+    server secret, so whoever signs customers in (a web front end or a
+    gateway sharing the secret) can issue tokens without a token store.
+    """
+    email = email.strip().lower()
+    signature = hmac.new(secret.encode("utf-8"), email.encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{email}:{signature}"
+
+
+def verify_customer_token(token: str, secret: Optional[str]) -> Optional[str]:
+    """Email of a valid token, or None (always None without a secret)"""
+    if not secret or not token:
+        return None
+    email, _, signature = token.strip().rpartition(":")
+    if not email or not hmac.compare_digest(customer_token(email, secret), f"{email.lower()}:{signature}"):
+        return None
+    return email.lower()
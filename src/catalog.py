@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from search_index import GeoIndex, SearchIndex
+from timeutil import parse_time
+
+CATALOG_RELOADED = "catalog.reloaded"
+
+
+def shard_of(restaurant_id: int, shards: int) -> int:
+    """Index of the shard that owns a restaurant and its reservations"""
+    return int(restaurant_id) % shards
+
+
+class Catalog:
+    """
+    Immutable snapshot of the restaurant catalog and its lookup tables
+
+    A new snapshot is built for every reload and swapped in with a single
+    assignment, so readers that take `db.catalog` once always see a complete,
+    consistent catalog.
+    """
+
+    def __init__(self, restaurants: pd.DataFrame, version: int = 1, source_stamp: Optional[tuple] = None):
+        self.restaurants = restaurants
+        self.version = version
+        # (mtime, size) of the file this snapshot was loaded from
+        self.source_stamp = source_stamp
+        self.by_id = {int(r["id"]): r for r in restaurants.to_dict("records")} if len(restaurants) else {}
+        # (opening, closing) minute of the day, parsed once; restaurants with unreadable hours are left out
+        self.hours = {}
+        for restaurant_id, restaurant in self.by_id.items():
+            try:
+                self.hours[restaurant_id] = (parse_time(restaurant["opening_time"]),
+                                             parse_time(restaurant["closing_time"]))
+            except (TypeError, ValueError):
+                continue
+        self.search_index = SearchIndex(restaurants)
+        # Only when restaurants.csv has latitude/longitude columns
+        self.geo_index = GeoIndex.from_frame(restaurants)
+
+    @staticmethod
+    def file_stamp(path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @classmethod
+    def load(cls, path: str, version: int = 1, shard: Optional[Tuple[int, int]] = None) -> "Catalog":
+        """
+        Read restaurants.csv into a new snapshot
+
+        Args:
+            path: CSV file to read
+            version: Version number of the new snapshot
+            shard: (index, count) to keep only the restaurants that shard owns
+
+        Raises:
+            ValueError: If the file has no rows or lacks the columns the database needs
+        """
+        stamp = cls.file_stamp(path)
+        restaurants = pd.read_csv(path)
+        missing = {"id", "name", "location", "cuisine", "capacity", "opening_time", "closing_time"} - set(restaurants.columns)
+        if missing:
+            raise ValueError(f"{path} is missing columns: {sorted(missing)}")
+        if restaurants.empty:
+            raise ValueError(f"{path} has no restaurants")
+        if shard is not None:
+            index, count = shard
+            owned = restaurants["id"].astype(int).map(lambda restaurant_id: shard_of(restaurant_id, count) == index)
+            restaurants = restaurants[owned].reset_index(drop=True)
+        return cls(restaurants, version, stamp)
+
+    def get(self, restaurant_id: int) -> Optional[Dict[str, Any]]:
+        """Restaurant record by ID (a copy callers may modify)"""
+        restaurant = self.by_id.get(int(restaurant_id))
+        return dict(restaurant) if restaurant is not None else None
+
+
+class CatalogWatcher:
+    """Poll a file's modification time and call `on_change` when it changes"""
+
+    def __init__(self, path: str, on_change: Callable[[], None], interval: float = 5.0,
+                 initial_stamp: Optional[tuple] = None):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._stamp = initial_stamp if initial_stamp is not None else Catalog.file_stamp(path)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            stamp = Catalog.file_stamp(self.path)
+            if stamp is None or stamp == self._stamp:
+                continue
+            # Let an in-place write finish before reading the file
+            time.sleep(min(self.interval, 0.5))
+            if Catalog.file_stamp(self.path) != stamp:
+                continue
+            self._stamp = stamp
+            try:
+                self.on_change()
+            except Exception as e:
+                print(f"Error reloading {self.path}: {e}")
+
+    def stop(self):
+        self._stop.set()
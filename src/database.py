@@ -2,10 +2,37 @@ import pandas as pd
 import os
 import json
 from datetime import datetime, timedelta
-import random
+import uuid
+import threading
+from functools import wraps
+from metrics import METRICS
+from catalog import Catalog, CatalogWatcher, CATALOG_RELOADED, shard_of
+from events import EventBus, RESERVATION_CREATED, RESERVATION_MODIFIED, RESERVATION_CANCELLED
+from waitlist import Waitlist
+from ranking import PopularityTracker, RankingEngine
+from idempotency import IdempotencyStore, idempotent
+from timeutil import is_open, parse_date, parse_time
+
+# Recommendations returned when the caller does not ask for a number
+RECOMMENDATION_LIMIT = 5
+
+def synchronized(method):
+    """Run a method while holding the database lock"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class RestaurantDatabase:
-    def __init__(self, data_dir=None):
+    def __init__(self, data_dir=None, events=None, shard=None):
+        """
+        Args:
+            data_dir: Directory holding restaurants.csv and reservations.json
+            events: Event bus to publish reservation changes on (a new one if None)
+            shard: (index, count) to serve only the restaurants that shard owns,
+                with its own reservations and waitlist files (see sharding.py)
+        """
          # Use absolute path for data directory
         if data_dir is None:
             # Get the directory of the current file (database.py)
@@ -15,31 +42,106 @@ class RestaurantDatabase:
         else:
             # If a path is provided, make it absolute if it's not already
             self.data_dir = os.path.abspath(data_dir) if not os.path.isabs(data_dir) else data_dir
-        self.restaurants = self._load_restaurants()
+        # Guards the reservation ledger when the database is shared between threads
+        self._lock = threading.RLock()
+        self.shard = tuple(shard) if shard is not None else None
+        self.restaurants_file = os.path.join(self.data_dir, "restaurants.csv")
+        self.catalog = self._load_restaurants()
+        self._catalog_watcher = None
         self.reservations_file = os.path.join(self.data_dir, "reservations.json")
+        waitlist_file = os.path.join(self.data_dir, "waitlist.json")
+        if self.shard is not None:
+            suffix = f"{self.shard[0]}-of-{self.shard[1]}.json"
+            self.reservations_file = os.path.join(self.data_dir, "shards", f"reservations-{suffix}")
+            waitlist_file = os.path.join(self.data_dir, "shards", f"waitlist-{suffix}")
+        new_shard = self.shard is not None and not os.path.exists(self.reservations_file)
         self.reservations = self._load_reservations()
+        if new_shard:
+            self._save_reservations()
+        # Bumped on every reservation change; reservation events are published on this bus
+        self.ledger_version = 1
+        self.events = events or EventBus()
+        # Keep the ledger in step with other processes sharing the bus over a socket
+        self.events.subscribe("reservation.*", self._apply_remote_event)
+        # Parties waiting for fully booked slots, promoted as seats free up
+        self.waitlist = Waitlist(self, waitlist_file)
+        self.events.subscribe("waitlist.*", self._apply_remote_event)
+        # Scores recommendations; popularity is kept current from the reservation events
+        self.ranking = RankingEngine.from_env(PopularityTracker(self))
+        # Results of create/modify/cancel calls by idempotency key, so retries are not applied twice
+        self.idempotency = IdempotencyStore()
         
     def _load_restaurants(self):
         """Load restaurant data from CSV file"""
         try:
-            restaurants_file = os.path.join(self.data_dir, "restaurants.csv")
-            return pd.read_csv(restaurants_file)
+            return Catalog.load(self.restaurants_file, shard=self.shard)
         except Exception as e:
             print(f"Error loading restaurants: {e}")
-            return pd.DataFrame()
+            return Catalog(pd.DataFrame())
+    
+    @property
+    def restaurants(self):
+        """DataFrame of the current restaurant catalog"""
+        return self.catalog.restaurants
+    
+    @property
+    def catalog_version(self):
+        """Bumped whenever the restaurant catalog changes so derived caches can be invalidated"""
+        return self.catalog.version
+    
+    @METRICS.timed("catalog_reload_seconds")
+    def reload_catalog(self):
+        """
+        Rebuild the restaurant catalog from restaurants.csv and swap it in
+        
+        The new catalog is built without holding the database lock; readers keep
+        using the old snapshot until the single assignment that replaces it.
+        Reservations are left untouched. If the file is invalid the current
+        catalog stays in place.
+        
+        Returns:
+            bool: True if a new catalog was installed
+        """
+        try:
+            catalog = Catalog.load(self.restaurants_file, self.catalog.version + 1, self.shard)
+        except Exception as e:
+            METRICS.inc("catalog_reload_failures_total")
+            print(f"Error reloading restaurants, keeping the current catalog: {e}")
+            return False
+        with self._lock:
+            self.catalog = catalog
+            self.events.publish(CATALOG_RELOADED, {"version": catalog.version, "restaurants": len(catalog.by_id)})
+        return True
+    
+    def watch_catalog(self, interval=5.0):
+        """Reload the catalog in the background whenever restaurants.csv changes"""
+        if self._catalog_watcher is None:
+            self._catalog_watcher = CatalogWatcher(
+                self.restaurants_file, self.reload_catalog, interval, self.catalog.source_stamp
+            )
+        return self._catalog_watcher
     
     def _load_reservations(self):
         """Load reservations from JSON file or create empty reservations"""
-        if os.path.exists(self.reservations_file):
+        path = self.reservations_file
+        if self.shard is not None and not os.path.exists(path):
+            # A new shard starts from its restaurants' reservations in the unsharded ledger
+            path = os.path.join(self.data_dir, "reservations.json")
+        if os.path.exists(path):
             try:
-                with open(self.reservations_file, 'r') as f:
-                    return json.load(f)
+                with open(path, 'r') as f:
+                    reservations = json.load(f)
+                if self.shard is not None:
+                    index, count = self.shard
+                    reservations = [r for r in reservations if shard_of(r['restaurant_id'], count) == index]
+                return reservations
             except Exception as e:
                 print(f"Error loading reservations: {e}")
                 return []
         else:
             return []
     
+    @METRICS.timed("persistence_flush_seconds")
     def _save_reservations(self):
         """Save reservations to JSON file"""
         try:
@@ -51,43 +153,81 @@ class RestaurantDatabase:
             with open(temp_file, 'w') as f:
                 json.dump(self.reservations, f, indent=2)
                 
-            # Ensure the write is flushed to disk
-            f.flush()
-            os.fsync(f.fileno())
+                # Ensure the write is flushed to disk before the file is closed
+                f.flush()
+                os.fsync(f.fileno())
             
             # Rename is atomic on most file systems - ensure file exists
             os.replace(temp_file, self.reservations_file)
                 
         except Exception as e:
+            METRICS.inc("persistence_flush_failures_total")
             print(f"Error saving reservations: {e}")
             # In a production system, this should use proper logging
             # import logging
             # logging.error(f"Failed to save reservations: {str(e)}")
             # Consider additional recovery mechanisms here
     
+    def _publish(self, topic, **payload):
+        """Publish a reservation change (called with the lock held so events keep ledger order)"""
+        self.ledger_version += 1
+        self.events.publish(topic, payload)
+    
+    @synchronized
+    def _apply_remote_event(self, event):
+        """Apply a reservation or waitlist change made by another process to the in-memory state"""
+        if event["origin"] == self.events.node_id:
+            return
+        if event["topic"].startswith("waitlist."):
+            self.waitlist.apply_remote_event(event)
+            return
+        reservation = event["payload"]["reservation"]
+        self.reservations = [r for r in self.reservations if r['id'] != reservation['id']]
+        if event["topic"] != RESERVATION_CANCELLED:
+            self.reservations.append(reservation)
+        self.ledger_version += 1
+    
+    @synchronized
+    def follow_reservations(self, callback):
+        """
+        Snapshot the ledger and subscribe to its changes in one step
+        
+        No change can slip in between the snapshot and the subscription, so
+        derived data built from the snapshot stays exact by applying each event.
+        
+        Returns:
+            Tuple: Copies of the current reservations and a function that unsubscribes
+        """
+        unsubscribe = self.events.subscribe("reservation.*", callback)
+        return [dict(r) for r in self.reservations], unsubscribe
+    
+    @METRICS.timed("db_call_seconds")
     def get_all_restaurants(self):
         """Return all restaurants"""
         return self.restaurants.to_dict('records')
     
+    @METRICS.timed("db_call_seconds")
     def get_restaurant_by_id(self, restaurant_id):
         """Get a specific restaurant by ID"""
-        restaurant = self.restaurants[self.restaurants['id'] == int(restaurant_id)]
-        if len(restaurant) > 0:
-            return restaurant.iloc[0].to_dict()
-        return None
+        return self.catalog.get(restaurant_id)
     
+    @METRICS.timed("db_call_seconds")
     def search_restaurants(self, **kwargs):
         """
         Search restaurants based on criteria
-        Possible kwargs: location, cuisine, min_rating, price_range, etc.
-        """
-        filtered_df = self.restaurants.copy()
+        Possible kwargs: location, cuisine, name, min_rating, price_range, min_capacity,
+        latitude and longitude (sort by distance), max_distance_km
         
-        if 'location' in kwargs and kwargs['location']:
-            filtered_df = filtered_df[filtered_df['location'].str.contains(kwargs['location'], case=False)]
+        Location, cuisine and name tolerate typos ("Hauz Kaas", "north indain")
+        through the catalog's fuzzy index.
+        """
+        catalog = self.catalog
+        filtered_df = catalog.restaurants
         
-        if 'cuisine' in kwargs and kwargs['cuisine']:
-            filtered_df = filtered_df[filtered_df['cuisine'].str.contains(kwargs['cuisine'], case=False)]
+        for field in ('location', 'cuisine', 'name'):
+            if field in kwargs and kwargs[field]:
+                matching_ids = catalog.search_index.match_ids(field, kwargs[field])
+                filtered_df = filtered_df[filtered_df['id'].isin(matching_ids)]
         
         if 'min_rating' in kwargs and kwargs['min_rating']:
             filtered_df = filtered_df[filtered_df['rating'] >= float(kwargs['min_rating'])]
@@ -98,16 +238,42 @@ class RestaurantDatabase:
         if 'min_capacity' in kwargs and kwargs['min_capacity']:
             filtered_df = filtered_df[filtered_df['capacity'] >= int(kwargs['min_capacity'])]
         
-        return filtered_df.to_dict('records')
+        results = filtered_df.to_dict('records')
+        if kwargs.get('latitude') is not None and kwargs.get('longitude') is not None and catalog.geo_index:
+            # Nearest first, limited to restaurants with coordinates
+            distances = dict(catalog.geo_index.nearest(
+                float(kwargs['latitude']), float(kwargs['longitude']),
+                max_km=float(kwargs['max_distance_km']) if kwargs.get('max_distance_km') is not None else None
+            ))
+            results = [r for r in results if r['id'] in distances]
+            for restaurant in results:
+                restaurant['distance_km'] = distances[restaurant['id']]
+            results.sort(key=lambda r: r['distance_km'])
+        return results
+    
+    @METRICS.timed("db_call_seconds")
+    def nearest_restaurants(self, latitude, longitude, k=5, max_km=None):
+        """Restaurants closest to a point, with `distance_km` (empty without coordinates in the catalog)"""
+        catalog = self.catalog
+        if catalog.geo_index is None:
+            return []
+        results = []
+        for restaurant_id, distance in catalog.geo_index.nearest(latitude, longitude, k, max_km):
+            restaurant = catalog.get(restaurant_id)
+            restaurant['distance_km'] = distance
+            results.append(restaurant)
+        return results
     
+    @METRICS.timed("db_call_seconds")
+    @synchronized
     def get_available_tables(self, restaurant_id, date, time, party_size):
         """Check table availability for a restaurant at a specific date and time"""
         # Validate inputs
         try:
             # Validate date format (YYYY-MM-DD)
-            datetime.strptime(date, "%Y-%m-%d")
+            parse_date(date)
             # Validate time format (HH:MM)
-            datetime.strptime(time, "%H:%M")
+            parse_time(time)
             # Validate party_size is a positive integer
             party_size = int(party_size)
             if party_size <= 0:
@@ -142,14 +308,13 @@ class RestaurantDatabase:
             }
     
     def _is_restaurant_open(self, restaurant, time_str):
-        """Check if a restaurant is open at the given time"""
-        time_format = "%H:%M"
+        """Check if a restaurant is open at the given time (hours may run past midnight)"""
         try:
-            request_time = datetime.strptime(time_str, time_format).time()
-            opening_time = datetime.strptime(restaurant['opening_time'], time_format).time()
-            closing_time = datetime.strptime(restaurant['closing_time'], time_format).time()
-            
-            return opening_time <= request_time <= closing_time
+            # Hours are parsed once per catalog snapshot
+            hours = self.catalog.hours.get(int(restaurant['id']))
+            if hours is None:
+                hours = (parse_time(restaurant['opening_time']), parse_time(restaurant['closing_time']))
+            return bool(is_open(*hours, parse_time(time_str)))
         except Exception as e:
             print(f"Error checking restaurant hours: {e}")
             return False
@@ -164,16 +329,34 @@ class RestaurantDatabase:
                 booked += reservation['party_size']
         return booked
     
+    def _get_booked_seats_by_restaurant(self, date, time):
+        """Booked seats of every restaurant at one date and time"""
+        booked = {}
+        for reservation in self.reservations:
+            if reservation['date'] == date and reservation['time'] == time:
+                restaurant_id = reservation['restaurant_id']
+                booked[restaurant_id] = booked.get(restaurant_id, 0) + reservation['party_size']
+        return booked
+    
+    @METRICS.timed("db_call_seconds")
+    @idempotent
+    @synchronized
     def create_reservation(self, customer_name, customer_email, restaurant_id, 
-                         date, time, party_size, special_requests=""):
-        """Create a new reservation"""
+                         date, time, party_size, special_requests="", reservation_id=None):
+        """
+        Create a new reservation
+        
+        reservation_id keeps the ID of one moved from another shard. Like
+        modify and cancel, this accepts an idempotency_key: a repeated key
+        returns the first successful result without booking again.
+        """
         availability = self.get_available_tables(restaurant_id, date, time, party_size)
         
         if not availability["available"]:
             return {"success": False, "message": availability["reason"]}
         
         # Generate unique reservation ID
-        reservation_id = self._generate_reservation_id()
+        reservation_id = reservation_id or self._generate_reservation_id()
         
         # Create reservation object
         reservation = {
@@ -192,6 +375,7 @@ class RestaurantDatabase:
         # Add to reservations and save
         self.reservations.append(reservation)
         self._save_reservations()
+        self._publish(RESERVATION_CREATED, reservation=dict(reservation))
         
         return {
             "success": True, 
@@ -199,6 +383,8 @@ class RestaurantDatabase:
             "message": f"Reservation confirmed at {availability['restaurant']['name']} for {party_size} people on {date} at {time}"
         }
     
+    @METRICS.timed("db_call_seconds")
+    @synchronized
     def get_reservation(self, reservation_id):
         """Get a reservation by ID"""
         for reservation in self.reservations:
@@ -206,11 +392,18 @@ class RestaurantDatabase:
                 return reservation
         return None
     
+    @METRICS.timed("db_call_seconds")
+    @synchronized
     def get_reservations_by_email(self, email):
         """Get all reservations for a customer by email"""
-        # return [r for r in self.reservations if r['customer_email'].lower() == email.lower()]
-        return [r for r in self.reservations]
+        email = str(email or "").strip().lower()
+        if not email:
+            return []
+        return [r for r in self.reservations if str(r.get('customer_email', '')).lower() == email]
     
+    @METRICS.timed("db_call_seconds")
+    @idempotent
+    @synchronized
     def modify_reservation(self, reservation_id, **kwargs):
         """Modify an existing reservation"""
         for i, reservation in enumerate(self.reservations):
@@ -255,20 +448,26 @@ class RestaurantDatabase:
                             return {"success": False, "message": availability["reason"]}
                 
                 # Update the reservation
+                previous = dict(reservation)
                 for key, value in kwargs.items():
                     reservation[key] = value
                 
                 self._save_reservations()
+                self._publish(RESERVATION_MODIFIED, reservation=dict(reservation), previous=previous)
                 return {"success": True, "reservation": reservation, "message": "Reservation updated successfully"}
         
         return {"success": False, "message": "Reservation not found"}
     
+    @METRICS.timed("db_call_seconds")
+    @idempotent
+    @synchronized
     def cancel_reservation(self, reservation_id):
         """Cancel a reservation"""
         for i, reservation in enumerate(self.reservations):
             if reservation['id'] == reservation_id:
                 cancelled = self.reservations.pop(i)
                 self._save_reservations()
+                self._publish(RESERVATION_CANCELLED, reservation=cancelled)
                 return {
                     "success": True, 
                     "message": f"Reservation at {cancelled['restaurant_name']} on {cancelled['date']} at {cancelled['time']} has been cancelled"
@@ -276,42 +475,84 @@ class RestaurantDatabase:
         
         return {"success": False, "message": "Reservation not found"}
     
-    def recommend_restaurants(self, **kwargs):
+    @METRICS.timed("db_call_seconds")
+    @synchronized
+    def join_waitlist(self, customer_name, customer_email, restaurant_id,
+                      date, time, party_size, special_requests=""):
+        """Join the waitlist for a fully booked time slot"""
+        return self.waitlist.join(customer_name, customer_email, restaurant_id,
+                                  date, time, party_size, special_requests)
+    
+    @METRICS.timed("db_call_seconds")
+    @synchronized
+    def leave_waitlist(self, waitlist_id):
+        """Remove a party from the waitlist"""
+        return self.waitlist.leave(waitlist_id)
+    
+    @METRICS.timed("db_call_seconds")
+    @synchronized
+    def get_waitlist_entry(self, waitlist_id):
+        """Get a waitlist entry by ID"""
+        entry = self.waitlist.get_entry(waitlist_id)
+        return dict(entry) if entry is not None else None
+    
+    @METRICS.timed("db_call_seconds")
+    @synchronized
+    def recommend_restaurants(self, limit=RECOMMENDATION_LIMIT, max_covers=None, **kwargs):
         """
-        Recommend restaurants based on criteria and availability
-        Possible kwargs: location, cuisine, rating, party_size, date, time
+        Recommend the best restaurants for the criteria and availability
+        Possible kwargs: location, cuisine, min_rating, price_range, party_size, date, time
+        
+        Results are ranked by self.ranking (rating, free seats, price fit and
+        popularity); price_range is a preference here rather than a filter.
+        Each result carries its score, score_breakdown and a short "why".
+        
+        Args:
+            limit: Number of recommendations to return (all if None)
+            max_covers: Covers of the busiest restaurant overall, so scores from
+                different shards are comparable (this database's busiest if None)
         """
         # First filter by the search criteria
         matching_restaurants = self.search_restaurants(
             location=kwargs.get('location', ''),
             cuisine=kwargs.get('cuisine', ''),
             min_rating=kwargs.get('min_rating', 0),
-            price_range=kwargs.get('price_range', ''),
             min_capacity=kwargs.get('party_size', 0)
         )
         
-        # If date and time are provided, check availability
+        # If date and time are provided, keep the restaurants with room at that time
         if 'date' in kwargs and 'time' in kwargs and 'party_size' in kwargs:
+            try:
+                parse_date(kwargs['date'])
+                parse_time(kwargs['time'])
+                party_size = int(kwargs['party_size'])
+            except ValueError:
+                return []
+            if party_size <= 0:
+                return []
+            # One pass over the ledger for every candidate instead of one per restaurant
+            booked = self._get_booked_seats_by_restaurant(kwargs['date'], kwargs['time'])
             available_restaurants = []
             for restaurant in matching_restaurants:
-                availability = self.get_available_tables(
-                    restaurant['id'], 
-                    kwargs['date'], 
-                    kwargs['time'],
-                    kwargs['party_size']
-                )
-                if availability["available"]:
-                    restaurant['available_seats'] = availability["available_seats"]
+                available_seats = restaurant['capacity'] - booked.get(restaurant['id'], 0)
+                if available_seats >= party_size and self._is_restaurant_open(restaurant, kwargs['time']):
+                    restaurant['available_seats'] = available_seats
                     available_restaurants.append(restaurant)
-            
-            # Sort by rating (highest first)
-            return sorted(available_restaurants, key=lambda x: x['rating'], reverse=True)
+            matching_restaurants = available_restaurants
         
-        # If no date/time specified, just return matches sorted by rating
-        return sorted(matching_restaurants, key=lambda x: x['rating'], reverse=True)
+        return self.ranking.rank(matching_restaurants, limit, price_range=kwargs.get('price_range', ''),
+                                 max_covers=max_covers)
     
     def _generate_reservation_id(self):
-        """Generate a unique reservation ID"""
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        random_suffix = str(random.randint(100, 999))
-        return f"RES-{timestamp}-{random_suffix}"
\ No newline at end of file
+        """
+        Generate a unique reservation ID
+        
+        The suffix is 32 random bits, so IDs made at the same second by other
+        processes (shard workers, the app and the API server) do not collide.
+        """
+        existing = {r['id'] for r in self.reservations}
+        while True:
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            reservation_id = f"RES-{timestamp}-{uuid.uuid4().hex[:8].upper()}"
+            if reservation_id not in existing:
+                return reservation_id
\ No newline at end of file
@@ -0,0 +1,258 @@
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from metrics import METRICS
+
+# Topics published by RestaurantDatabase
+RESERVATION_CREATED = "reservation.created"
+RESERVATION_MODIFIED = "reservation.modified"
+RESERVATION_CANCELLED = "reservation.cancelled"
+
+
+def _matches(pattern: str, topic: str) -> bool:
+    """Topic patterns are exact names, `prefix.*` or `*`"""
+    if pattern == "*" or pattern == topic:
+        return True
+    return pattern.endswith(".*") and topic.startswith(pattern[:-1])
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for data changes
+
+    Subscribers are called synchronously in the publishing thread, in
+    subscription order, so they see events in the order the mutations
+    happened. Keep callbacks short; failures are logged and never reach the
+    publisher.
+    """
+
+    def __init__(self, node_id: Optional[str] = None):
+        # Identifies events created in this process when bridged to others
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the last published event"""
+        return self._sequence
+
+    def subscribe(self, pattern: str, callback: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        """
+        Call `callback(event)` for every event whose topic matches `pattern`
+
+        Returns:
+            Callable: Function that removes the subscription
+        """
+        entry = (pattern, callback)
+        with self._lock:
+            self._subscribers = self._subscribers + [entry]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s is not entry]
+        return unsubscribe
+
+    def publish(self, topic: str, payload: Dict[str, Any], origin: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Publish an event to all matching subscribers
+
+        Args:
+            topic: Event name such as "reservation.created"
+            payload: JSON-serializable event data
+            origin: Node that produced the event (this process if omitted)
+
+        Returns:
+            Dict: The event (`seq`, `topic`, `origin`, `timestamp`, `payload`)
+        """
+        with self._lock:
+            self._sequence += 1
+            event = {
+                "seq": self._sequence,
+                "topic": topic,
+                "origin": origin or self.node_id,
+                "timestamp": time.time(),
+                "payload": payload,
+            }
+            subscribers = self._subscribers
+
+        METRICS.inc("events_published_total", topic=topic)
+        for pattern, callback in subscribers:
+            if _matches(pattern, topic):
+                try:
+                    callback(event)
+                except Exception as e:
+                    METRICS.inc("event_subscriber_errors_total", topic=topic)
+                    print(f"Error in event subscriber for {topic}: {e}")
+        return event
+
+
+class _LineConnection:
+    """
+    Newline-delimited JSON over a connected socket
+
+    Outgoing events are queued and written by a background thread, so a slow
+    peer never blocks the publisher (which may be holding the database lock).
+    """
+
+    def __init__(self, sock, on_error=None):
+        self.sock = sock
+        self._on_error = on_error
+        self._outbox = queue.Queue()
+        threading.Thread(target=self._write_loop, name="event-writer", daemon=True).start()
+
+    def send(self, event):
+        self._outbox.put(event)
+
+    def _write_loop(self):
+        while True:
+            event = self._outbox.get()
+            if event is None:
+                return
+            try:
+                self.sock.sendall((json.dumps(event, default=str) + "\n").encode("utf-8"))
+            except OSError as e:
+                if self._on_error:
+                    self._on_error(self, e)
+                return
+
+    def lines(self):
+        buffer = b""
+        while True:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                return
+            buffer += chunk
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                if line:
+                    yield json.loads(line)
+
+    def close(self):
+        self._outbox.put(None)
+        try:
+            # shutdown wakes a reader blocked in recv, close alone does not
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class SocketEventServer:
+    """
+    Share an EventBus with other local processes over a Unix domain socket
+
+    Events published locally are sent to every connected client. Events sent
+    by a client are published on the local bus and relayed to the other clients.
+    """
+
+    def __init__(self, bus: EventBus, path: str):
+        self.bus = bus
+        self.path = path
+        self._clients = []
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            os.remove(path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen()
+        self._unsubscribe = bus.subscribe("*", self._forward_local)
+        threading.Thread(target=self._accept_loop, name="event-server", daemon=True).start()
+
+    def _forward_local(self, event):
+        if event["origin"] == self.bus.node_id:
+            self._broadcast(event)
+
+    def _broadcast(self, event, exclude=None):
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            if client is not exclude:
+                client.send(event)
+
+    def _drop(self, client, error=None):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+        client.close()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                return
+            client = _LineConnection(sock, on_error=self._drop)
+            with self._lock:
+                self._clients.append(client)
+            threading.Thread(target=self._read_loop, args=(client,), name="event-server-client",
+                             daemon=True).start()
+
+    def _read_loop(self, client):
+        try:
+            for event in client.lines():
+                self.bus.publish(event["topic"], event["payload"], origin=event["origin"])
+                self._broadcast(event, exclude=client)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._drop(client)
+
+    def close(self):
+        self._unsubscribe()
+        self._server.close()
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SocketEventClient:
+    """Connect an EventBus to a SocketEventServer in another process"""
+
+    def __init__(self, bus: EventBus, path: str):
+        self.bus = bus
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        self._connection = _LineConnection(sock, on_error=self._on_error)
+        self._unsubscribe = bus.subscribe("*", self._forward_local)
+        threading.Thread(target=self._read_loop, name="event-client", daemon=True).start()
+
+    def _forward_local(self, event):
+        if event["origin"] == self.bus.node_id:
+            self._connection.send(event)
+
+    def _on_error(self, connection, error):
+        print(f"Error forwarding events: {error}")
+
+    def _read_loop(self):
+        try:
+            for event in self._connection.lines():
+                self.bus.publish(event["topic"], event["payload"], origin=event["origin"])
+        except (OSError, ValueError):
+            pass
+
+    def close(self):
+        self._unsubscribe()
+        self._connection.close()
+
+
+def connect_event_socket(bus: EventBus, path: str):
+    """
+    Join the event socket at `path`, serving it if no other process does yet
+
+    Returns:
+        SocketEventServer or SocketEventClient
+    """
+    try:
+        return SocketEventClient(bus, path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return SocketEventServer(bus, path)
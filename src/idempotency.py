@@ -0,0 +1,121 @@
+import copy
+import hashlib
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from metrics import METRICS
+
+# Results remembered per store, and how long a key can be replayed
+MAX_IDEMPOTENCY_KEYS = 10000
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+
+KEY_REUSED_MESSAGE = "This idempotency key was already used for a different request"
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable digest of JSON-like values, used to compare requests"""
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Results of mutating calls by idempotency key, bounded and expiring
+
+    A repeated key returns the stored result without running the call
+    again. Calls with the same key are serialized, so two concurrent retries
+    cannot both go through. Only successful results are kept: a failed call
+    changed nothing, so retrying it runs it again.
+    """
+
+    def __init__(self, max_entries: int = MAX_IDEMPOTENCY_KEYS, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS):
+        """
+        Args:
+            max_entries: Keys kept (least recently stored are evicted)
+            ttl_seconds: Age after which a key can no longer be replayed
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[tuple]:
+        """(request fingerprint, result) stored for a key, if still valid"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            return entry[1], entry[2]
+
+    def put(self, key: str, request_fingerprint: str, result: Dict[str, Any]):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic(), request_fingerprint, copy.deepcopy(result))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def run(self, key: str, request_fingerprint: str, call: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run `call` once per key and return its result, or the stored result on a replay
+
+        Returns:
+            Dict: The result, or a failure if the key was used for a different request
+        """
+        with self._lock:
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = [threading.Lock(), 0]
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                stored = self.get(key)
+                if stored is not None:
+                    if stored[0] != request_fingerprint:
+                        METRICS.inc("idempotency_key_conflicts_total")
+                        return {"success": False, "message": KEY_REUSED_MESSAGE}
+                    METRICS.inc("idempotent_replays_total")
+                    return copy.deepcopy(stored[1])
+                result = call()
+                if isinstance(result, dict) and result.get("success"):
+                    self.put(key, request_fingerprint, result)
+                return result
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[key]
+
+
+def idempotent(method):
+    """
+    Let a mutating method take an `idempotency_key` keyword argument
+
+    The owner needs an `idempotency` IdempotencyStore. Arguments are bound to
+    the method's signature before fingerprinting, so positional and keyword
+    calls of the same request match.
+    """
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    def wrapper(self, *args, idempotency_key=None, **kwargs):
+        if not idempotency_key:
+            return method(self, *args, **kwargs)
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = {name: value for name, value in bound.arguments.items() if name != "self"}
+        return self.idempotency.run(
+            str(idempotency_key), fingerprint(method.__name__, arguments), lambda: method(self, *args, **kwargs)
+        )
+    return wrapper
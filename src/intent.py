@@ -0,0 +1,237 @@
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+# Older IDs end in three digits, newer ones in eight hex digits
+RESERVATION_ID_PATTERN = re.compile(r"\bRES-\d{14}-(?:[0-9A-F]{8}|\d{3})\b", re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b")
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+DMY_DATE_PATTERN = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+RELATIVE_DATE_PATTERN = re.compile(r"\b(today|tonight|tomorrow)\b", re.IGNORECASE)
+WEEKDAY_PATTERN = re.compile(
+    r"\b(?:(this|next|on)\s+)?(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b",
+    re.IGNORECASE
+)
+TIME_PATTERN = re.compile(
+    r"\b(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm|a\.m\.|p\.m\.)"
+    r"|\b(?:at\s+)?([01]?\d|2[0-3]):([0-5]\d)\b",
+    re.IGNORECASE
+)
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+_NUMBER = r"(\d{1,3}|" + "|".join(NUMBER_WORDS) + r")"
+PARTY_SIZE_PATTERNS = (
+    re.compile(r"\b(?:table|reservation|booking|seats?)\s+for\s+" + _NUMBER + r"\b", re.IGNORECASE),
+    re.compile(r"\bparty\s+of\s+" + _NUMBER + r"\b", re.IGNORECASE),
+    re.compile(r"\b" + _NUMBER + r"\s+(?:people|persons|guests|pax|adults|of us)\b", re.IGNORECASE),
+    re.compile(r"\bfor\s+" + _NUMBER + r"\b(?!\s*(?::|am|pm|a\.m|p\.m))", re.IGNORECASE),
+)
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+NON_WORD_PATTERN = re.compile(r"[^\w<>]+")
+
+# Intent cues used by IntentRouter
+CANCEL_PATTERN = re.compile(r"\b(cancel|delete|remove|drop)\b", re.IGNORECASE)
+MODIFY_PATTERN = re.compile(r"\b(change|modify|move|update|reschedule|edit|shift)\b", re.IGNORECASE)
+NEGATION_PATTERN = re.compile(r"\b(don'?t|do not|not|never|no)\b", re.IGNORECASE)
+LOOKUP_PATTERN = re.compile(r"\b(show|status|details?|check|find|look ?up|view|see|get|what)\b", re.IGNORECASE)
+MY_RESERVATIONS_PATTERN = re.compile(
+    r"^(?:please )?(?:show|list|view|see|get|display|what are|check)(?: me)? (?:all )?(?:of )?my "
+    r"(?:reservations|bookings)(?: please)?$"
+)
+AVAILABILITY_PATTERN = re.compile(r"\b(available|availability|free|open|space|room)\b", re.IGNORECASE)
+SEARCH_PATTERN = re.compile(
+    r"^(?:please )?(?:show|list|find)(?: me)?(?: all)?(?: the)? (?:<cuisine> )?(?:restaurants|places)"
+    r"(?: in <location>)?(?: please)?$"
+)
+
+
+def _resolve_weekday(name: str, qualifier: Optional[str], today: datetime) -> str:
+    """Date of the next `name` weekday (today counts unless 'next' is used)"""
+    days_ahead = (WEEKDAYS.index(name.lower()) - today.weekday()) % 7
+    if qualifier and qualifier.lower() == "next" and days_ahead == 0:
+        days_ahead = 7
+    return (today + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
+
+
+class SlotExtractor:
+    """
+    Rule-based extraction of reservation slots from a chat message
+
+    Recognizes reservation IDs, emails, dates, times, party sizes and the
+    restaurant names, locations and cuisines of the catalog. The message with
+    every recognized span replaced by a `<slot>` placeholder is returned as the
+    template, which identifies the shape of the request independent of its values.
+    """
+
+    def __init__(self, restaurants: Iterable[Dict[str, Any]] = ()):
+        self.locations = {}
+        self.cuisines = {}
+        self.restaurant_names = {}
+        for restaurant in restaurants:
+            self.locations[str(restaurant["location"]).lower()] = restaurant["location"]
+            self.cuisines[str(restaurant["cuisine"]).lower()] = restaurant["cuisine"]
+            self.restaurant_names[str(restaurant["name"]).lower()] = restaurant
+        self._vocabulary_patterns = [
+            (slot, self._phrase_pattern(values))
+            for slot, values in (("restaurant", self.restaurant_names),
+                                 ("location", self.locations),
+                                 ("cuisine", self.cuisines))
+            if values
+        ]
+
+    @staticmethod
+    def _phrase_pattern(phrases: Iterable[str]):
+        # Longest phrases first so "South Indian" wins over "Indian"
+        alternatives = sorted(phrases, key=len, reverse=True)
+        return re.compile(r"\b(" + "|".join(re.escape(p) for p in alternatives) + r")\b", re.IGNORECASE)
+
+    def extract(self, message: str, today: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Extract slots from `message`
+
+        Returns:
+            Dict: `slots` (slot name to normalized value), `template` (normalized
+            message with placeholders) and `text` (the original message)
+        """
+        today = today or datetime.now()
+        slots = {}
+        spans = []
+
+        def claim(slot, match, value, group=0):
+            start, end = match.span(group)
+            if any(start < s_end and s_start < end for s_start, s_end, _ in spans):
+                return False
+            spans.append((start, end, slot))
+            slots.setdefault(slot, value)
+            return True
+
+        for match in RESERVATION_ID_PATTERN.finditer(message):
+            claim("reservation_id", match, match.group(0).upper())
+        for match in EMAIL_PATTERN.finditer(message):
+            claim("customer_email", match, match.group(0).lower())
+
+        for match in ISO_DATE_PATTERN.finditer(message):
+            try:
+                value = datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            except ValueError:
+                continue
+            claim("date", match, value.strftime("%Y-%m-%d"))
+        for match in DMY_DATE_PATTERN.finditer(message):
+            try:
+                value = datetime(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+            except ValueError:
+                continue
+            claim("date", match, value.strftime("%Y-%m-%d"))
+        for match in RELATIVE_DATE_PATTERN.finditer(message):
+            offset = 1 if match.group(1).lower() == "tomorrow" else 0
+            claim("date", match, (today + timedelta(days=offset)).strftime("%Y-%m-%d"))
+        for match in WEEKDAY_PATTERN.finditer(message):
+            claim("date", match, _resolve_weekday(match.group(2), match.group(1), today))
+
+        for match in TIME_PATTERN.finditer(message):
+            if match.group(3):
+                hour, minute = int(match.group(1)), int(match.group(2) or 0)
+                if not 1 <= hour <= 12 or minute > 59:
+                    continue
+                hour = hour % 12 + (12 if match.group(3).lower().startswith("p") else 0)
+            else:
+                hour, minute = int(match.group(4)), int(match.group(5))
+            claim("time", match, f"{hour:02d}:{minute:02d}")
+
+        for pattern in PARTY_SIZE_PATTERNS:
+            for match in pattern.finditer(message):
+                raw = match.group(1).lower()
+                value = NUMBER_WORDS.get(raw) or int(raw)
+                if value > 0:
+                    claim("party_size", match, value, group=1)
+
+        for slot, pattern in self._vocabulary_patterns:
+            for match in pattern.finditer(message):
+                key = match.group(1).lower()
+                if slot == "restaurant":
+                    restaurant = self.restaurant_names[key]
+                    if claim("restaurant", match, restaurant["name"]):
+                        slots.setdefault("restaurant_id", int(restaurant["id"]))
+                elif slot == "location":
+                    claim("location", match, self.locations[key])
+                else:
+                    claim("cuisine", match, self.cuisines[key])
+
+        return {"text": message, "slots": slots, "template": self._template(message, spans)}
+
+    @staticmethod
+    def _template(message: str, spans: List) -> str:
+        """Lowercase the message, replace claimed spans and strip punctuation"""
+        parts = []
+        position = 0
+        for start, end, slot in sorted(spans):
+            parts.append(message[position:start])
+            parts.append(f" <{slot}> ")
+            position = end
+        parts.append(message[position:])
+        return " ".join(NON_WORD_PATTERN.sub(" ", "".join(parts).lower()).split())
+
+
+
+class IntentRouter:
+    """
+    Map clearly structured chat messages straight to a tool call
+
+    Only a handful of unambiguous shapes are recognized (cancel or look up a
+    reservation ID, list my reservations, check availability with every slot
+    given, plain catalog searches). Anything else returns None and goes to the model.
+    """
+
+    def __init__(self, min_confidence: float = 0.9):
+        self.min_confidence = min_confidence
+
+    def route(self, parsed: Dict[str, Any], customer_email: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Route a message parsed by SlotExtractor
+
+        Args:
+            parsed: Result of SlotExtractor.extract
+            customer_email: Email of the signed-in customer, if known
+
+        Returns:
+            Dict: `tool`, `arguments` and `confidence`, or None to use the model
+        """
+        text = parsed["text"]
+        slots = parsed["slots"]
+        template = parsed["template"]
+        if NEGATION_PATTERN.search(text):
+            return None
+
+        decision = None
+        reservation_id = slots.get("reservation_id")
+        if reservation_id:
+            if CANCEL_PATTERN.search(text) and not MODIFY_PATTERN.search(text):
+                decision = ("cancel_reservation", {"reservation_id": reservation_id}, 0.95)
+            elif not CANCEL_PATTERN.search(text) and not MODIFY_PATTERN.search(text):
+                confidence = 0.95 if LOOKUP_PATTERN.search(text) or template == "<reservation_id>" else 0.0
+                decision = ("get_reservation", {"reservation_id": reservation_id}, confidence)
+        elif MY_RESERVATIONS_PATTERN.match(template.replace(" <customer_email>", "")):
+            # Only the signed-in customer's own reservations; an email typed in the message goes to the model
+            typed = slots.get("customer_email")
+            if customer_email and (not typed or typed.lower() == customer_email.lower()):
+                decision = ("get_reservations_by_email", {"customer_email": customer_email}, 0.95)
+        elif (AVAILABILITY_PATTERN.search(text) and not CANCEL_PATTERN.search(text)
+              and not MODIFY_PATTERN.search(text)
+              and all(k in slots for k in ("restaurant_id", "date", "time", "party_size"))):
+            decision = ("check_availability", {
+                "restaurant_id": slots["restaurant_id"],
+                "date": slots["date"],
+                "time": slots["time"],
+                "party_size": slots["party_size"],
+            }, 0.9)
+        elif SEARCH_PATTERN.match(template):
+            arguments = {key: slots[key] for key in ("cuisine", "location") if key in slots}
+            if arguments:
+                decision = ("search_restaurants", arguments, 0.9)
+
+        if decision is None or decision[2] < self.min_confidence:
+            return None
+        tool, arguments, confidence = decision
+        return {"tool": tool, "arguments": arguments, "confidence": confidence}
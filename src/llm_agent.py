@@ -1,20 +1,33 @@
 import os
 import json
-from openai import OpenAI
+import time
+import uuid
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Union
 from dotenv import load_dotenv
+from idempotency import fingerprint
+from intent import IntentRouter, SlotExtractor
+from llm_client import LLMClientPool, LLMUnavailableError
+from metrics import METRICS
+from profiling import PROFILER
+from semantic_cache import SemanticCache
+from session_store import SessionStore, summarize_messages, visible_messages
+from tool_registry import ToolRegistry
+from tool_results import MAX_LIST_ITEMS, encode_tool_result, shape_tool_result
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Messages kept in the history sent to the model; older turns are summarized
+MAX_HISTORY_MESSAGES = 40
+
 # Define tools that the LLM can use
 TOOLS = [
     {
         "type": "function",
         "function": {
             "name": "search_restaurants",
-            "description": "Search for restaurants based on location, cuisine type, or other criteria",
+            "description": "Search for restaurants based on location, cuisine type, name, or other criteria (spelling mistakes are tolerated)",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -28,6 +41,8 @@ TOOLS = [
                     },
                     "min_rating": {
                         "type": "number",
+                        "minimum": 0,
+                        "maximum": 5,
                         "description": "Minimum rating of the restaurant (1-5)",
                     },
                     "price_range": {
@@ -36,7 +51,29 @@ TOOLS = [
                     },
                     "min_capacity": {
                         "type": "integer",
+                        "minimum": 1,
                         "description": "Minimum seating capacity required",
+                    },
+                    "name": {
+                        "type": "string",
+                        "description": "Restaurant name or part of it",
+                    },
+                    "latitude": {
+                        "type": "number",
+                        "minimum": -90,
+                        "maximum": 90,
+                        "description": "Customer latitude, to sort results by distance",
+                    },
+                    "longitude": {
+                        "type": "number",
+                        "minimum": -180,
+                        "maximum": 180,
+                        "description": "Customer longitude, to sort results by distance",
+                    },
+                    "max_distance_km": {
+                        "type": "number",
+                        "minimum": 0,
+                        "description": "Only restaurants within this distance (requires latitude and longitude)",
                     }
                 },
                 "required": []
@@ -47,7 +84,7 @@ TOOLS = [
         "type": "function",
         "function": {
             "name": "recommend_restaurants",
-            "description": "Get restaurant recommendations based on user preferences and availability",
+            "description": "Get the best restaurants for the user's preferences and availability, ranked by rating, free seats, price fit and popularity, each with a short reason",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -61,23 +98,34 @@ TOOLS = [
                     },
                     "party_size": {
                         "type": "integer",
+                        "minimum": 1,
                         "description": "Number of people in the party",
                     },
                     "date": {
                         "type": "string",
+                        "format": "date",
                         "description": "Date for the reservation (YYYY-MM-DD format)",
                     },
                     "time": {
                         "type": "string",
+                        "format": "time",
                         "description": "Time for the reservation (HH:MM format in 24-hour)",
                     },
                     "min_rating": {
                         "type": "number",
+                        "minimum": 0,
+                        "maximum": 5,
                         "description": "Minimum rating (1-5)",
                     },
                     "price_range": {
                         "type": "string",
-                        "description": "Price range ($ = budget, $$ = mid-range, $$$ = high-end, $$$$ = fine dining)",
+                        "description": "Preferred price range ($ = budget, $$ = mid-range, $$$ = high-end, $$$$ = fine dining); closer matches rank higher",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": 20,
+                        "description": "Number of recommendations to return (default 5)",
                     }
                 },
                 "required": []
@@ -94,18 +142,22 @@ TOOLS = [
                 "properties": {
                     "restaurant_id": {
                         "type": "integer",
+                        "minimum": 1,
                         "description": "ID of the restaurant",
                     },
                     "date": {
                         "type": "string",
+                        "format": "date",
                         "description": "Date for the reservation (YYYY-MM-DD format)",
                     },
                     "time": {
                         "type": "string",
+                        "format": "time",
                         "description": "Time for the reservation (HH:MM format in 24-hour)",
                     },
                     "party_size": {
                         "type": "integer",
+                        "minimum": 1,
                         "description": "Number of people in the party",
                     }
                 },
@@ -127,22 +179,27 @@ TOOLS = [
                     },
                     "customer_email": {
                         "type": "string",
+                        "format": "email",
                         "description": "Email address of the customer",
                     },
                     "restaurant_id": {
                         "type": "integer",
+                        "minimum": 1,
                         "description": "ID of the restaurant",
                     },
                     "date": {
                         "type": "string",
+                        "format": "date",
                         "description": "Date for the reservation (YYYY-MM-DD format)",
                     },
                     "time": {
                         "type": "string",
+                        "format": "time",
                         "description": "Time for the reservation (HH:MM format in 24-hour)",
                     },
                     "party_size": {
                         "type": "integer",
+                        "minimum": 1,
                         "description": "Number of people in the party",
                     },
                     "special_requests": {
@@ -181,6 +238,7 @@ TOOLS = [
                 "properties": {
                     "customer_email": {
                         "type": "string",
+                        "format": "email",
                         "description": "Email address of the customer",
                     }
                 },
@@ -202,18 +260,22 @@ TOOLS = [
                     },
                     "date": {
                         "type": "string",
+                        "format": "date",
                         "description": "New date for the reservation (YYYY-MM-DD format)",
                     },
                     "time": {
                         "type": "string",
+                        "format": "time",
                         "description": "New time for the reservation (HH:MM format in 24-hour)",
                     },
                     "party_size": {
                         "type": "integer",
+                        "minimum": 1,
                         "description": "New number of people in the party",
                     },
                     "restaurant_id": {
                         "type": "integer",
+                        "minimum": 1,
                         "description": "ID of a new restaurant (if changing location)",
                     },
                     "special_requests": {
@@ -241,12 +303,107 @@ TOOLS = [
                 "required": ["reservation_id"]
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "join_waitlist",
+            "description": "Put a customer on the waitlist for a fully booked time; they are booked automatically when seats free up",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "customer_name": {
+                        "type": "string",
+                        "description": "Full name of the customer",
+                    },
+                    "customer_email": {
+                        "type": "string",
+                        "format": "email",
+                        "description": "Email address of the customer",
+                    },
+                    "restaurant_id": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "ID of the restaurant",
+                    },
+                    "date": {
+                        "type": "string",
+                        "format": "date",
+                        "description": "Date for the reservation (YYYY-MM-DD format)",
+                    },
+                    "time": {
+                        "type": "string",
+                        "format": "time",
+                        "description": "Time for the reservation (HH:MM format in 24-hour)",
+                    },
+                    "party_size": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Number of people in the party",
+                    },
+                    "special_requests": {
+                        "type": "string",
+                        "description": "Any special requests or notes for the reservation",
+                    }
+                },
+                "required": ["customer_name", "customer_email", "restaurant_id", "date", "time", "party_size"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "leave_waitlist",
+            "description": "Remove a customer from a waitlist",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "waitlist_id": {
+                        "type": "string",
+                        "description": "ID of the waitlist entry (starts with WL-)",
+                    }
+                },
+                "required": ["waitlist_id"]
+            }
+        }
     }
 ]
 
 
+def build_tool_registry(db) -> ToolRegistry:
+    """
+    Register the database operations behind each tool in TOOLS
+    
+    New tools only need a definition and a handler here; dispatch and
+    argument validation are handled by the registry.
+    
+    Args:
+        db: The RestaurantDatabase instance the handlers operate on
+    """
+    registry = ToolRegistry(TOOLS)
+    registry.register("search_restaurants",
+                      lambda **args: {"results": db.search_restaurants(**args)})
+    registry.register("recommend_restaurants",
+                      lambda **args: {"recommendations": db.recommend_restaurants(**args)})
+    registry.register("check_availability", db.get_available_tables)
+    registry.register("create_reservation", db.create_reservation, idempotent=True)
+    registry.register("get_reservation",
+                      lambda reservation_id: {"reservation": db.get_reservation(reservation_id)})
+    registry.register("get_reservations_by_email",
+                      lambda customer_email: {"reservations": db.get_reservations_by_email(customer_email)})
+    registry.register("modify_reservation", db.modify_reservation, idempotent=True)
+    registry.register("cancel_reservation", db.cancel_reservation, idempotent=True)
+    registry.register("join_waitlist", db.join_waitlist)
+    registry.register("leave_waitlist", db.leave_waitlist)
+    return registry
+
+
 class LLMAgent:
-    def __init__(self, db_instance, api_key=None):
+    def __init__(self, db_instance, api_key=None, max_tool_results=MAX_LIST_ITEMS,
+                 semantic_cache: Optional[SemanticCache] = None, fast_path: bool = True,
+                 llm_pool: Optional[LLMClientPool] = None, session_id: Optional[str] = None,
+                 session_store: Optional[SessionStore] = None,
+                 max_history_messages: int = MAX_HISTORY_MESSAGES):
         """
         Initialize the LLM Agent for restaurant reservations
         
@@ -254,19 +411,47 @@ class LLMAgent:
             db_instance: An instance of the RestaurantDatabase class
             api_key: API key (optional if set in environment)
             model: LLM model to use
+            max_tool_results: Maximum list items returned to the model per tool call
+            semantic_cache: Optional cache of tool plans for repeated requests
+            fast_path: Handle clearly structured requests locally without the model
+            llm_pool: Client pool to use (built from the environment by default)
+            session_id: Conversation to resume from and save to `session_store`
+            session_store: Store persisting the history (kept in memory only if None)
+            max_history_messages: History length that triggers summarizing the oldest turns
         """
         self.db = db_instance
-        self.model = "openai/gpt-4.1"
+        self.max_tool_results = max_tool_results
+        self.semantic_cache = semantic_cache
+        self.fast_path = fast_path
+        self.intent_router = IntentRouter()
+        self._slot_extractor = None
         # Use environment variable instead of hardcoding API key
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY") or os.environ.get("GITHUB_TOKEN")
 
-        self.client = OpenAI(
-            base_url="https://models.github.ai/inference",
-            api_key=self.api_key
-        )
+        # Pooled clients with retries, failover and rate limiting (see llm_client.py)
+        self.llm = llm_pool or LLMClientPool.from_env(self.api_key)
+        self.model = self.llm.primary_model
+        
+        # Set when the last turn failed because no LLM endpoint was available
+        self.service_unavailable = False
         
-        # Initialize conversation history
+        # Tool handlers and their argument validators
+        self.tools = build_tool_registry(self.db)
+        
+        # Initialize conversation history, resuming a stored session
+        self.session_id = session_id
+        self.session_store = session_store if session_id else None
+        self.max_history_messages = max_history_messages
+        # Summary of turns dropped from the history, and the stored seq of its first message
+        self.summary = ""
+        self._history_seq = 0
         self.conversation_history = []
+        if self.session_store is not None:
+            self.summary, self._history_seq, self.conversation_history = self.session_store.resume(session_id)
+        self._saved_messages = len(self.conversation_history)
+        # Idempotency keys of booking tools are scoped to the session and the user turn
+        self._session_key = session_id or uuid.uuid4().hex
+        self._turn_seq = 0
         
         # System prompt to define agent behavior
         self.system_prompt = """You are an AI reservation assistant for FoodieSpot restaurants. 
@@ -275,31 +460,131 @@ Always be polite, professional, and helpful. When making recommendations, consid
 preferences and suggest suitable restaurants.
 If information is missing to complete a task, ask for it politely.
 When dealing with reservations, always confirm the details with the customer.
+If the requested time is fully booked, offer other times or the waitlist.
 Don't share information about reservations without verifying customer identity by email.
 """
     
-    def handle_conversation(self, user_message: str) -> str:
+    @METRICS.timed("agent_turn_seconds")
+    def handle_conversation(self, user_message: str, customer_email: Optional[str] = None) -> str:
         """
         Process a user message and generate a response
         
         Args:
             user_message: The message from the user
+            customer_email: Email of the signed-in customer, used by the fast path
             
         Returns:
             str: Assistant's response
         """
+        with PROFILER.profile("agent_turn", model=self.model, message_chars=len(user_message)):
+            try:
+                return self._run_turn(user_message, customer_email)
+            finally:
+                self._save_history()
+    
+    def transcript(self) -> List[Dict[str, str]]:
+        """User messages and assistant replies of the whole session, for display"""
+        if self.session_store is not None:
+            return self.session_store.transcript(self.session_id)
+        return visible_messages(self.conversation_history)
+    
+    def _messages(self) -> List[Dict[str, Any]]:
+        """System prompt, summary of compacted turns and the history, as sent to the model"""
+        system_prompt = self.system_prompt
+        if self.summary:
+            system_prompt += f"Earlier in this conversation (summarized):\n{self.summary}\n"
+        return [{"role": "system", "content": system_prompt}] + self.conversation_history
+    
+    def _save_history(self):
+        """Store the messages of the last turn and compact the history when it grows too long"""
+        if self.session_store is not None:
+            try:
+                self.session_store.append(self.session_id, self._history_seq + self._saved_messages,
+                                          self.conversation_history[self._saved_messages:])
+            except Exception as e:
+                METRICS.inc("session_save_failures_total")
+                print(f"Error saving conversation {self.session_id}: {e}")
+                return
+        self._saved_messages = len(self.conversation_history)
+        if len(self.conversation_history) > self.max_history_messages:
+            self._compact_history()
+    
+    def _compact_history(self):
+        """Replace the oldest whole turns with a summary, keeping about half the limit"""
+        keep = self.max_history_messages // 2
+        cut = next((i for i, message in enumerate(self.conversation_history)
+                    if message.get("role") == "user" and len(self.conversation_history) - i <= keep), None)
+        if not cut:
+            return
+        self.summary = summarize_messages(self.conversation_history[:cut], self.summary)
+        self._history_seq += cut
+        self._saved_messages -= cut
+        self.conversation_history = self.conversation_history[cut:]
+        METRICS.inc("conversation_compactions_total")
+        if self.session_store is not None:
+            try:
+                self.session_store.save_summary(self.session_id, self._history_seq - 1, self.summary)
+            except Exception as e:
+                print(f"Error saving conversation summary {self.session_id}: {e}")
+    
+    def _run_turn(self, user_message: str, customer_email: Optional[str] = None) -> str:
+        """Run one user turn: plan with tools, execute them and compose the answer"""
+        is_first_turn = not self.conversation_history and not self.summary
+        self.service_unavailable = False
+        
         # Add user message to history
         self.conversation_history.append({"role": "user", "content": user_message})
+        self._turn_seq = self._history_seq + len(self.conversation_history) - 1
         
         try:
+            parsed = None
+            if self.fast_path or self.semantic_cache is not None:
+                parsed = self._get_slot_extractor().extract(user_message)
+            
+            # Structured requests go straight to the tool without any completion
+            if self.fast_path:
+                route = self.intent_router.route(parsed, customer_email)
+                reply = self._run_fast_path(route, customer_email) if route else None
+                METRICS.inc("fast_path_requests_total", result="hit" if reply is not None else "miss")
+                if reply is not None:
+                    return reply
+            
+            # Reuse a cached tool plan for a matching request and skip the planning call
+            if self.semantic_cache is not None:
+                cached_calls = self.semantic_cache.lookup(parsed)
+                if cached_calls is not None:
+                    METRICS.inc("semantic_cache_requests_total", result="hit")
+                    tool_calls = [
+                        {
+                            "id": f"cached_{uuid.uuid4().hex[:12]}",
+                            "name": call["name"],
+                            "arguments": json.dumps(call["arguments"])
+                        }
+                        for call in cached_calls
+                    ]
+                    self.conversation_history.append({
+                        "role": "assistant",
+                        "content": None,
+                        "tool_calls": [
+                            {
+                                "id": call["id"],
+                                "type": "function",
+                                "function": {"name": call["name"], "arguments": call["arguments"]}
+                            }
+                            for call in tool_calls
+                        ]
+                    })
+                    return self._answer_with_tools(tool_calls)
+                METRICS.inc("semantic_cache_requests_total", result="miss")
+            
             # Prepare messages for the API call
-            messages = [{"role": "system", "content": self.system_prompt}] + self.conversation_history
+            messages = self._messages()
             
             # Call the API with tool definition
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = self._complete(
+                stage="plan",
                 messages=messages,
-                tools=TOOLS,
+                tools=self.tools.definitions,
                 tool_choice="auto"
             )
             
@@ -310,98 +595,220 @@ Don't share information about reservations without verifying customer identity b
             
             # Check if the model wanted to call a function
             if hasattr(assistant_message, 'tool_calls') and assistant_message.tool_calls:
-                tool_responses = []
+                tool_calls = [
+                    {"id": tool_call.id, "name": tool_call.function.name, "arguments": tool_call.function.arguments}
+                    for tool_call in assistant_message.tool_calls
+                ]
                 
-                for tool_call in assistant_message.tool_calls:
-                    # Extract function name and arguments
-                    function_name = tool_call.function.name
-                    
-                    # Add error handling for JSON parsing
-                    try:
-                        function_args = json.loads(tool_call.function.arguments)
-                    except json.JSONDecodeError:
-                        error_response = {"error": "Failed to parse function arguments"}
-                        tool_responses.append({
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",
-                            "content": json.dumps(error_response)
-                        })
-                        continue
-                    
-                    # Call the appropriate database function based on the tool called
-                    tool_response = self._execute_tool(function_name, function_args)
-                    
-                    # Add tool response
-                    tool_responses.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "content": json.dumps(tool_response)
-                    })
-                
-                # Add all tool responses to the conversation history
-                self.conversation_history.extend(tool_responses)
-                
-                # Get a new response from the model that incorporates the tool results
-                second_response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[{"role": "system", "content": self.system_prompt}] + self.conversation_history
-                )
-                
-                # Add the final response to the conversation history
-                final_message = second_response.choices[0].message
-                self.conversation_history.append(final_message.model_dump())
+                # Only plans made without earlier context are safe to reuse for other users
+                if self.semantic_cache is not None and parsed is not None and is_first_turn:
+                    self.semantic_cache.store(parsed, [(call["name"], call["arguments"]) for call in tool_calls])
                 
-                return final_message.content or ""
+                return self._answer_with_tools(tool_calls)
 
             # if no tool was called, just return the assistant response
             return assistant_message.content or ""
             
+        except LLMUnavailableError as e:
+            self.service_unavailable = True
+            reason = "we've hit a usage limit" if e.rate_limited else "the service is not responding"
+            error_message = (f"I'm sorry, our AI assistant is temporarily unavailable ({reason}). "
+                             "Please try again later.")
+            self.conversation_history.append({"role": "assistant", "content": error_message})
+            return error_message
         except Exception as e:
             error_message = f"I apologize, but I encountered an error: {str(e)}"
             self.conversation_history.append({"role": "assistant", "content": error_message})
             return error_message
     
-    def _execute_tool(self, function_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    def _answer_with_tools(self, tool_calls: List[Dict[str, str]]) -> str:
         """
-        Execute the appropriate function based on the tool called by the LLM
+        Execute planned tool calls and let the model answer from their results
         
         Args:
-            function_name: Name of the function to call
-            args: Arguments to pass to the function
+            tool_calls: Dicts with the call `id`, function `name` and JSON `arguments`
             
         Returns:
-            Dict: Result of the function call
+            str: Assistant's response
         """
-        try:
-            if function_name == "search_restaurants":
-                return {"results": self.db.search_restaurants(**args)}
-            
-            elif function_name == "recommend_restaurants":
-                return {"recommendations": self.db.recommend_restaurants(**args)}
-            
-            elif function_name == "check_availability":
-                return self.db.get_available_tables(**args)
-            
-            elif function_name == "create_reservation":
-                return self.db.create_reservation(**args)
+        tool_responses = []
+        
+        for tool_call in tool_calls:
+            # Extract function name and arguments
+            function_name = tool_call["name"]
             
-            elif function_name == "get_reservation":
-                reservation = self.db.get_reservation(args["reservation_id"])
-                return {"reservation": reservation}
+            # Add error handling for JSON parsing
+            try:
+                function_args = json.loads(tool_call["arguments"])
+            except json.JSONDecodeError:
+                error_response = {"error": "Failed to parse function arguments"}
+                tool_responses.append({
+                    "tool_call_id": tool_call["id"],
+                    "role": "tool",
+                    "content": encode_tool_result(error_response)
+                })
+                continue
             
-            elif function_name == "get_reservations_by_email":
-                reservations = self.db.get_reservations_by_email(args["customer_email"])
-                return {"reservations": reservations}
+            # Call the appropriate database function based on the tool called
+            tool_response = self._execute_tool(function_name, function_args)
             
-            elif function_name == "modify_reservation":
-                reservation_id = args.pop("reservation_id")
-                return self.db.modify_reservation(reservation_id, **args)
+            # Add tool response, reduced to the fields the model needs
+            tool_responses.append({
+                "tool_call_id": tool_call["id"],
+                "role": "tool",
+                "content": encode_tool_result(
+                    shape_tool_result(function_name, tool_response, self.max_tool_results)
+                )
+            })
+        
+        # Add all tool responses to the conversation history
+        self.conversation_history.extend(tool_responses)
+        
+        # Get a new response from the model that incorporates the tool results
+        second_response = self._complete(
+            stage="answer",
+            messages=self._messages()
+        )
+        
+        # Add the final response to the conversation history
+        final_message = second_response.choices[0].message
+        self.conversation_history.append(final_message.model_dump())
+        
+        return final_message.content or ""
+    
+    def _run_fast_path(self, route: Dict[str, Any], customer_email: Optional[str]) -> Optional[str]:
+        """
+        Execute a routed tool call locally and reply from a template
+        
+        The call and its result are added to the history as a regular tool
+        exchange so later model turns keep the context.
+        
+        Returns:
+            str: Assistant's response, or None to fall back to the model
+        """
+        tool, arguments = route["tool"], route["arguments"]
+        
+        # Reservation IDs are only acted on for the customer who owns them
+        if "reservation_id" in arguments:
+            reservation = self.db.get_reservation(arguments["reservation_id"])
+            if (reservation is None or not customer_email or
+                    str(reservation.get("customer_email", "")).lower() != customer_email.lower()):
+                return None
+        
+        # "My reservations" always means the signed-in customer's, never an email from the message
+        if tool == "get_reservations_by_email":
+            if not customer_email:
+                return None
+            arguments = {**arguments, "customer_email": customer_email}
+        
+        result = self._execute_tool(tool, dict(arguments))
+        if "error" in result:
+            return None
+        reply = self._format_fast_path_reply(tool, result)
+        
+        call_id = f"fastpath_{uuid.uuid4().hex[:12]}"
+        self.conversation_history.extend([
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": tool, "arguments": json.dumps(arguments)}
+                }]
+            },
+            {
+                "tool_call_id": call_id,
+                "role": "tool",
+                "content": encode_tool_result(shape_tool_result(tool, result, self.max_tool_results))
+            },
+            {"role": "assistant", "content": reply}
+        ])
+        return reply
+    
+    def _format_fast_path_reply(self, tool: str, result: Dict[str, Any]) -> str:
+        """Render a tool result as a short assistant message"""
+        if tool in ("cancel_reservation", "create_reservation", "modify_reservation"):
+            return result["message"]
+        
+        if tool == "get_reservation":
+            r = result["reservation"]
+            return (f"Here are the details of reservation {r['id']}: {r['restaurant_name']} on {r['date']} "
+                    f"at {r['time']} for {r['party_size']} people"
+                    f"{' (special requests: ' + r['special_requests'] + ')' if r.get('special_requests') else ''}.")
+        
+        if tool == "get_reservations_by_email":
+            reservations = result["reservations"]
+            if not reservations:
+                return "I couldn't find any reservations for you. Would you like to make one?"
+            lines = [f"- {r['restaurant_name']} on {r['date']} at {r['time']} for {r['party_size']} people (ID: {r['id']})"
+                     for r in reservations]
+            return "Here are your reservations:\n" + "\n".join(lines)
+        
+        if tool == "check_availability":
+            if result["available"]:
+                return (f"Good news! {result['restaurant']['name']} has {result['available_seats']} seats "
+                        f"available at that time. Would you like me to book it?")
+            return f"Sorry, that slot isn't available: {result['reason']}"
+        
+        if tool == "search_restaurants":
+            restaurants = result["results"]
+            if not restaurants:
+                return "I couldn't find any restaurants matching that. Could you try another cuisine or area?"
+            shown = shape_tool_result(tool, result, self.max_tool_results)["results"]
+            lines = [f"- {r['name']} ({r['cuisine']}, {r['location']}) - rated {r['rating']}, {r['price_range']}"
+                     for r in shown]
+            more = f"\n...and {len(restaurants) - len(shown)} more." if len(restaurants) > len(shown) else ""
+            return "Here are some restaurants you might like:\n" + "\n".join(lines) + more
+        
+        return encode_tool_result(result)
+    
+    def _get_slot_extractor(self) -> SlotExtractor:
+        """Slot extractor over the current restaurant catalog (rebuilt when the catalog reloads)"""
+        catalog = self.db.catalog
+        if self._slot_extractor is None or self._slot_extractor[0] != catalog.version:
+            self._slot_extractor = (catalog.version, SlotExtractor(catalog.by_id.values()))
+        return self._slot_extractor[1]
+    
+    def _complete(self, stage: str, **kwargs):
+        """
+        Run a single chat completion and record its latency and token usage
+        
+        Args:
+            stage: Label for the metrics ("plan" for the tool-choosing call, "answer" for the final one)
+            **kwargs: Extra arguments for `chat.completions.create` (the model comes from the pool)
             
-            elif function_name == "cancel_reservation":
-                return self.db.cancel_reservation(args["reservation_id"])
+        Returns:
+            The raw completion response
+        """
+        with METRICS.timer("llm_completion_seconds", stage=stage):
+            response, endpoint = self.llm.create(**kwargs)
+        
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            METRICS.inc("llm_prompt_tokens_total", usage.prompt_tokens or 0, model=endpoint.model)
+            METRICS.inc("llm_completion_tokens_total", usage.completion_tokens or 0, model=endpoint.model)
+        return response
+    
+    def _execute_tool(self, function_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Execute the appropriate function based on the tool called by the LLM
+        
+        Args:
+            function_name: Name of the function to call
+            args: Arguments to pass to the function
             
-            else:
-                return {"error": f"Unknown function: {function_name}"}
-                
-        except Exception as e:
-            return {"error": f"Error executing {function_name}: {str(e)}"}
\ No newline at end of file
+        Returns:
+            Dict: Result of the function call
+        """
+        # Repeated booking calls within a turn (model retries, replayed plans) are applied once
+        idempotency_key = None
+        if self.tools.is_idempotent(function_name):
+            idempotency_key = f"agent:{self._session_key}:{self._turn_seq}:{fingerprint(function_name, args)}"
+        start = time.perf_counter()
+        with METRICS.timer("tool_call_seconds", tool=function_name):
+            result = self.tools.dispatch(function_name, args, idempotency_key)
+        PROFILER.record_tool_call(function_name, args, time.perf_counter() - start)
+        if "error" in result:
+            METRICS.inc("tool_call_errors_total", tool=function_name)
+        return result
@@ -0,0 +1,349 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import openai
+from openai import OpenAI, DefaultHttpxClient
+
+from metrics import METRICS
+
+DEFAULT_BASE_URL = "https://models.github.ai/inference"
+DEFAULT_MODEL = "openai/gpt-4.1"
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no endpoint could serve a completion"""
+
+    def __init__(self, message: str, rate_limited: bool = False):
+        super().__init__(message)
+        self.rate_limited = rate_limited
+
+
+class TokenBucket:
+    """Token-bucket rate limiter (`rate` tokens per second, bursts up to `capacity`)"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests to an endpoint after repeated failures
+
+    After `failure_threshold` consecutive failures the circuit opens for
+    `reset_timeout` seconds, then lets a single trial request through
+    (half-open). A success closes it again, a failure re-opens it, and any
+    other outcome frees the trial slot for the next request.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """End a trial request that neither proved nor disproved the endpoint"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Returns True if this failure opened the circuit"""
+        with self._lock:
+            self._failures += 1
+            was_open = self._opened_at is not None
+            if was_open or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                return not was_open
+            return False
+
+
+class Endpoint:
+    """One OpenAI-compatible endpoint/model pair with its own connection pool"""
+
+    def __init__(self, base_url: str, model: str, api_key: Optional[str], name: Optional[str] = None,
+                 requests_per_minute: Optional[float] = None, timeout: float = 30.0,
+                 max_connections: int = 20, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name or f"{model}@{base_url}"
+        self.base_url = base_url
+        self.model = model
+        self.client = OpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            timeout=timeout,
+            # Retries are handled by the pool so they can fail over between endpoints
+            max_retries=0,
+            http_client=DefaultHttpxClient(
+                limits=httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_connections,
+                                    keepalive_expiry=60.0)
+            )
+        )
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.bucket = TokenBucket(requests_per_minute / 60.0) if requests_per_minute else None
+
+    def create(self, **kwargs):
+        return self.client.chat.completions.create(model=self.model, **kwargs)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """
+    Transient failures worth retrying on this or another endpoint
+
+    Timeouts, connection errors, 429 and 5xx only; other 4xx responses are
+    configuration or request errors and are raised immediately.
+    """
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 429) or error.status_code >= 500
+    return False
+
+
+class LLMClientPool:
+    """
+    Chat completions with retries, hedging, circuit breaking and rate limiting
+
+    Endpoints are tried in order of preference. Each attempt goes to the first
+    endpoint whose circuit is closed and whose rate limit has room; transient
+    errors are retried with jittered exponential backoff on the next endpoint.
+    With `hedge_after` set, a request that has not answered within that many
+    seconds is duplicated on another endpoint and the first answer wins.
+    """
+
+    def __init__(self, endpoints: List[Endpoint], max_attempts: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, hedge_after: Optional[float] = None,
+                 max_queue_wait: float = 10.0):
+        """
+        Args:
+            endpoints: Endpoints in order of preference
+            max_attempts: Attempts per completion across all endpoints
+            backoff_base: Base delay in seconds for exponential backoff
+            backoff_max: Maximum backoff delay in seconds
+            hedge_after: Seconds before a slow request is hedged (None disables hedging)
+            max_queue_wait: Longest time to wait for a rate-limit token
+        """
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+        self.endpoints = endpoints
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.max_queue_wait = max_queue_wait
+        self._executor = ThreadPoolExecutor(max_workers=16 * len(endpoints), thread_name_prefix="llm")
+
+    @classmethod
+    def from_env(cls, api_key: Optional[str] = None) -> "LLMClientPool":
+        """
+        Build a pool from the environment
+
+        LLM_ENDPOINTS may hold a JSON list of endpoints, each with `base_url`,
+        `model` and optionally `api_key_env`, `requests_per_minute` and `timeout`.
+        Without it a single endpoint is built from MODEL_NAME and LLM_BASE_URL.
+        """
+        default_key = api_key or os.environ.get("OPENAI_API_KEY") or os.environ.get("GITHUB_TOKEN")
+        configs = json.loads(os.environ["LLM_ENDPOINTS"]) if os.environ.get("LLM_ENDPOINTS") else [{
+            "base_url": os.environ.get("LLM_BASE_URL", DEFAULT_BASE_URL),
+            "model": os.environ.get("MODEL_NAME", DEFAULT_MODEL),
+            "requests_per_minute": float(os.environ["LLM_REQUESTS_PER_MINUTE"])
+            if os.environ.get("LLM_REQUESTS_PER_MINUTE") else None,
+        }]
+        endpoints = [
+            Endpoint(
+                base_url=config.get("base_url", DEFAULT_BASE_URL),
+                model=config.get("model", DEFAULT_MODEL),
+                api_key=os.environ.get(config["api_key_env"]) if config.get("api_key_env") else default_key,
+                name=config.get("name"),
+                requests_per_minute=config.get("requests_per_minute"),
+                timeout=float(config.get("timeout", 30.0)),
+            )
+            for config in configs
+        ]
+        hedge_after = os.environ.get("LLM_HEDGE_AFTER")
+        return cls(
+            endpoints,
+            max_attempts=int(os.environ.get("LLM_MAX_ATTEMPTS", "3")),
+            hedge_after=float(hedge_after) if hedge_after else None,
+        )
+
+    @property
+    def primary_model(self) -> str:
+        return self.endpoints[0].model
+
+    def _acquire_endpoint(self, exclude=(), block: bool = True) -> Tuple[Optional[Endpoint], bool]:
+        """
+        Pick the first usable endpoint, waiting up to `max_queue_wait` for rate-limit tokens
+
+        Returns:
+            Tuple: The endpoint (or None) and whether rate limits were the reason for None
+        """
+        deadline = time.monotonic() + self.max_queue_wait
+        while True:
+            candidates = [e for e in self.endpoints if e not in exclude and e.breaker.state != "open"]
+            if not candidates:
+                return None, False
+            for endpoint in candidates:
+                # Only spend a rate-limit token on an endpoint the breaker lets through
+                if not endpoint.breaker.allow():
+                    continue
+                if endpoint.bucket is not None and not endpoint.bucket.try_acquire():
+                    endpoint.breaker.release_trial()
+                    continue
+                return endpoint, False
+            waits = [e.bucket.wait_time() for e in candidates if e.bucket is not None]
+            delay = min(waits) if waits else 0.05
+            if not block or time.monotonic() + delay > deadline:
+                return None, bool(waits)
+            METRICS.inc("llm_rate_limit_waits_total")
+            time.sleep(delay)
+
+    def _call(self, endpoint: Endpoint, kwargs: Dict[str, Any]):
+        """One request against one endpoint, feeding its circuit breaker"""
+        recorded = False
+        try:
+            with METRICS.timer("llm_request_seconds", endpoint=endpoint.name):
+                response = endpoint.create(**kwargs)
+            endpoint.breaker.record_success()
+            recorded = True
+            return response
+        except Exception as e:
+            if _is_retryable(e):
+                if endpoint.breaker.record_failure():
+                    METRICS.inc("llm_circuit_opened_total", endpoint=endpoint.name)
+                recorded = True
+            elif isinstance(e, openai.APIStatusError):
+                # The endpoint answered, so it is up; the request itself was rejected
+                endpoint.breaker.record_success()
+                recorded = True
+            raise
+        finally:
+            # Anything else (a local error, an interrupt) must not hold the half-open trial forever
+            if not recorded:
+                endpoint.breaker.release_trial()
+
+    def _call_hedged(self, endpoint: Endpoint, kwargs: Dict[str, Any]):
+        """Run a request and duplicate it on another endpoint if it is slow"""
+        primary = self._executor.submit(self._call, endpoint, kwargs)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result(), endpoint
+
+        # Prefer a different endpoint, but hedging on the same one still cuts tail latency
+        hedge_endpoint, _ = self._acquire_endpoint(exclude=(endpoint,), block=False)
+        if hedge_endpoint is None and endpoint.breaker.state == "closed":
+            hedge_endpoint = endpoint
+        if hedge_endpoint is None:
+            return primary.result(), endpoint
+
+        METRICS.inc("llm_hedged_requests_total", endpoint=hedge_endpoint.name)
+        hedge = self._executor.submit(self._call, hedge_endpoint, kwargs)
+        owners = {primary: endpoint, hedge: hedge_endpoint}
+        pending = set(owners)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), owners[future]
+                error = future.exception()
+        raise error
+
+    def create(self, **kwargs):
+        """
+        Run a chat completion
+
+        Returns:
+            Tuple: The completion response and the endpoint that served it
+
+        Raises:
+            LLMUnavailableError: If every attempt failed or no endpoint was usable
+            openai.APIError: For non-retryable errors such as bad requests
+        """
+        last_error = None
+        rate_limited = False
+        tried = []
+        for attempt in range(self.max_attempts):
+            # Fail over: skip endpoints that already failed this call while others remain
+            endpoint, limited = self._acquire_endpoint(exclude=tried)
+            if endpoint is None and tried:
+                endpoint, limited = self._acquire_endpoint()
+            if endpoint is None:
+                rate_limited = rate_limited or limited
+                break
+            try:
+                if self.hedge_after is not None:
+                    return self._call_hedged(endpoint, kwargs)
+                return self._call(endpoint, kwargs), endpoint
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                last_error = e
+                rate_limited = rate_limited or isinstance(e, openai.RateLimitError)
+                tried.append(endpoint)
+                METRICS.inc("llm_retries_total", endpoint=endpoint.name, error=type(e).__name__)
+                if attempt + 1 < self.max_attempts:
+                    # Full jitter keeps concurrent sessions from retrying in lockstep
+                    delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                    time.sleep(random.uniform(0, delay))
+
+        METRICS.inc("llm_unavailable_total")
+        if rate_limited:
+            reason = f"rate limit reached ({last_error})" if last_error else "rate limit reached"
+        else:
+            reason = str(last_error) if last_error else "all endpoints are temporarily unavailable"
+        raise LLMUnavailableError(f"LLM service unavailable: {reason}", rate_limited=rate_limited)
@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class MetricsRegistry:
+    """Thread-safe in-process store for counters and latency timers"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._timers = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """Increment a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, seconds, **labels):
+        """Record a single duration for a timer"""
+        key = self._key(name, labels)
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(self.buckets)}
+                self._timers[key] = timer
+            timer["count"] += 1
+            timer["sum"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    timer["buckets"][i] += 1
+                    break
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the enclosed block; exceptions are also counted in `<name>_errors_total`"""
+        base_name = name[:-len("_seconds")] if name.endswith("_seconds") else name
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc(f"{base_name}_errors_total", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        """
+        Decorator that times every call of the wrapped function
+
+        The function name is added as the `op` label unless one is given.
+        """
+        def decorator(func):
+            op_labels = {"op": func.__name__, **labels}
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **op_labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        """Drop all collected values"""
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def snapshot(self):
+        """Return a JSON-serializable copy of all metrics"""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+            timers = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": t["count"],
+                    "sum": t["sum"],
+                    "max": t["max"],
+                    "mean": t["sum"] / t["count"] if t["count"] else 0.0,
+                }
+                for (name, labels), t in self._timers.items()
+            ]
+        return {"timestamp": time.time(), "counters": counters, "timers": timers}
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        def fmt_labels(labels, extra=None):
+            items = list(labels) + (list(extra.items()) if extra else [])
+            if not items:
+                return ""
+            body = ",".join(f'{k}="{str(v)}"' for k, v in items)
+            return "{" + body + "}"
+
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            timers = sorted(self._timers.items(), key=lambda item: item[0])
+            timers = [(key, {**t, "buckets": list(t["buckets"])}) for key, t in timers]
+
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{fmt_labels(labels)} {value}")
+
+        for (name, labels), t in timers:
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, count in zip(self.buckets, t["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{fmt_labels(labels, {'le': bound})} {cumulative}")
+            lines.append(f"{name}_bucket{fmt_labels(labels, {'le': '+Inf'})} {t['count']}")
+            lines.append(f"{name}_sum{fmt_labels(labels)} {t['sum']}")
+            lines.append(f"{name}_count{fmt_labels(labels)} {t['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path):
+        """Write a snapshot to `path` using the same atomic write pattern as the database"""
+        temp_file = f"{path}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+
+
+# Process-wide registry used by the database, the agent and the app
+METRICS = MetricsRegistry()
+
+
+def start_metrics_server(port, host="127.0.0.1", registry=METRICS):
+    """
+    Serve `/metrics` in Prometheus text format from a daemon thread
+
+    Returns:
+        ThreadingHTTPServer: The running server (call `shutdown()` to stop it)
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] == "/metrics":
+                body = registry.render_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path.split("?")[0] == "/metrics.json":
+                body = json.dumps(registry.snapshot()).encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes are frequent; keep them out of the console
+            pass
+
+    server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
+
+
+def start_json_dump(path, interval=60.0, registry=METRICS):
+    """
+    Periodically dump a JSON snapshot to `path` from a daemon thread
+
+    Returns:
+        threading.Event: Set it to stop the dump loop
+    """
+    stop_event = threading.Event()
+
+    def loop():
+        while not stop_event.wait(interval):
+            try:
+                registry.dump_json(path)
+            except Exception as e:
+                print(f"Error dumping metrics: {e}")
+
+    threading.Thread(target=loop, name="metrics-dump", daemon=True).start()
+    return stop_event
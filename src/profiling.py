@@ -0,0 +1,164 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from metrics import METRICS
+
+
+class ProfileSession:
+    """State collected while one profiled block (an agent turn or an app rerun) runs"""
+
+    def __init__(self, kind, context):
+        self.kind = kind
+        self.context = dict(context)
+        self.tool_calls = []
+        self.profiler = None
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+
+    def record_tool_call(self, name, args, seconds):
+        self.tool_calls.append({
+            "tool": name,
+            "args": dict(args),
+            "elapsed_ms": round(seconds * 1000, 3),
+        })
+
+
+class TurnProfiler:
+    """
+    Capture cProfile data for blocks that exceed a latency threshold
+
+    Slow blocks are written to `output_dir` as a `.prof` file (loadable with
+    `pstats` or snakeviz) plus a `.json` sidecar holding the context, the tool
+    calls with their arguments and the top functions by cumulative time. Only the
+    newest `max_profiles` entries are kept, so the directory acts as a ring buffer.
+    """
+
+    def __init__(self, output_dir=None, threshold_ms=None, max_profiles=20, sample_rate=1.0):
+        """
+        Args:
+            output_dir: Directory for saved profiles
+            threshold_ms: Minimum duration to keep a profile; None disables profiling
+            max_profiles: Number of profiles kept on disk
+            sample_rate: Fraction of blocks that run under cProfile (0-1)
+        """
+        self.output_dir = output_dir or os.path.join(tempfile.gettempdir(), "foodiespot-profiles")
+        self.threshold_ms = threshold_ms
+        self.max_profiles = max(1, int(max_profiles))
+        self.sample_rate = sample_rate
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a profiler from the PROFILE_* environment variables"""
+        threshold = os.environ.get("PROFILE_SLOW_TURN_MS")
+        return cls(
+            output_dir=os.environ.get("PROFILE_DIR"),
+            threshold_ms=float(threshold) if threshold else None,
+            max_profiles=int(os.environ.get("PROFILE_MAX_FILES", "20")),
+            sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", "1.0")),
+        )
+
+    @property
+    def enabled(self):
+        return self.threshold_ms is not None
+
+    def record_tool_call(self, name, args, seconds):
+        """Attach a tool call to every active session on this thread"""
+        for session in getattr(self._local, "stack", None) or ():
+            session.record_tool_call(name, args, seconds)
+
+    @contextmanager
+    def profile(self, kind, **context):
+        """
+        Profile the enclosed block and save it if it is slower than the threshold
+
+        Only one cProfile instance can be active per thread, so a block nested inside
+        a profiled one is timed and saved with its tool calls but without its own
+        `.prof` file; the enclosing block's profile covers it.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        session = ProfileSession(kind, context)
+
+        nested = any(s.profiler is not None for s in stack)
+        if not nested and random.random() < self.sample_rate:
+            session.profiler = cProfile.Profile()
+            try:
+                session.profiler.enable()
+            except ValueError:
+                # Another profiling tool is already active on this thread
+                session.profiler = None
+
+        stack.append(session)
+        try:
+            yield session
+        finally:
+            if session.profiler is not None:
+                session.profiler.disable()
+            stack.pop()
+            elapsed_ms = (time.perf_counter() - session.start) * 1000
+            if elapsed_ms >= self.threshold_ms:
+                METRICS.inc("slow_blocks_total", kind=kind)
+                try:
+                    self._save(session, elapsed_ms)
+                except Exception as e:
+                    print(f"Error saving profile: {e}")
+
+    def _save(self, session, elapsed_ms):
+        """Write the profile and its metadata, then trim the ring buffer"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = session.started_at.strftime("%Y%m%d-%H%M%S-%f")
+        base = os.path.join(self.output_dir, f"{stamp}-{session.kind}")
+
+        metadata = {
+            "kind": session.kind,
+            "started_at": session.started_at.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            "elapsed_ms": round(elapsed_ms, 3),
+            "threshold_ms": self.threshold_ms,
+            "context": session.context,
+            "tool_calls": session.tool_calls,
+            "profile_file": None,
+            "top_functions": None,
+        }
+
+        if session.profiler is not None:
+            stats_buffer = io.StringIO()
+            stats = pstats.Stats(session.profiler, stream=stats_buffer)
+            stats.sort_stats("cumulative").print_stats(25)
+            stats.dump_stats(f"{base}.prof")
+            metadata["profile_file"] = os.path.basename(f"{base}.prof")
+            metadata["top_functions"] = stats_buffer.getvalue()
+
+        with self._write_lock:
+            with open(f"{base}.json", 'w') as f:
+                json.dump(metadata, f, indent=2, default=str)
+            self._prune()
+
+    def _prune(self):
+        """Delete the oldest profiles beyond `max_profiles`"""
+        entries = sorted(name[:-len(".json")] for name in os.listdir(self.output_dir)
+                         if name.endswith(".json"))
+        for stale in entries[:-self.max_profiles]:
+            for suffix in (".json", ".prof"):
+                path = os.path.join(self.output_dir, stale + suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+# Process-wide profiler configured from the environment
+PROFILER = TurnProfiler.from_env()
@@ -0,0 +1,186 @@
+import heapq
+import json
+import math
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from events import RESERVATION_CANCELLED, RESERVATION_MODIFIED
+
+# Relative importance of each signal; signals that do not apply to a request are left out
+DEFAULT_WEIGHTS = {
+    "rating": 0.45,
+    "availability": 0.25,
+    "price_fit": 0.15,
+    "popularity": 0.15,
+}
+
+
+def price_tier(price_range: Any) -> Optional[int]:
+    """Number of ₹ (or $) signs in a price range label such as "₹₹ (500-1000)" """
+    count = str(price_range or "").count("₹") or str(price_range or "").count("$")
+    return count or None
+
+
+class PopularityTracker:
+    """
+    Booked covers per restaurant, kept current from the reservation events
+
+    Built from one ledger snapshot, then updated per event, so scoring never
+    scans reservations.
+    """
+
+    def __init__(self, db):
+        self._lock = threading.Lock()
+        self._covers = defaultdict(int)
+        reservations, self._unsubscribe = db.follow_reservations(self._on_reservation_event)
+        for reservation in reservations:
+            self._add(reservation, 1)
+
+    def _add(self, reservation: Dict[str, Any], sign: int):
+        try:
+            restaurant_id, party_size = int(reservation["restaurant_id"]), int(reservation["party_size"])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._lock:
+            self._covers[restaurant_id] += sign * party_size
+
+    def _on_reservation_event(self, event):
+        payload = event["payload"]
+        if event["topic"] == RESERVATION_MODIFIED:
+            self._add(payload["previous"], -1)
+            self._add(payload["reservation"], 1)
+        else:
+            self._add(payload["reservation"], -1 if event["topic"] == RESERVATION_CANCELLED else 1)
+
+    def covers(self, restaurant_id: int) -> int:
+        return self._covers.get(int(restaurant_id), 0)
+
+    def max_covers(self) -> int:
+        with self._lock:
+            return max(self._covers.values(), default=0)
+
+
+def rating_signal(restaurant, context):
+    rating = restaurant.get("rating")
+    return None if rating is None else min(max(float(rating) / 5.0, 0.0), 1.0)
+
+
+def availability_signal(restaurant, context):
+    # Share of seats still free at the requested time (only known when a time was given)
+    seats = restaurant.get("available_seats")
+    capacity = restaurant.get("capacity")
+    if seats is None or not capacity:
+        return None
+    return min(max(float(seats) / float(capacity), 0.0), 1.0)
+
+
+def price_fit_signal(restaurant, context):
+    wanted = price_tier(context.get("price_range"))
+    tier = price_tier(restaurant.get("price_range"))
+    if wanted is None or tier is None:
+        return None
+    return max(0.0, 1.0 - abs(tier - wanted) / 3.0)
+
+
+def popularity_signal(restaurant, context):
+    popularity = context.get("popularity")
+    if popularity is None:
+        return None
+    most = context.get("max_covers") or 0
+    if most <= 0:
+        return 0.0
+    # Log scale so one very busy restaurant does not flatten everyone else
+    return math.log1p(max(popularity.covers(restaurant["id"]), 0)) / math.log1p(most)
+
+
+def _explain(restaurant, signals):
+    reasons = []
+    if signals.get("rating") is not None:
+        reasons.append(f"rated {restaurant['rating']}")
+    if signals.get("availability") is not None:
+        reasons.append(f"{restaurant['available_seats']} seats free")
+    if signals.get("price_fit") == 1.0:
+        reasons.append("in your price range")
+    if signals.get("popularity", 0) >= 0.75:
+        reasons.append("popular with other guests")
+    return ", ".join(reasons)
+
+
+class RankingEngine:
+    """
+    Weighted scoring of candidate restaurants with partial top-k selection
+
+    Each signal maps a restaurant (and the request context) to a value in
+    [0, 1], or None when it does not apply. The score is the weighted mean of
+    the applicable signals, and every ranked result carries its score, the
+    per-signal contributions and a short explanation. New signals can be
+    added with `register_signal`.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, popularity: Optional[PopularityTracker] = None):
+        """
+        Args:
+            weights: Signal weights (missing signals keep their default weight)
+            popularity: Tracker supplying the popularity signal
+        """
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.popularity = popularity
+        self.signals = {
+            "rating": rating_signal,
+            "availability": availability_signal,
+            "price_fit": price_fit_signal,
+            "popularity": popularity_signal,
+        }
+
+    @classmethod
+    def from_env(cls, popularity: Optional[PopularityTracker] = None) -> "RankingEngine":
+        """Weights may be overridden with RANKING_WEIGHTS, e.g. '{"rating": 0.6, "popularity": 0}'"""
+        weights = json.loads(os.environ["RANKING_WEIGHTS"]) if os.environ.get("RANKING_WEIGHTS") else None
+        return cls(weights, popularity)
+
+    def register_signal(self, name: str, signal: Callable[[Dict[str, Any], Dict[str, Any]], Optional[float]],
+                        weight: float):
+        self.signals[name] = signal
+        self.weights[name] = weight
+
+    def score(self, restaurant: Dict[str, Any], context: Dict[str, Any]):
+        """Weighted score and per-signal contributions of one restaurant"""
+        values = {}
+        for name, signal in self.signals.items():
+            weight = self.weights.get(name, 0.0)
+            if weight > 0:
+                value = signal(restaurant, context)
+                if value is not None:
+                    values[name] = value
+        total_weight = sum(self.weights[name] for name in values)
+        if not total_weight:
+            return 0.0, {}, values
+        contributions = {name: self.weights[name] * value / total_weight for name, value in values.items()}
+        return sum(contributions.values()), contributions, values
+
+    def rank(self, restaurants: List[Dict[str, Any]], k: Optional[int] = None,
+             **context) -> List[Dict[str, Any]]:
+        """
+        Return the `k` best restaurants (all if None), best first
+
+        Args:
+            restaurants: Candidate restaurant records (annotated in place)
+            **context: Request details used by the signals, e.g. price_range
+                (max_covers overrides the popularity scale)
+        """
+        if self.popularity is not None:
+            max_covers = context.get("max_covers")
+            context = dict(context, popularity=self.popularity,
+                           max_covers=self.popularity.max_covers() if max_covers is None else max_covers)
+        scored = []
+        for index, restaurant in enumerate(restaurants):
+            score, contributions, values = self.score(restaurant, context)
+            restaurant["score"] = round(score, 3)
+            restaurant["score_breakdown"] = {name: round(c, 3) for name, c in contributions.items()}
+            restaurant["why"] = _explain(restaurant, values)
+            # The index breaks ties in input order and keeps dicts out of comparisons
+            scored.append((score, -index, restaurant))
+        best = heapq.nlargest(k, scored) if k is not None and k < len(scored) else sorted(scored, reverse=True)
+        return [restaurant for _, _, restaurant in best]
@@ -0,0 +1,187 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+NON_ALNUM_PATTERN = re.compile(r"[^0-9a-z]+")
+EARTH_RADIUS_KM = 6371.0088
+
+
+def normalize(text: str) -> str:
+    return " ".join(NON_ALNUM_PATTERN.sub(" ", str(text).lower()).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of each word, padded like PostgreSQL's pg_trgm ("  w", " wo", ..., "rd ")"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class FuzzyIndex:
+    """
+    Typo-tolerant lookup of the distinct values of one column
+
+    Every value is indexed under itself and under each run of consecutive
+    words it contains, so "kolkatta" finds "Park Street Kolkata". Each
+    trigram maps to a NumPy array of the terms containing it; a query counts
+    shared trigrams for all terms at once with `np.bincount` and scores them
+    by trigram similarity (shared / total distinct trigrams), so lookups stay
+    fast however many values the column has.
+    """
+
+    def __init__(self, values: Iterable[Tuple[str, int]], max_phrase_words: int = 3):
+        """
+        Args:
+            values: (value, restaurant_id) pairs
+            max_phrase_words: Longest run of words indexed as its own term
+        """
+        self.ids_by_value = defaultdict(set)
+        for value, restaurant_id in values:
+            self.ids_by_value[str(value)].add(restaurant_id)
+        self.values = list(self.ids_by_value)
+        self.normalized = [normalize(v) for v in self.values]
+
+        term_values = []
+        term_sizes = []
+        postings = defaultdict(list)
+        for value_index, text in enumerate(self.normalized):
+            words = text.split()
+            phrases = {" ".join(words[i:j]) for i in range(len(words))
+                       for j in range(i + 1, min(len(words), i + max_phrase_words) + 1)}
+            phrases.add(text)
+            for phrase in phrases:
+                grams = trigrams(phrase)
+                for gram in grams:
+                    postings[gram].append(len(term_values))
+                term_values.append(value_index)
+                term_sizes.append(len(grams))
+        self._term_values = np.array(term_values, dtype=np.int64)
+        self._term_sizes = np.array(term_sizes, dtype=np.int64)
+        self._postings = {gram: np.array(terms, dtype=np.int64) for gram, terms in postings.items()}
+
+    def search(self, query: str, threshold: float = 0.4, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Values matching `query`, best first
+
+        Case-insensitive substring matches score 1.0 (the behaviour of the
+        plain search); otherwise values need a trigram similarity of at
+        least `threshold` on one of their terms.
+
+        Returns:
+            List: (value, score) pairs
+        """
+        text = normalize(query)
+        if not text:
+            return []
+        grams = trigrams(text)
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self._term_values))
+
+        # A value containing the query shares all of its trigrams except at most
+        # three at the query's edges (unless the query is a fragment under three characters)
+        if len(text) < 3:
+            candidates = range(len(self.values))
+        else:
+            candidates = set(self._term_values[shared >= max(1, len(grams) - 3)].tolist())
+        matches = [i for i in candidates if text in self.normalized[i]]
+        if matches:
+            ranked = [(i, 1.0) for i in matches]
+        else:
+            terms = np.flatnonzero(shared)
+            scores = shared[terms] / (len(grams) + self._term_sizes[terms] - shared[terms])
+            keep = scores >= threshold
+            terms, scores = terms[keep], scores[keep]
+            order = np.argsort(-scores, kind="stable")
+            # First occurrence of each value in score order is its best term
+            values, first = np.unique(self._term_values[terms[order]], return_index=True)
+            best = np.argsort(first)
+            ranked = list(zip(values[best].tolist(), scores[order][first[best]].tolist()))
+        ranked = ranked[:limit] if limit else ranked
+        return [(self.values[i], score) for i, score in ranked]
+
+    def match_ids(self, query: str, threshold: float = 0.4) -> Set[int]:
+        """Restaurant IDs whose value matches `query`"""
+        ids = set()
+        for value, _ in self.search(query, threshold):
+            ids |= self.ids_by_value[value]
+        return ids
+
+
+class SearchIndex:
+    """Fuzzy indexes over the location, cuisine and name columns of a catalog"""
+
+    FIELDS = ("location", "cuisine", "name")
+
+    def __init__(self, restaurants):
+        ids = restaurants["id"].astype(int).tolist() if len(restaurants) else []
+        self.fields = {
+            field: FuzzyIndex(zip(restaurants[field].tolist(), ids))
+            for field in self.FIELDS if field in restaurants
+        }
+
+    def match_ids(self, field: str, query: str, threshold: float = 0.4) -> Set[int]:
+        index = self.fields.get(field)
+        return index.match_ids(query, threshold) if index else set()
+
+    def suggest(self, field: str, query: str, limit: int = 3) -> List[str]:
+        """Closest known values for a query, for "did you mean" messages"""
+        index = self.fields.get(field)
+        return [value for value, _ in index.search(query, threshold=0.2, limit=limit)] if index else []
+
+
+class GeoIndex:
+    """
+    Nearest-restaurant queries over the latitude/longitude columns
+
+    Coordinates are held as NumPy arrays of radians; a query computes all
+    haversine distances in one vectorized pass and selects the k nearest
+    with argpartition.
+    """
+
+    def __init__(self, restaurant_ids, latitudes, longitudes):
+        self.ids = np.asarray(restaurant_ids, dtype=int)
+        self._lat = np.radians(np.asarray(latitudes, dtype=float))
+        self._lon = np.radians(np.asarray(longitudes, dtype=float))
+
+    @classmethod
+    def from_frame(cls, restaurants) -> Optional["GeoIndex"]:
+        """Index the rows that have coordinates, or None if the catalog has none"""
+        if "latitude" not in restaurants or "longitude" not in restaurants:
+            return None
+        located = restaurants.dropna(subset=["latitude", "longitude"])
+        if located.empty:
+            return None
+        return cls(located["id"], located["latitude"], located["longitude"])
+
+    def distances_km(self, latitude: float, longitude: float) -> np.ndarray:
+        lat, lon = np.radians(latitude), np.radians(longitude)
+        a = (np.sin((self._lat - lat) / 2) ** 2
+             + np.cos(lat) * np.cos(self._lat) * np.sin((self._lon - lon) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+    def nearest(self, latitude: float, longitude: float, k: Optional[int] = None,
+                max_km: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        Restaurants closest to a point
+
+        Returns:
+            List: (restaurant_id, distance_km) pairs, nearest first
+        """
+        distances = self.distances_km(latitude, longitude)
+        candidates = np.arange(len(distances))
+        if max_km is not None:
+            candidates = candidates[distances <= max_km]
+        if k is not None and k < len(candidates):
+            candidates = candidates[np.argpartition(distances[candidates], k)[:k]]
+        candidates = candidates[np.argsort(distances[candidates])]
+        return [(int(self.ids[i]), round(float(distances[i]), 2)) for i in candidates]
+
+    def distance_map(self, latitude: float, longitude: float) -> Dict[int, float]:
+        distances = self.distances_km(latitude, longitude)
+        return {int(rid): round(float(d), 2) for rid, d in zip(self.ids, distances)}
@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Only read-only tools are replayed; bookings always go through the model
+CACHEABLE_TOOLS = frozenset({"search_restaurants", "recommend_restaurants", "check_availability"})
+# Tool arguments that may be bound to a slot of another name (argument -> slot)
+COMPATIBLE_SLOTS = {"name": "restaurant", "min_capacity": "party_size"}
+
+
+def _trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class SemanticCache:
+    """
+    Local cache of the model's tool plans keyed by message intent
+
+    A message is reduced to its template (text with slot values replaced by
+    placeholders, see intent.SlotExtractor). The tool calls the model chose for
+    a template are stored with slot values generalized, so a later message with
+    the same template (or a near-identical one by trigram similarity) can reuse
+    the plan with its own slot values. Only the plan is cached: tools still run
+    against live data and the model still writes the final answer.
+    """
+
+    def __init__(self, max_entries: int = 512, similarity_threshold: float = 0.9,
+                 ttl_seconds: float = 3600):
+        """
+        Args:
+            max_entries: Number of templates kept (least recently used are evicted)
+            similarity_threshold: Minimum trigram Jaccard similarity for a fuzzy hit
+            ttl_seconds: Age after which a cached plan is ignored
+        """
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _generalize(key: str, value: Any, slots: Dict[str, Any], text: str) -> Tuple[Any, bool]:
+        """
+        Replace a tool argument with a slot reference when it came from a slot
+
+        Returns:
+            Tuple: The stored value and whether it was derived from the message
+        """
+        # Only the slot of the same name (or a compatible one) is bound: min_rating=4 must not
+        # follow party_size just because the party was also 4
+        for slot_name in (key, COMPATIBLE_SLOTS.get(key)):
+            if slot_name not in slots:
+                continue
+            slot_value = slots[slot_name]
+            if value == slot_value or (isinstance(value, str) and isinstance(slot_value, str)
+                                       and value.lower() == slot_value.lower()):
+                return {"$slot": slot_name}, True
+        if isinstance(value, str) and value.lower() in text.lower():
+            return {"$literal": value}, True
+        return value, False
+
+    def store(self, parsed: Dict[str, Any], tool_calls: List[Tuple[str, str]]) -> bool:
+        """
+        Cache the plan the model produced for a parsed message
+
+        Args:
+            parsed: Result of SlotExtractor.extract for the user message
+            tool_calls: (function name, JSON arguments) pairs from the model
+
+        Returns:
+            bool: Whether the plan was cacheable
+        """
+        plan = []
+        exact_only = False
+        for name, arguments in tool_calls:
+            if name not in CACHEABLE_TOOLS:
+                return False
+            try:
+                args = json.loads(arguments)
+            except (TypeError, json.JSONDecodeError):
+                return False
+            if not isinstance(args, dict):
+                return False
+            generalized = {}
+            for key, value in args.items():
+                generalized[key], derived = self._generalize(key, value, parsed["slots"], parsed["text"])
+                # Values the model inferred from the wording only transfer to identical wording
+                exact_only = exact_only or not derived
+            plan.append({"name": name, "arguments": generalized})
+
+        if not plan:
+            return False
+        template = parsed["template"]
+        with self._lock:
+            self._entries[template] = {
+                "plan": plan,
+                "exact_only": exact_only,
+                "trigrams": _trigrams(template),
+                "slot_names": frozenset(parsed["slots"]),
+                "stored_at": time.monotonic(),
+            }
+            self._entries.move_to_end(template)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def lookup(self, parsed: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return the tool calls for a parsed message, or None on a miss
+
+        Returns:
+            List: `{"name", "arguments"}` dicts with the message's own slot values
+        """
+        template = parsed["template"]
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(template)
+            if entry is None:
+                entry = self._nearest(template, frozenset(parsed["slots"]))
+            if entry is None:
+                return None
+            if now - entry["stored_at"] > self.ttl_seconds:
+                self._entries.pop(template, None)
+                return None
+            if template in self._entries:
+                self._entries.move_to_end(template)
+        return self._instantiate(entry["plan"], parsed)
+
+    def _nearest(self, template: str, slot_names: frozenset) -> Optional[Dict[str, Any]]:
+        """Most similar fuzzy-matchable entry with the same slots (caller holds the lock)"""
+        trigrams = _trigrams(template)
+        best, best_score = None, self.similarity_threshold
+        for entry in self._entries.values():
+            if entry["exact_only"] or entry["slot_names"] != slot_names:
+                continue
+            score = _similarity(trigrams, entry["trigrams"])
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    @staticmethod
+    def _instantiate(plan: List[Dict[str, Any]], parsed: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Fill slot references with the new message's values; None if one is missing"""
+        slots = parsed["slots"]
+        text = parsed["text"].lower()
+        calls = []
+        for step in plan:
+            args = {}
+            for key, value in step["arguments"].items():
+                if isinstance(value, dict) and "$slot" in value:
+                    if value["$slot"] not in slots:
+                        return None
+                    args[key] = slots[value["$slot"]]
+                elif isinstance(value, dict) and "$literal" in value:
+                    if value["$literal"].lower() not in text:
+                        return None
+                    args[key] = value["$literal"]
+                else:
+                    args[key] = value
+            calls.append({"name": step["name"], "arguments": args})
+        return calls
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
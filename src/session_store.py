@@ -0,0 +1,176 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Sessions kept in memory, and seconds without a turn after which one is dropped from memory
+MAX_SESSIONS = 1000
+SESSION_IDLE_SECONDS = 1800
+# Lines kept in a conversation summary
+SUMMARY_LINES = 12
+
+
+class SessionStore:
+    """
+    Conversation history of LLMAgent sessions in one SQLite file
+
+    Messages are append-only rows keyed by (session_id, seq), stored as
+    compact JSON. When an agent compacts its history, the summary of the
+    dropped messages is recorded with the last seq it covers; resuming a
+    session reads only the latest summary and the messages after it.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file (":memory:" keeps everything in memory)
+        """
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection shared by all threads; the lock serializes its use
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "session_id TEXT NOT NULL, seq INTEGER NOT NULL, message TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (session_id, seq))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "session_id TEXT NOT NULL, upto_seq INTEGER NOT NULL, summary TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (session_id, upto_seq))"
+            )
+
+    @classmethod
+    def from_env(cls, data_dir: Optional[str] = None) -> "SessionStore":
+        """Store at SESSION_DB_PATH, or sessions.db in the data directory"""
+        if data_dir is None:
+            data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+        return cls(os.environ.get("SESSION_DB_PATH") or os.path.join(data_dir, "sessions.db"))
+
+    def append(self, session_id: str, first_seq: int, messages: List[Dict[str, Any]]):
+        """Store messages numbered from `first_seq`"""
+        if not messages:
+            return
+        now = time.time()
+        rows = [(session_id, first_seq + i, json.dumps(message, separators=(",", ":"), default=str), now)
+                for i, message in enumerate(messages)]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?)", rows)
+
+    def save_summary(self, session_id: str, upto_seq: int, summary: str):
+        """Record a summary of the session's messages up to and including `upto_seq`"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)",
+                               (session_id, upto_seq, summary, time.time()))
+
+    def resume(self, session_id: str) -> Tuple[str, int, List[Dict[str, Any]]]:
+        """
+        State an agent needs to continue a session
+
+        Returns:
+            Tuple: Latest summary ("" if none), seq of the first message after
+                it, and those messages in order
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT upto_seq, summary FROM summaries WHERE session_id = ? ORDER BY upto_seq DESC LIMIT 1",
+                (session_id,)
+            ).fetchone()
+            upto_seq, summary = row if row else (-1, "")
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? AND seq > ? ORDER BY seq",
+                (session_id, upto_seq)
+            ).fetchall()
+        return summary, upto_seq + 1, [json.loads(message) for (message,) in rows]
+
+    def transcript(self, session_id: str) -> List[Dict[str, str]]:
+        """Every user message and assistant reply of a session, for display"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return visible_messages(json.loads(message) for (message,) in rows)
+
+    def delete(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def visible_messages(messages) -> List[Dict[str, str]]:
+    """User messages and assistant replies with text, without tool calls and results"""
+    return [{"role": m["role"], "content": m["content"]} for m in messages
+            if m.get("role") in ("user", "assistant") and m.get("content") and not m.get("tool_calls")]
+
+
+def summarize_messages(messages, previous: str = "") -> str:
+    """
+    Short extractive summary of compacted messages
+
+    Keeps the last SUMMARY_LINES lines of the previous summary followed by
+    the customer's messages and the assistant's replies, each shortened.
+    """
+    lines = previous.splitlines() if previous else []
+    for message in visible_messages(messages):
+        speaker = "Customer" if message["role"] == "user" else "Assistant"
+        text = " ".join(str(message["content"]).split())
+        lines.append(f"{speaker}: {text[:200]}")
+    return "\n".join(lines[-SUMMARY_LINES:])
+
+
+class AgentSessions:
+    """
+    LRU map of session IDs to their LLMAgent, with one lock per session
+
+    Agents are created on first use by `agent_factory(session_id)`, which
+    resumes the session from its store. Sessions idle for longer than
+    `idle_seconds`, and the least recently used beyond `max_sessions`, are
+    dropped from memory; their history stays in the store.
+    """
+
+    def __init__(self, agent_factory: Callable[[str], Any], max_sessions: int = MAX_SESSIONS,
+                 idle_seconds: float = SESSION_IDLE_SECONDS):
+        self.agent_factory = agent_factory
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id: str):
+        """
+        Returns:
+            Tuple: The session's agent and the lock serializing its turns
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = [self.agent_factory(session_id), threading.Lock(), now]
+            entry[2] = now
+            self._sessions.move_to_end(session_id)
+            # Least recently used first: evict from the front while idle or over the limit
+            while self._sessions:
+                oldest = next(iter(self._sessions.values()))
+                if len(self._sessions) <= self.max_sessions and now - oldest[2] <= self.idle_seconds:
+                    break
+                if oldest[1].locked():
+                    # Mid-turn: its messages are not stored yet, so a fresh agent would miss them
+                    break
+                self._sessions.popitem(last=False)
+            return entry[0], entry[1]
@@ -0,0 +1,418 @@
+import heapq
+import multiprocessing
+import os
+import threading
+from typing import Any, List, Optional
+
+from catalog import Catalog, CatalogWatcher, CATALOG_RELOADED, shard_of
+from database import RECOMMENDATION_LIMIT
+from events import EventBus, RESERVATION_CANCELLED, RESERVATION_CREATED, RESERVATION_MODIFIED
+from idempotency import IdempotencyStore, idempotent
+from metrics import METRICS
+from ranking import PopularityTracker
+
+# Database methods a shard worker answers
+SHARD_METHODS = {
+    "get_available_tables", "search_restaurants", "nearest_restaurants", "recommend_restaurants",
+    "create_reservation", "get_reservation", "get_reservations_by_email", "modify_reservation",
+    "cancel_reservation", "join_waitlist", "leave_waitlist", "get_waitlist_entry", "reload_catalog",
+}
+
+
+def _run_shard(index, count, data_dir, conn, event_queue):
+    """Worker process: serve one shard's RestaurantDatabase over a pipe"""
+    from database import RestaurantDatabase
+
+    db = RestaurantDatabase(data_dir, shard=(index, count))
+    # Every event goes to the router, which republishes it on its own bus
+    db.events.subscribe("*", event_queue.put)
+    conn.send(("ok", db.events.node_id))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        method, args, kwargs = request
+        try:
+            if method == "snapshot":
+                # Nothing else publishes in this process between the copy and the sequence number
+                result = ([dict(r) for r in db.reservations], db.events.sequence)
+            elif method in SHARD_METHODS:
+                result = getattr(db, method)(*args, **kwargs)
+            else:
+                raise ValueError(f"Unknown shard method: {method}")
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", RuntimeError(f"Shard {index} failed in {method}: {e}")))
+    conn.close()
+
+
+class _ShardProcess:
+    """One worker process and the pipe to it; calls to the same shard are serialized"""
+
+    def __init__(self, context, index, count, data_dir, event_queue):
+        self.index = index
+        self.lock = threading.Lock()
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_run_shard, name=f"shard-{index}",
+                                       args=(index, count, data_dir, child_conn, event_queue), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.node_id = None
+
+    def wait_ready(self):
+        self.node_id = self.receive()
+
+    def send(self, method, args=(), kwargs=None):
+        self.conn.send((method, args, kwargs or {}))
+
+    def receive(self):
+        try:
+            status, result = self.conn.recv()
+        except EOFError:
+            raise RuntimeError(f"Shard {self.index} is not running")
+        if status == "error":
+            raise result
+        return result
+
+    def call(self, method, *args, **kwargs):
+        with self.lock:
+            self.send(method, args, kwargs)
+            return self.receive()
+
+    def stop(self):
+        with self.lock:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ShardedDatabase:
+    """
+    RestaurantDatabase partitioned by restaurant ID across worker processes
+
+    Shard i owns the restaurants with `id % shards == i`, their reservations
+    (data/shards/reservations-i-of-n.json, seeded from reservations.json the
+    first time) and their waitlists. Each shard runs in its own process, so
+    bookings for different shards run in parallel instead of sharing one
+    interpreter. Calls for one restaurant go to the shard that owns it;
+    searches and recommendations are sent to every shard at once and the
+    results merged. Reservation IDs are mapped to their shard from the
+    reservation events, which every worker forwards to this router's bus.
+
+    Offers the methods and attributes of RestaurantDatabase that the app,
+    the API server and the agent use. The catalog is also loaded here, so
+    restaurant lookups need no round trip.
+    """
+
+    def __init__(self, data_dir=None, shards=None, events=None):
+        """
+        Args:
+            data_dir: Directory holding restaurants.csv and reservations.json
+            shards: Number of worker processes (one per CPU if None)
+            events: Event bus the shards' events are republished on (a new one if None)
+        """
+        if data_dir is None:
+            data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+        self.data_dir = os.path.abspath(data_dir)
+        self.restaurants_file = os.path.join(self.data_dir, "restaurants.csv")
+        self.catalog = Catalog.load(self.restaurants_file)
+        self._catalog_watcher = None
+        self.ledger_version = 1
+        self.events = events or EventBus()
+        self._reservation_shards = {}
+        # Held while forwarding an event, taking a snapshot or moving a reservation between shards
+        self._forward_lock = threading.RLock()
+        # Shard event being republished, so followers can tell whether their snapshot already has it
+        self._forwarding = None
+        # Reservation ID -> cross-shard move whose halves are still to be forwarded
+        self._moves = {}
+        # Idempotency keys are handled here, so replays need no round trip and survive moves between shards
+        self.idempotency = IdempotencyStore()
+
+        self.shard_count = shards or os.cpu_count() or 1
+        # Spawned, not forked: the router may already be running threads
+        context = multiprocessing.get_context("spawn")
+        self._event_queue = context.Queue()
+        self._shards = [_ShardProcess(context, i, self.shard_count, self.data_dir, self._event_queue)
+                        for i in range(self.shard_count)]
+        for shard in self._shards:
+            shard.wait_ready()
+        self._shards_by_node = {shard.node_id: shard.index for shard in self._shards}
+        for index, (reservations, _) in enumerate(self._broadcast("snapshot")):
+            for reservation in reservations:
+                self._reservation_shards[reservation["id"]] = index
+        self._forwarder = threading.Thread(target=self._forward_events, name="shard-events", daemon=True)
+        self._forwarder.start()
+        # Popularity over all shards, so every shard scores recommendations on one scale
+        self.popularity = PopularityTracker(self)
+
+    @property
+    def restaurants(self):
+        """DataFrame of the current restaurant catalog"""
+        return self.catalog.restaurants
+
+    @property
+    def catalog_version(self):
+        return self.catalog.version
+
+    def _shard_for(self, restaurant_id) -> _ShardProcess:
+        return self._shards[shard_of(restaurant_id, self.shard_count)]
+
+    def _broadcast(self, method, *args, **kwargs) -> List[Any]:
+        """Call a method on every shard in parallel and return the results in shard order"""
+        # Locks are always taken in shard order, so concurrent broadcasts cannot deadlock
+        for shard in self._shards:
+            shard.lock.acquire()
+        try:
+            for shard in self._shards:
+                shard.send(method, args, kwargs)
+            results, error = [], None
+            for shard in self._shards:
+                try:
+                    results.append(shard.receive())
+                except Exception as e:
+                    # Keep reading so every pipe is left with no reply pending
+                    results.append(None)
+                    error = error or e
+            if error is not None:
+                raise error
+            return results
+        finally:
+            for shard in self._shards:
+                shard.lock.release()
+
+    def _forward_events(self):
+        while True:
+            event = self._event_queue.get()
+            with self._forward_lock:
+                self._on_shard_event(event)
+
+    def _on_shard_event(self, event):
+        topic = event["topic"]
+        if topic.startswith("reservation."):
+            reservation = event["payload"]["reservation"]
+            reservation_id = reservation["id"]
+            index = self._shards_by_node.get(event["origin"])
+            if topic == RESERVATION_CANCELLED:
+                # A reservation moved between shards is created on the new one before this arrives
+                if self._reservation_shards.get(reservation_id) == index:
+                    del self._reservation_shards[reservation_id]
+            elif index is not None:
+                self._reservation_shards[reservation_id] = index
+            self.ledger_version += 1
+            move = self._moves.get(reservation_id)
+            if move is not None and topic in move["waiting"]:
+                # One half of a cross-shard move: published as a single modification once both are in
+                move["waiting"].discard(topic)
+                if topic == RESERVATION_CREATED:
+                    move["reservation"] = reservation
+                if not move["waiting"]:
+                    del self._moves[reservation_id]
+                    self._republish(event, RESERVATION_MODIFIED,
+                                    {"reservation": move["reservation"], "previous": move["previous"]}, None)
+                return
+        elif topic == CATALOG_RELOADED:
+            # Each shard reports its own part of the catalog; report the router's catalog once
+            return
+        self._republish(event, topic, event["payload"], event["origin"])
+
+    def _republish(self, source, topic, payload, origin):
+        """Publish on the router's bus on behalf of the shard event `source` (forward lock held)"""
+        METRICS.inc("shard_events_forwarded_total", topic=topic)
+        self._forwarding = source
+        try:
+            self.events.publish(topic, payload, origin=origin)
+        finally:
+            self._forwarding = None
+
+    def _owner_of_reservation(self, reservation_id) -> Optional[_ShardProcess]:
+        index = self._reservation_shards.get(reservation_id)
+        if index is None:
+            # Not forwarded yet: ask every shard
+            for index, reservation in enumerate(self._broadcast("get_reservation", reservation_id)):
+                if reservation is not None:
+                    break
+            else:
+                return None
+        return self._shards[index]
+
+    def follow_reservations(self, callback):
+        """
+        Snapshot all shards' ledgers and subscribe to their changes in one step
+
+        Events already reflected in a shard's snapshot are skipped, so derived
+        data built from the snapshot stays exact by applying each event.
+
+        Returns:
+            Tuple: Copies of the current reservations and a function that unsubscribes
+        """
+        with self._forward_lock:
+            snapshots = self._broadcast("snapshot")
+            applied = {shard.node_id: sequence for shard, (_, sequence) in zip(self._shards, snapshots)}
+
+            def deliver(event):
+                # Compare the shard's own sequence number; the router's bus numbers events itself
+                source = self._forwarding if self._forwarding is not None else event
+                if source["seq"] > applied.get(source["origin"], 0):
+                    callback(event)
+            unsubscribe = self.events.subscribe("reservation.*", deliver)
+        return [r for reservations, _ in snapshots for r in reservations], unsubscribe
+
+    @METRICS.timed("catalog_reload_seconds")
+    def reload_catalog(self):
+        """Reload restaurants.csv here and on every shard"""
+        try:
+            catalog = Catalog.load(self.restaurants_file, self.catalog.version + 1)
+        except Exception as e:
+            METRICS.inc("catalog_reload_failures_total")
+            print(f"Error reloading restaurants, keeping the current catalog: {e}")
+            return False
+        self.catalog = catalog
+        self._broadcast("reload_catalog")
+        self.events.publish(CATALOG_RELOADED, {"version": catalog.version, "restaurants": len(catalog.by_id)})
+        return True
+
+    def watch_catalog(self, interval=5.0):
+        """Reload the catalog in the background whenever restaurants.csv changes"""
+        if self._catalog_watcher is None:
+            self._catalog_watcher = CatalogWatcher(
+                self.restaurants_file, self.reload_catalog, interval, self.catalog.source_stamp
+            )
+        return self._catalog_watcher
+
+    def get_all_restaurants(self):
+        return self.restaurants.to_dict('records')
+
+    def get_restaurant_by_id(self, restaurant_id):
+        return self.catalog.get(restaurant_id)
+
+    def search_restaurants(self, **kwargs):
+        results = [r for shard_results in self._broadcast("search_restaurants", **kwargs) for r in shard_results]
+        if results and "distance_km" in results[0]:
+            return sorted(results, key=lambda r: r["distance_km"])
+        # Catalog order, as an unsharded search returns them
+        position = {restaurant_id: i for i, restaurant_id in enumerate(self.catalog.by_id)}
+        return sorted(results, key=lambda r: position.get(int(r["id"]), len(position)))
+
+    def nearest_restaurants(self, latitude, longitude, k=5, max_km=None):
+        results = [r for shard_results in self._broadcast("nearest_restaurants", latitude, longitude, k, max_km)
+                   for r in shard_results]
+        return heapq.nsmallest(k, results, key=lambda r: r["distance_km"])
+
+    def recommend_restaurants(self, limit=RECOMMENDATION_LIMIT, **kwargs):
+        """Best recommendations over all shards (each shard ranks its own top `limit`)"""
+        kwargs["max_covers"] = self.popularity.max_covers()
+        results = [r for shard_results in self._broadcast("recommend_restaurants", limit, **kwargs)
+                   for r in shard_results]
+        if limit is None:
+            return sorted(results, key=lambda r: r["score"], reverse=True)
+        return heapq.nlargest(limit, results, key=lambda r: r["score"])
+
+    def get_available_tables(self, restaurant_id, date, time, party_size):
+        try:
+            shard = self._shard_for(restaurant_id)
+        except (TypeError, ValueError) as e:
+            return {"available": False, "reason": f"Invalid input format: {str(e)}"}
+        return shard.call("get_available_tables", restaurant_id, date, time, party_size)
+
+    @idempotent
+    def create_reservation(self, customer_name, customer_email, restaurant_id,
+                           date, time, party_size, special_requests="", reservation_id=None):
+        try:
+            shard = self._shard_for(restaurant_id)
+        except (TypeError, ValueError) as e:
+            return {"success": False, "message": f"Invalid input format: {str(e)}"}
+        result = shard.call("create_reservation", customer_name, customer_email, restaurant_id,
+                            date, time, party_size, special_requests, reservation_id)
+        if result["success"]:
+            self._reservation_shards[result["reservation"]["id"]] = shard.index
+            self.ledger_version += 1
+        return result
+
+    def get_reservation(self, reservation_id):
+        shard = self._owner_of_reservation(reservation_id)
+        return shard.call("get_reservation", reservation_id) if shard else None
+
+    def get_reservations_by_email(self, email):
+        return [r for reservations in self._broadcast("get_reservations_by_email", email) for r in reservations]
+
+    @idempotent
+    def modify_reservation(self, reservation_id, **kwargs):
+        """Modify a reservation; moving it to another shard's restaurant rebooks it there under the same ID"""
+        shard = self._owner_of_reservation(reservation_id)
+        reservation = shard.call("get_reservation", reservation_id) if shard else None
+        if reservation is None:
+            return {"success": False, "message": "Reservation not found"}
+        target = kwargs.get("restaurant_id", reservation["restaurant_id"])
+        try:
+            target_shard = self._shard_for(target)
+        except (TypeError, ValueError) as e:
+            return {"success": False, "message": f"Invalid input format: {str(e)}"}
+
+        if target_shard is shard:
+            result = shard.call("modify_reservation", reservation_id, **kwargs)
+        else:
+            moved = dict(reservation, **kwargs)
+            # Held for the whole move: snapshots never see it half done, and both halves are forwarded after it
+            with self._forward_lock:
+                self._moves[reservation_id] = {"previous": reservation, "reservation": None,
+                                               "waiting": {RESERVATION_CREATED, RESERVATION_CANCELLED}}
+                result = target_shard.call(
+                    "create_reservation", moved["customer_name"], moved["customer_email"], moved["restaurant_id"],
+                    moved["date"], moved["time"], moved["party_size"], moved.get("special_requests", ""),
+                    reservation_id
+                )
+                if not result["success"]:
+                    del self._moves[reservation_id]
+                    return result
+                self._reservation_shards[reservation_id] = target_shard.index
+                if not shard.call("cancel_reservation", reservation_id)["success"]:
+                    # Cancelled there meanwhile; its event is forwarded as is
+                    self._moves[reservation_id]["waiting"].discard(RESERVATION_CANCELLED)
+            METRICS.inc("shard_moves_total")
+            result = {"success": True, "reservation": result["reservation"], "message": "Reservation updated successfully"}
+        if result["success"]:
+            self.ledger_version += 1
+        return result
+
+    @idempotent
+    def cancel_reservation(self, reservation_id):
+        shard = self._owner_of_reservation(reservation_id)
+        if shard is None:
+            return {"success": False, "message": "Reservation not found"}
+        result = shard.call("cancel_reservation", reservation_id)
+        if result["success"]:
+            self.ledger_version += 1
+        return result
+
+    def join_waitlist(self, customer_name, customer_email, restaurant_id,
+                      date, time, party_size, special_requests=""):
+        try:
+            shard = self._shard_for(restaurant_id)
+        except (TypeError, ValueError) as e:
+            return {"success": False, "message": f"Invalid input format: {str(e)}"}
+        return shard.call("join_waitlist", customer_name, customer_email, restaurant_id,
+                          date, time, party_size, special_requests)
+
+    def get_waitlist_entry(self, waitlist_id):
+        return next((entry for entry in self._broadcast("get_waitlist_entry", waitlist_id) if entry is not None), None)
+
+    def leave_waitlist(self, waitlist_id):
+        for result in self._broadcast("leave_waitlist", waitlist_id):
+            if result["success"]:
+                return result
+        return {"success": False, "message": "Waitlist entry not found"}
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._catalog_watcher is not None:
+            self._catalog_watcher.stop()
+        for shard in self._shards:
+            shard.stop()
@@ -0,0 +1,50 @@
+from datetime import date, datetime
+from functools import lru_cache
+
+DATE_FORMAT = "%Y-%m-%d"
+TIME_FORMAT = "%H:%M"
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text: str) -> date:
+    """
+    Date of a YYYY-MM-DD string
+
+    Canonical strings are sliced directly and results are memoized. Anything
+    else goes through strptime, so accepted inputs and error messages are
+    those of datetime.strptime(text, "%Y-%m-%d").
+    """
+    if (len(text) == 10 and text[4] == "-" and text[7] == "-"
+            and text[:4].isdigit() and text[5:7].isdigit() and text[8:].isdigit()):
+        try:
+            return date(int(text[:4]), int(text[5:7]), int(text[8:]))
+        except ValueError:
+            pass
+    return datetime.strptime(text, DATE_FORMAT).date()
+
+
+@lru_cache(maxsize=4096)
+def parse_time(text: str) -> int:
+    """Minute of the day of an HH:MM string (same inputs and errors as strptime "%H:%M"), memoized"""
+    if len(text) == 5 and text[2] == ":" and text[:2].isdigit() and text[3:].isdigit():
+        hour, minute = int(text[:2]), int(text[3:])
+        if hour < 24 and minute < 60:
+            return hour * 60 + minute
+    parsed = datetime.strptime(text, TIME_FORMAT)
+    return parsed.hour * 60 + parsed.minute
+
+
+def format_time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def is_open(opening: int, closing: int, minute):
+    """
+    Whether a minute of the day falls within opening hours, ends included
+
+    Hours that close before they open run past midnight ("18:00" to "02:00").
+    `minute` may be an int or a NumPy array of minutes.
+    """
+    if opening <= closing:
+        return (minute >= opening) & (minute <= closing)
+    return (minute >= opening) | (minute <= closing)
@@ -0,0 +1,282 @@
+import re
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import METRICS
+from timeutil import format_time, parse_date
+
+# Date layouts the model commonly produces, tried in order after the canonical one
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y", "%d/%m/%Y", "%B %d, %Y", "%b %d, %Y",
+                "%d %B %Y", "%d %b %Y", "%B %d %Y", "%b %d %Y")
+RELATIVE_DATES = {"today": 0, "tonight": 0, "tomorrow": 1}
+TIME_PATTERN = re.compile(r"^\s*(\d{1,2})(?:[:.](\d{2}))?(?::\d{2})?\s*([ap])?\.?\s*m?\.?\s*$", re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+# A whole number, optionally followed by words ("4 people") but not by a fraction ("4.9")
+LEADING_INT_PATTERN = re.compile(r"^\s*(-?\d+)(?:\.0*)?(?![\d.])")
+
+
+class ToolValidationError(ValueError):
+    """Raised when model-produced tool arguments do not match the tool schema"""
+
+    def __init__(self, tool_name: str, errors: Dict[str, str]):
+        self.tool_name = tool_name
+        self.errors = errors
+        details = "; ".join(f"{field}: {message}" for field, message in errors.items())
+        super().__init__(f"Invalid arguments for {tool_name}: {details}")
+
+
+def _coerce_integer(value):
+    if isinstance(value, bool):
+        raise ValueError("expected an integer")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        if value.is_integer():
+            return int(value)
+        raise ValueError("expected a whole number")
+    if isinstance(value, str):
+        # Accept "4" as well as "4 people"
+        match = LEADING_INT_PATTERN.match(value)
+        if match:
+            return int(match.group(1))
+    raise ValueError("expected an integer")
+
+
+def _coerce_number(value):
+    if isinstance(value, bool):
+        raise ValueError("expected a number")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    raise ValueError("expected a number")
+
+
+def _coerce_string(value):
+    if isinstance(value, (dict, list)):
+        raise ValueError("expected a string")
+    return str(value).strip()
+
+
+def _coerce_date(value):
+    """Normalize a date string to YYYY-MM-DD"""
+    text = value.strip()
+    if text.lower() in RELATIVE_DATES:
+        return (datetime.now() + timedelta(days=RELATIVE_DATES[text.lower()])).strftime("%Y-%m-%d")
+    try:
+        # Canonical dates take the shared cached parser
+        return parse_date(text).isoformat()
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS[1:]:
+        try:
+            return datetime.strptime(text, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError("expected a date in YYYY-MM-DD format")
+
+
+def _coerce_time(value):
+    """Normalize a time string such as '7 PM' or '19:00:00' to HH:MM (24-hour)"""
+    match = TIME_PATTERN.match(value)
+    if not match:
+        raise ValueError("expected a time in HH:MM (24-hour) format")
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError("expected an hour between 1 and 12 with AM/PM")
+        hour = hour % 12 + (12 if meridiem.lower() == "p" else 0)
+    if hour > 23 or minute > 59:
+        raise ValueError("expected a time in HH:MM (24-hour) format")
+    return format_time(hour * 60 + minute)
+
+
+def _check_email(value):
+    if not EMAIL_PATTERN.match(value):
+        raise ValueError("expected an email address")
+    return value
+
+
+TYPE_COERCERS = {
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "string": _coerce_string,
+}
+
+FORMAT_COERCERS = {
+    "date": _coerce_date,
+    "time": _coerce_time,
+    "email": _check_email,
+}
+
+
+def _compile_property(schema: Dict[str, Any]) -> Callable[[Any], Any]:
+    """Build a single coercion function for one property schema"""
+    steps = []
+    if schema.get("type") in TYPE_COERCERS:
+        steps.append(TYPE_COERCERS[schema["type"]])
+    if schema.get("format") in FORMAT_COERCERS:
+        steps.append(FORMAT_COERCERS[schema["format"]])
+
+    minimum = schema.get("minimum")
+    maximum = schema.get("maximum")
+    if minimum is not None or maximum is not None:
+        def check_bounds(value):
+            if minimum is not None and value < minimum:
+                raise ValueError(f"must be at least {minimum}")
+            if maximum is not None and value > maximum:
+                raise ValueError(f"must be at most {maximum}")
+            return value
+        steps.append(check_bounds)
+
+    if "enum" in schema:
+        allowed = set(schema["enum"])
+
+        def check_enum(value):
+            if value not in allowed:
+                raise ValueError(f"must be one of {sorted(allowed)}")
+            return value
+        steps.append(check_enum)
+
+    def coerce(value):
+        for step in steps:
+            value = step(value)
+        return value
+    return coerce
+
+
+def compile_validator(tool_name: str, parameters: Dict[str, Any]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Build a validator for a tool's JSON schema
+
+    The returned function coerces known arguments and drops unknown or null ones.
+    Empty strings are kept for plain string properties, so a handler can clear
+    a field such as special_requests, and dropped like null for numbers,
+    enums and formatted strings; they never satisfy a required argument.
+    Raises ToolValidationError listing every problem at once.
+    """
+    properties = {
+        name: _compile_property(schema)
+        for name, schema in parameters.get("properties", {}).items()
+    }
+    required = tuple(parameters.get("required", ()))
+    keeps_empty = {
+        name for name, schema in parameters.get("properties", {}).items()
+        if schema.get("type") == "string" and "format" not in schema and "enum" not in schema
+    }
+
+    def validate(args: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(args, dict):
+            raise ToolValidationError(tool_name, {"arguments": "expected a JSON object"})
+        cleaned = {}
+        errors = {}
+        for name, value in args.items():
+            coerce = properties.get(name)
+            if coerce is None or value is None:
+                continue
+            if isinstance(value, str) and not value.strip() and name not in keeps_empty:
+                continue
+            try:
+                cleaned[name] = coerce(value)
+            except (TypeError, ValueError) as e:
+                errors[name] = str(e)
+        for name in required:
+            if cleaned.get(name, "") == "" and name not in errors:
+                errors[name] = "is required"
+        if errors:
+            raise ToolValidationError(tool_name, errors)
+        return cleaned
+    return validate
+
+
+class ToolRegistry:
+    """
+    Maps tool names to handlers and validates arguments before dispatch
+
+    Validators are compiled once from the tool definitions, so rejecting a bad
+    call costs a dict lookup and a few coercions instead of an LLM round trip.
+    """
+
+    def __init__(self, tool_definitions: Optional[List[Dict[str, Any]]] = None):
+        self._definitions = {}
+        self._validators = {}
+        self._handlers = {}
+        # Tools whose handler accepts an idempotency_key
+        self._idempotent = set()
+        for definition in tool_definitions or []:
+            self.add_definition(definition)
+
+    def add_definition(self, definition: Dict[str, Any]):
+        """Add (or replace) a tool definition in the OpenAI tools format"""
+        function = definition["function"]
+        name = function["name"]
+        self._definitions[name] = definition
+        self._validators[name] = compile_validator(name, function.get("parameters", {}))
+
+    def register(self, name: str, handler: Optional[Callable] = None, definition: Optional[Dict[str, Any]] = None,
+                 idempotent: bool = False):
+        """
+        Register the handler for a tool; usable directly or as a decorator
+
+        Args:
+            name: Tool name as exposed to the model
+            handler: Callable receiving the validated arguments as keyword arguments
+            definition: Tool definition, required if `name` is not already defined
+            idempotent: The handler accepts an `idempotency_key` (passed by dispatch, never by the model)
+        """
+        if definition is not None:
+            self.add_definition(definition)
+        if name not in self._definitions:
+            raise KeyError(f"No definition for tool: {name}")
+
+        def decorator(func):
+            self._handlers[name] = func
+            if idempotent:
+                self._idempotent.add(name)
+            else:
+                self._idempotent.discard(name)
+            return func
+        return decorator(handler) if handler is not None else decorator
+
+    @property
+    def definitions(self) -> List[Dict[str, Any]]:
+        """Definitions of all tools that have a handler, for the completions API"""
+        return [self._definitions[name] for name in self._handlers]
+
+    def is_idempotent(self, name: str) -> bool:
+        return name in self._idempotent
+
+    def validate(self, name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the coerced arguments or raise ToolValidationError"""
+        return self._validators[name](args)
+
+    def dispatch(self, name: str, args: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Validate the arguments and call the registered handler
+
+        Args:
+            name: Tool name
+            args: Arguments as sent by the caller
+            idempotency_key: Passed on to idempotent tools; ignored by the others
+
+        Returns:
+            Dict: The handler result, or an `error` entry for unknown tools,
+            invalid arguments and handler failures
+        """
+        handler = self._handlers.get(name)
+        if handler is None:
+            return {"error": f"Unknown function: {name}"}
+        try:
+            cleaned = self._validators[name](args)
+        except ToolValidationError as e:
+            METRICS.inc("tool_validation_errors_total", tool=name)
+            return {"error": str(e), "invalid_arguments": e.errors}
+        if idempotency_key and name in self._idempotent:
+            cleaned["idempotency_key"] = idempotency_key
+        try:
+            return handler(**cleaned)
+        except Exception as e:
+            return {"error": f"Error executing {name}: {str(e)}"}
@@ -0,0 +1,104 @@
+import heapq
+import json
+import math
+from typing import Any, Dict, List
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib encoder is used otherwise
+    orjson = None
+
+# Default number of list items returned to the model per tool call
+MAX_LIST_ITEMS = 5
+
+# Restaurant fields the model needs to answer and to call follow-up tools
+RESTAURANT_FIELDS = ("id", "name", "location", "cuisine", "rating", "price_range",
+                     "opening_time", "closing_time", "special_features", "available_seats", "distance_km")
+# Recommendations also carry their ranking score and the reason for it
+RECOMMENDATION_FIELDS = RESTAURANT_FIELDS + ("score", "why")
+RESERVATION_FIELDS = ("id", "restaurant_id", "restaurant_name", "date", "time",
+                      "party_size", "customer_name", "special_requests")
+
+# Per tool: the key holding the list, the fields kept for each item and how to rank them
+LIST_RESULTS = {
+    # Searches near a point are ranked by distance, others by rating
+    "search_restaurants": ("results", RESTAURANT_FIELDS,
+                           lambda r: -r["distance_km"] if "distance_km" in r else r.get("rating") or 0),
+    "recommend_restaurants": ("recommendations", RECOMMENDATION_FIELDS, None),
+    "get_reservations_by_email": ("reservations", RESERVATION_FIELDS,
+                                  lambda r: (r.get("date") or "", r.get("time") or "")),
+}
+
+
+def _to_builtin(value):
+    """Convert NumPy/pandas scalars and NaN to plain JSON-friendly values"""
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        try:
+            value = value.item()
+        except (ValueError, TypeError):
+            pass
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def project(record: Dict[str, Any], fields) -> Dict[str, Any]:
+    """Keep only `fields` of `record`, converting values to builtins"""
+    return {field: _to_builtin(record[field]) for field in fields if field in record}
+
+
+def top_k(items: List[Dict[str, Any]], k: int, key=None) -> List[Dict[str, Any]]:
+    """Return the `k` best items by `key` (or the first `k` when already ranked)"""
+    if len(items) <= k:
+        return items if key is None else sorted(items, key=key, reverse=True)
+    if key is None:
+        return items[:k]
+    return heapq.nlargest(k, items, key=key)
+
+
+def shape_tool_result(tool_name: str, result: Dict[str, Any], max_items: int = MAX_LIST_ITEMS) -> Dict[str, Any]:
+    """
+    Reduce a tool result to what the model needs
+
+    List results are capped to `max_items` (keeping the best ranked) and report
+    `total_matches` so the model can tell the user more options exist.
+    """
+    if not isinstance(result, dict) or "error" in result:
+        return result
+
+    if tool_name in LIST_RESULTS:
+        list_key, fields, rank_key = LIST_RESULTS[tool_name]
+        items = result.get(list_key) or []
+        selected = top_k(items, max_items, key=rank_key)
+        shaped = {list_key: [project(item, fields) for item in selected]}
+        if len(items) > len(selected):
+            shaped["total_matches"] = len(items)
+        return shaped
+
+    shaped = dict(result)
+    # Availability and booking results embed the full restaurant record
+    if isinstance(shaped.get("restaurant"), dict):
+        shaped["restaurant"] = project(shaped["restaurant"], ("id", "name"))
+    if isinstance(shaped.get("reservation"), dict):
+        shaped["reservation"] = project(shaped["reservation"], RESERVATION_FIELDS)
+    return {key: _to_builtin(value) for key, value in shaped.items()}
+
+
+def _json_default(value):
+    """Fallback for the stdlib encoder: NumPy scalars/arrays and anything else via str()"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def encode_tool_result(result: Any) -> str:
+    """Serialize a tool result compactly, handling NumPy types natively"""
+    if orjson is not None:
+        return orjson.dumps(
+            result,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            default=_json_default
+        ).decode("utf-8")
+    return json.dumps(result, default=_json_default, separators=(",", ":"), ensure_ascii=False)
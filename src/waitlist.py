@@ -0,0 +1,283 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import uuid
+from bisect import bisect_right, insort
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from catalog import CATALOG_RELOADED
+from events import RESERVATION_CANCELLED, RESERVATION_MODIFIED
+from metrics import METRICS
+
+WAITLIST_JOINED = "waitlist.joined"
+WAITLIST_LEFT = "waitlist.left"
+WAITLIST_PROMOTED = "waitlist.promoted"
+WAITLIST_DROPPED = "waitlist.dropped"
+
+logger = logging.getLogger(__name__)
+
+
+class SlotWaitlist:
+    """
+    Waiting parties for one restaurant, date and time
+
+    Parties are kept in one FIFO heap per party size plus a sorted list of the
+    sizes that have someone waiting. Finding the largest party that fits the
+    freed seats is a bisect over the sizes and a heap pop, so promotion stays
+    O(log n) however long the list grows. Removed entries are dropped lazily.
+    """
+
+    def __init__(self):
+        self._heaps = {}
+        self._sizes = []
+        self._active = {}
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._active)
+
+    def add(self, entry: Dict[str, Any]):
+        size = entry["party_size"]
+        heap = self._heaps.get(size)
+        if heap is None:
+            heap = self._heaps[size] = []
+            insort(self._sizes, size)
+        heapq.heappush(heap, (next(self._order), entry["id"]))
+        self._active[entry["id"]] = entry
+
+    def remove(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        return self._active.pop(entry_id, None)
+
+    def best(self, free_seats: int) -> Optional[Dict[str, Any]]:
+        """Largest waiting party that fits, earliest first (left in the queue)"""
+        index = bisect_right(self._sizes, free_seats)
+        while index > 0:
+            size = self._sizes[index - 1]
+            heap = self._heaps[size]
+            while heap and heap[0][1] not in self._active:
+                heapq.heappop(heap)
+            if heap:
+                return self._active[heap[0][1]]
+            del self._heaps[size]
+            self._sizes.pop(index - 1)
+            index -= 1
+        return None
+
+    def pop_best(self, free_seats: int) -> Optional[Dict[str, Any]]:
+        """Remove and return the largest waiting party that fits, earliest first"""
+        entry = self.best(free_seats)
+        if entry is not None:
+            self.remove(entry["id"])
+        return entry
+
+    def position(self, entry_id: str) -> int:
+        """1-based position among all waiting parties of this slot"""
+        for position, waiting_id in enumerate(self._active, 1):
+            if waiting_id == entry_id:
+                return position
+        return 0
+
+
+class Waitlist:
+    """
+    Per-slot waitlists that fill seats freed by cancellations and modifications
+
+    The waitlist follows the database's reservation events: whenever seats
+    free up in a slot, the largest waiting parties that fit are booked
+    immediately, in join order within each party size.
+
+    Not thread-safe on its own; RestaurantDatabase calls it with its lock held.
+    """
+
+    def __init__(self, db, path: Optional[str] = None):
+        """
+        Args:
+            db: RestaurantDatabase whose ledger the waitlist fills
+            path: JSON file the waitlist is persisted to (kept in memory only if None)
+        """
+        self.db = db
+        self.path = path
+        self._slots = {}
+        self._entries = {}
+        for entry in self._load():
+            self._add(entry)
+        db.events.subscribe(RESERVATION_CANCELLED, self._on_reservation_change)
+        db.events.subscribe(RESERVATION_MODIFIED, self._on_reservation_change)
+        db.events.subscribe(CATALOG_RELOADED, self._on_catalog_reloaded)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self) -> List[Dict[str, Any]]:
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading waitlist: {e}")
+            return []
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            temp_file = f"{self.path}.tmp"
+            with open(temp_file, 'w') as f:
+                # Entries are kept in join order, which restores each slot's queue order on load
+                f.write(json.dumps(list(self._entries.values())))
+            os.replace(temp_file, self.path)
+        except Exception as e:
+            print(f"Error saving waitlist: {e}")
+
+    def _add(self, entry: Dict[str, Any]):
+        key = (entry["restaurant_id"], entry["date"], entry["time"])
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = SlotWaitlist()
+        slot.add(entry)
+        self._entries[entry["id"]] = entry
+
+    def join(self, customer_name, customer_email, restaurant_id, date, time, party_size, special_requests=""):
+        """Add a party to the waitlist of a slot that has no room for it"""
+        availability = self.db.get_available_tables(restaurant_id, date, time, party_size)
+        if availability["available"]:
+            return {
+                "success": False,
+                "message": "Tables are available for this time, so the reservation can be made directly",
+                "available_seats": availability["available_seats"]
+            }
+        if not availability["reason"].startswith("Not enough seats"):
+            return {"success": False, "message": availability["reason"]}
+
+        restaurant = self.db.get_restaurant_by_id(restaurant_id)
+        party_size = int(party_size)
+        if party_size > restaurant["capacity"]:
+            return {"success": False, "message": f"{restaurant['name']} seats at most {restaurant['capacity']} people"}
+
+        entry = {
+            "id": f"WL-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8].upper()}",
+            "customer_name": customer_name,
+            "customer_email": customer_email,
+            "restaurant_id": int(restaurant_id),
+            "restaurant_name": restaurant["name"],
+            "date": date,
+            "time": time,
+            "party_size": party_size,
+            "special_requests": special_requests,
+            "joined_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self._add(entry)
+        self._save()
+        self.db.events.publish(WAITLIST_JOINED, {"entry": dict(entry)})
+        METRICS.inc("waitlist_joins_total")
+        position = self._slots[(entry["restaurant_id"], date, time)].position(entry["id"])
+        return {
+            "success": True,
+            "entry": entry,
+            "position": position,
+            "message": f"Added to the waitlist at {restaurant['name']} for {party_size} people on {date} at {time} "
+                       f"(position {position}). The table is booked automatically if seats free up."
+        }
+
+    def leave(self, entry_id: str) -> Dict[str, Any]:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return {"success": False, "message": "Waitlist entry not found"}
+        self._slots[(entry["restaurant_id"], entry["date"], entry["time"])].remove(entry_id)
+        self._save()
+        self.db.events.publish(WAITLIST_LEFT, {"entry": dict(entry)})
+        return {"success": True, "message": f"Removed from the waitlist at {entry['restaurant_name']}"}
+
+    def get_entry(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(entry_id)
+
+    def promote(self, restaurant_id, date, time, freed_at: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Book waiting parties into the free seats of a slot
+
+        Returns:
+            List: Reservations created for promoted parties
+        """
+        restaurant_id = int(restaurant_id)
+        slot = self._slots.get((restaurant_id, date, time))
+        promoted = []
+        dropped = False
+        while slot:
+            availability = self.db.get_available_tables(restaurant_id, date, time, 1)
+            # The party stays queued until its booking succeeds
+            entry = slot.best(availability.get("available_seats", 0))
+            if entry is None:
+                break
+            result = self.db.create_reservation(
+                entry["customer_name"], entry["customer_email"], restaurant_id,
+                date, time, entry["party_size"], entry["special_requests"]
+            )
+            if not result["success"]:
+                METRICS.inc("waitlist_promotion_failures_total")
+                if result["message"].startswith("Not enough seats"):
+                    # Still waiting; the next change in this slot tries again
+                    logger.info("Waitlist entry %s stays queued: %s", entry["id"], result["message"])
+                    break
+                # The slot can no longer seat this party (closed, in the past, too large): drop it visibly
+                logger.warning("Dropping waitlist entry %s: %s", entry["id"], result["message"])
+                slot.remove(entry["id"])
+                self._entries.pop(entry["id"], None)
+                dropped = True
+                METRICS.inc("waitlist_dropped_total")
+                self.db.events.publish(WAITLIST_DROPPED, {"entry": entry, "reason": result["message"]})
+                continue
+            slot.remove(entry["id"])
+            self._entries.pop(entry["id"], None)
+            promoted.append(result["reservation"])
+            METRICS.inc("waitlist_promotions_total")
+            if freed_at is not None:
+                METRICS.observe("waitlist_promotion_seconds", datetime.now().timestamp() - freed_at)
+            self.db.events.publish(WAITLIST_PROMOTED, {"entry": entry, "reservation": result["reservation"]})
+        if slot is not None and not slot:
+            del self._slots[(restaurant_id, date, time)]
+        if promoted or dropped:
+            self._save()
+        return promoted
+
+    def apply_remote_event(self, event):
+        """
+        Mirror a waitlist change made by another process sharing the event bus
+
+        Only the in-memory queues change; the process that made the change
+        has already written the shared file.
+        """
+        entry = event["payload"]["entry"]
+        key = (int(entry["restaurant_id"]), entry["date"], entry["time"])
+        if event["topic"] == WAITLIST_JOINED:
+            if entry["id"] not in self._entries:
+                self._add(dict(entry, restaurant_id=key[0]))
+            return
+        if self._entries.pop(entry["id"], None) is None:
+            return
+        slot = self._slots.get(key)
+        if slot is not None:
+            slot.remove(entry["id"])
+            if not slot:
+                del self._slots[key]
+
+    def _on_reservation_change(self, event):
+        # The process that made the change does the promotion
+        if event["origin"] != self.db.events.node_id:
+            return
+        payload = event["payload"]
+        freed = payload.get("previous") or payload["reservation"]
+        if event["topic"] == RESERVATION_MODIFIED:
+            current = payload["reservation"]
+            moved = any(freed[k] != current[k] for k in ("restaurant_id", "date", "time"))
+            if not moved and current["party_size"] >= freed["party_size"]:
+                return
+        self.promote(freed["restaurant_id"], freed["date"], freed["time"], freed_at=event["timestamp"])
+
+    def _on_catalog_reloaded(self, event):
+        # Capacities or opening hours may have changed
+        for restaurant_id, date, time in list(self._slots):
+            self.promote(restaurant_id, date, time, freed_at=event["timestamp"])
@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from openai.types.chat import ChatCompletion  # noqa: E402
+
+from database import RestaurantDatabase  # noqa: E402
+
+
+def make_reservation(reservation_id, email, restaurant_id=5, date="2030-06-25", time="19:00", party_size=2):
+    return {
+        "id": reservation_id, "customer_name": email.split("@")[0], "customer_email": email,
+        "restaurant_id": restaurant_id, "restaurant_name": "Mumbai Masala", "date": date, "time": time,
+        "party_size": party_size, "special_requests": "", "created_at": "2030-01-01 12:00:00",
+    }
+
+
+def fill_slot(db, restaurant_id, date, time, email="filler@example.com"):
+    """Book every free seat of a slot and return the reservation"""
+    seats = db.get_available_tables(restaurant_id, date, time, 1)["available_seats"]
+    result = db.create_reservation("Filler", email, restaurant_id, date, time, seats)
+    assert result["success"], result
+    return result["reservation"]
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Scratch data directory with the real catalog and two customers' reservations"""
+    shutil.copy(os.path.join(ROOT, "data", "restaurants.csv"), tmp_path)
+    reservations = [
+        make_reservation("RES-20300101120000-001", "alice@example.com"),
+        make_reservation("RES-20300101120000-002", "bob@example.com", restaurant_id=1),
+    ]
+    with open(tmp_path / "reservations.json", "w") as f:
+        json.dump(reservations, f)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def db(data_dir):
+    return RestaurantDatabase(data_dir)
+
+
+class StubEndpoint:
+    model = "stub-model"
+
+
+class StubLLM:
+    """Stands in for LLMClientPool: answers every completion with plain text and records the calls"""
+
+    primary_model = "stub-model"
+
+    def __init__(self, reply="Reply from the model"):
+        self.reply = reply
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        response = ChatCompletion.model_validate({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": self.primary_model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": self.reply}}],
+        })
+        return response, StubEndpoint()
+
+
+@pytest.fixture
+def stub_llm():
+    return StubLLM()
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from api_server import create_app
+from auth import customer_token, verify_customer_token
+from conftest import fill_slot
+from llm_agent import LLMAgent
+
+SECRET = "test-secret"
+
+
+def bearer(email):
+    return {"Authorization": f"Bearer {customer_token(email, SECRET)}"}
+
+
+def run(db, scenario, agent_factory=None):
+    async def main():
+        client = TestClient(TestServer(create_app(db, agent_factory=agent_factory, auth_secret=SECRET)))
+        await client.start_server()
+        try:
+            return await scenario(client)
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def test_tokens_verify_only_with_the_right_secret():
+    token = customer_token("Alice@Example.com", SECRET)
+    assert verify_customer_token(token, SECRET) == "alice@example.com"
+    assert verify_customer_token(token, "other") is None
+    assert verify_customer_token(token.replace("alice", "bob"), SECRET) is None
+    assert verify_customer_token(token, None) is None
+
+
+def test_listing_is_limited_to_the_caller(db):
+    async def scenario(client):
+        anonymous = await client.get("/reservations", params={"email": "alice@example.com"})
+        other = await client.get("/reservations", params={"email": "alice@example.com"},
+                                 headers=bearer("bob@example.com"))
+        own = await client.get("/reservations", headers=bearer("alice@example.com"))
+        return anonymous.status, other.status, own.status, await own.json()
+
+    anonymous, other, own, body = run(db, scenario)
+    assert (anonymous, other, own) == (401, 403, 200)
+    assert [r["id"] for r in body["reservations"]] == ["RES-20300101120000-001"]
+
+
+def test_only_the_owner_can_read_change_or_cancel(db):
+    reservation = "/reservations/RES-20300101120000-001"
+
+    async def scenario(client):
+        statuses = [
+            (await client.get(reservation)).status,
+            (await client.get(reservation, headers=bearer("bob@example.com"))).status,
+            (await client.patch(reservation, json={"party_size": 4}, headers=bearer("bob@example.com"))).status,
+            (await client.delete(reservation, headers=bearer("bob@example.com"))).status,
+        ]
+        batch = await client.post("/batch", headers=bearer("bob@example.com"), json={"requests": [
+            {"op": "cancel_reservation", "args": {"reservation_id": "RES-20300101120000-001"}},
+        ]})
+        statuses.append((await batch.json())["results"][0]["status"])
+        statuses.append((await client.delete(reservation, headers=bearer("alice@example.com"))).status)
+        return statuses
+
+    assert run(db, scenario) == [401, 404, 404, 404, 404, 200]
+    assert db.get_reservation("RES-20300101120000-001") is None
+
+
+def test_leaving_the_waitlist_needs_the_owner(db):
+    fill_slot(db, 5, "2030-07-01", "19:00")
+    joined = db.join_waitlist("Alice", "alice@example.com", 5, "2030-07-01", "19:00", 2)
+    assert joined["success"], joined
+
+    async def scenario(client):
+        path = f"/waitlist/{joined['entry']['id']}"
+        return [(await client.delete(path, headers=bearer("bob@example.com"))).status,
+                (await client.delete(path, headers=bearer("alice@example.com"))).status]
+
+    assert run(db, scenario) == [404, 200]
+
+
+def test_chat_builds_cold_sessions_off_the_event_loop(db, stub_llm):
+    factory_threads = []
+
+    def agent_factory(session_id):
+        factory_threads.append(threading.current_thread())
+        return LLMAgent(db, api_key="test", llm_pool=stub_llm, session_id=session_id)
+
+    async def scenario(client):
+        response = await client.post("/chat", json={"session_id": "s1", "message": "hello"})
+        return response.status, await response.json(), threading.current_thread()
+
+    status, body, loop_thread = run(db, scenario, agent_factory)
+    assert status == 200 and body["reply"] == stub_llm.reply
+    assert factory_threads and factory_threads[0] is not loop_thread
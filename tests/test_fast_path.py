@@ -0,0 +1,44 @@
+from llm_agent import LLMAgent
+
+
+def make_agent(db, stub_llm):
+    return LLMAgent(db, api_key="test", llm_pool=stub_llm)
+
+
+def test_reservations_by_email_only_returns_that_customer(db):
+    reservations = db.get_reservations_by_email("ALICE@example.com")
+    assert [r["id"] for r in reservations] == ["RES-20300101120000-001"]
+    assert db.get_reservations_by_email("nobody@example.com") == []
+    assert db.get_reservations_by_email("") == []
+
+
+def test_my_reservations_lists_only_the_signed_in_customer(db, stub_llm):
+    reply = make_agent(db, stub_llm).handle_conversation("show my reservations", customer_email="alice@example.com")
+    assert "RES-20300101120000-001" in reply
+    assert "RES-20300101120000-002" not in reply
+    assert not stub_llm.calls
+
+
+def test_email_typed_in_the_message_is_not_trusted(db, stub_llm):
+    reply = make_agent(db, stub_llm).handle_conversation("show my reservations bob@example.com",
+                                                         customer_email="alice@example.com")
+    assert "RES-20300101120000-002" not in reply
+    assert stub_llm.calls
+
+
+def test_my_reservations_without_a_session_email_goes_to_the_model(db, stub_llm):
+    reply = make_agent(db, stub_llm).handle_conversation("show my reservations")
+    assert reply == stub_llm.reply
+    assert stub_llm.calls
+
+
+def test_cancel_needs_the_owner(db, stub_llm):
+    agent = make_agent(db, stub_llm)
+    agent.handle_conversation("cancel RES-20300101120000-002", customer_email="alice@example.com")
+    assert db.get_reservation("RES-20300101120000-002") is not None
+    assert stub_llm.calls
+
+    reply = make_agent(db, stub_llm).handle_conversation("cancel RES-20300101120000-002",
+                                                         customer_email="bob@example.com")
+    assert "cancelled" in reply
+    assert db.get_reservation("RES-20300101120000-002") is None
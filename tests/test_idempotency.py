@@ -0,0 +1,68 @@
+import threading
+
+from idempotency import KEY_REUSED_MESSAGE
+from llm_agent import build_tool_registry
+
+BOOKING = ("Carol", "carol@example.com", 3, "2030-07-01", "19:00", 2)
+
+
+def test_repeated_booking_key_replays_the_reservation(db):
+    first = db.create_reservation(*BOOKING, idempotency_key="booking-1")
+    second = db.create_reservation(*BOOKING, idempotency_key="booking-1")
+    assert first["success"] and second == first
+    assert len(db.get_reservations_by_email("carol@example.com")) == 1
+
+
+def test_positional_and_keyword_calls_share_a_key(db):
+    first = db.create_reservation(*BOOKING, idempotency_key="booking-1")
+    name, email, restaurant_id, date, time, party_size = BOOKING
+    second = db.create_reservation(customer_name=name, customer_email=email, restaurant_id=restaurant_id,
+                                   date=date, time=time, party_size=party_size, idempotency_key="booking-1")
+    assert second == first
+
+
+def test_reusing_a_key_for_another_request_fails(db):
+    assert db.create_reservation(*BOOKING, idempotency_key="booking-1")["success"]
+    other = db.create_reservation("Carol", "carol@example.com", 3, "2030-07-01", "20:00", 2,
+                                  idempotency_key="booking-1")
+    assert other == {"success": False, "message": KEY_REUSED_MESSAGE}
+    assert len(db.get_reservations_by_email("carol@example.com")) == 1
+
+
+def test_failed_calls_are_not_remembered(db):
+    missing = db.cancel_reservation("RES-20300101120000-999", idempotency_key="cancel-1")
+    assert not missing["success"]
+    # The same key can be used once the request is valid
+    assert db.cancel_reservation("RES-20300101120000-001", idempotency_key="cancel-1")["success"]
+
+
+def test_replayed_cancellation_does_not_fail(db):
+    first = db.cancel_reservation("RES-20300101120000-001", idempotency_key="cancel-1")
+    assert first["success"]
+    assert db.cancel_reservation("RES-20300101120000-001", idempotency_key="cancel-1") == first
+    assert not db.cancel_reservation("RES-20300101120000-001")["success"]
+
+
+def test_concurrent_retries_book_once(db):
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(db.create_reservation(*BOOKING, idempotency_key="booking-1")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({result["reservation"]["id"] for result in results}) == 1
+    assert len(db.get_reservations_by_email("carol@example.com")) == 1
+
+
+def test_dispatch_passes_keys_only_to_idempotent_tools(db):
+    registry = build_tool_registry(db)
+    args = {"customer_name": "Carol", "customer_email": "carol@example.com", "restaurant_id": 3,
+            "date": "2030-07-01", "time": "19:00", "party_size": "2"}
+    first = registry.dispatch("create_reservation", args, "agent:1")
+    assert registry.dispatch("create_reservation", args, "agent:1") == first
+    assert len(db.get_reservations_by_email("carol@example.com")) == 1
+    # A key is never forwarded to handlers that do not take one
+    assert "error" not in registry.dispatch("get_reservation", {"reservation_id": first["reservation"]["id"]}, "agent:1")
@@ -0,0 +1,83 @@
+import httpx
+import openai
+import pytest
+
+from llm_client import CircuitBreaker, Endpoint, LLMClientPool, LLMUnavailableError, _is_retryable
+
+REQUEST = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+
+
+def status_error(code):
+    response = httpx.Response(code, request=REQUEST)
+    return openai.APIStatusError(f"HTTP {code}", response=response, body=None)
+
+
+def endpoint(name, *outcomes, **kwargs):
+    """Endpoint whose requests return or raise the given outcomes in turn"""
+    target = Endpoint("http://llm.test/v1", "stub-model", "test-key", name=name, **kwargs)
+    calls = []
+
+    def create(**request):
+        calls.append(request)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+    target.create = create
+    target.calls = calls
+    return target
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (openai.APIConnectionError(request=REQUEST), True),
+    (openai.APITimeoutError(request=REQUEST), True),
+    (status_error(408), True),
+    (status_error(429), True),
+    (status_error(503), True),
+    (status_error(400), False),
+    (status_error(401), False),
+    (ValueError("bad"), False),
+])
+def test_retryable_errors(error, retryable):
+    assert _is_retryable(error) is retryable
+
+
+def test_breaker_lets_one_trial_through_when_half_open():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release_trial()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_pool_fails_over_on_transient_errors():
+    failing = endpoint("a", openai.APIConnectionError(request=REQUEST))
+    healthy = endpoint("b", "answer")
+    pool = LLMClientPool([failing, healthy], backoff_base=0)
+    assert pool.create(messages=[]) == ("answer", healthy)
+    assert len(failing.calls) == 1
+
+
+def test_client_errors_are_raised_without_retrying_or_opening_the_circuit():
+    rejecting = endpoint("a", status_error(400), failure_threshold=1)
+    pool = LLMClientPool([rejecting, endpoint("b", "answer")], backoff_base=0)
+    with pytest.raises(openai.APIStatusError):
+        pool.create(messages=[])
+    assert len(rejecting.calls) == 1
+    assert rejecting.breaker.state == "closed"
+
+
+def test_local_error_frees_the_half_open_trial():
+    flaky = endpoint("a", openai.APIConnectionError(request=REQUEST), ValueError("bug"), "answer",
+                     failure_threshold=1, reset_timeout=0)
+    pool = LLMClientPool([flaky], max_attempts=1, backoff_base=0)
+    with pytest.raises(LLMUnavailableError):
+        pool.create(messages=[])
+    with pytest.raises(ValueError):
+        pool.create(messages=[])
+    assert pool.create(messages=[]) == ("answer", flaky)
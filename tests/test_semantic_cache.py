@@ -0,0 +1,54 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from intent import SlotExtractor
+from semantic_cache import SemanticCache
+
+TODAY = datetime(2030, 6, 20)
+
+
+@pytest.fixture
+def extract(db):
+    extractor = SlotExtractor(db.catalog.by_id.values())
+    return lambda message: extractor.extract(message, today=TODAY)
+
+
+def plan(name, **arguments):
+    return [(name, json.dumps(arguments))]
+
+
+def test_slot_values_follow_the_new_message(extract):
+    cache = SemanticCache()
+    assert cache.store(extract("Punjabi restaurants in Hauz Khas"),
+                       plan("search_restaurants", cuisine="Punjabi", location="Hauz Khas"))
+    calls = cache.lookup(extract("Bengali restaurants in Connaught Place"))
+    assert calls == [{"name": "search_restaurants",
+                      "arguments": {"cuisine": "Bengali", "location": "Connaught Place"}}]
+
+
+def test_equal_values_are_not_bound_to_other_slots(extract):
+    cache = SemanticCache()
+    cache.store(extract("North Indian restaurants for 4 with rating above 4"),
+                plan("search_restaurants", cuisine="North Indian", min_capacity=4, min_rating=4))
+
+    calls = cache.lookup(extract("North Indian restaurants for 2 with rating above 4"))
+    assert calls[0]["arguments"] == {"cuisine": "North Indian", "min_capacity": 2, "min_rating": 4}
+
+
+def test_values_not_taken_from_slots_only_match_identical_wording(extract):
+    # Loose enough that the reworded message below would be a fuzzy hit
+    cache = SemanticCache(similarity_threshold=0.8)
+    cache.store(extract("Punjabi restaurants in Hauz Khas that are highly rated"),
+                plan("search_restaurants", cuisine="Punjabi", location="Hauz Khas", min_rating=4.5))
+    assert cache.lookup(extract("Punjabi restaurants in Hauz Khas that are really highly rated")) is None
+    assert cache.lookup(extract("Bengali restaurants in Hauz Khas that are highly rated"))[0]["arguments"] \
+        == {"cuisine": "Bengali", "location": "Hauz Khas", "min_rating": 4.5}
+
+
+def test_bookings_are_never_cached(extract):
+    cache = SemanticCache()
+    assert not cache.store(extract("book Punjabi for 2 tomorrow at 7pm"),
+                           plan("create_reservation", party_size=2))
+    assert len(cache) == 0
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from catalog import shard_of
+from events import RESERVATION_MODIFIED
+from intent import RESERVATION_ID_PATTERN
+from sharding import ShardedDatabase
+
+
+@pytest.fixture
+def sharded(data_dir):
+    db = ShardedDatabase(data_dir, shards=2)
+    yield db
+    db.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for shard events"
+        time.sleep(0.01)
+
+
+def test_reservation_ids_are_unique_across_shards(sharded):
+    ids = []
+    for i in range(60):
+        result = sharded.create_reservation("Guest", f"guest{i}@example.com", 1 + i % 2, "2030-08-01", "19:00", 1)
+        assert result["success"], result
+        ids.append(result["reservation"]["id"])
+    assert len(set(ids)) == len(ids)
+    assert all(RESERVATION_ID_PATTERN.fullmatch(reservation_id) for reservation_id in ids)
+
+
+def test_moving_between_shards_publishes_one_modification(sharded):
+    source, target = 1, 2
+    assert shard_of(source, 2) != shard_of(target, 2)
+    covers = (sharded.popularity.covers(source), sharded.popularity.covers(target))
+    events = []
+    sharded.events.subscribe("reservation.*", events.append)
+    booked = sharded.create_reservation("Guest", "guest@example.com", source, "2030-08-01", "19:00", 2)["reservation"]
+    wait_for(lambda: events)
+    events.clear()
+
+    result = sharded.modify_reservation(booked["id"], restaurant_id=target)
+
+    assert result["success"], result
+    wait_for(lambda: events)
+    time.sleep(0.2)
+    assert [event["topic"] for event in events] == [RESERVATION_MODIFIED]
+    payload = events[0]["payload"]
+    assert payload["previous"]["restaurant_id"] == source
+    assert payload["reservation"]["restaurant_id"] == target
+    assert payload["reservation"]["id"] == booked["id"]
+    assert sharded.get_reservation(booked["id"])["restaurant_id"] == target
+    # Followers of the ledger move the covers instead of counting the booking twice
+    assert (sharded.popularity.covers(source), sharded.popularity.covers(target)) == (covers[0], covers[1] + 2)
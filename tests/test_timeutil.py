@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import pytest
+
+from timeutil import format_time, is_open, parse_date, parse_time
+
+
+@pytest.mark.parametrize("text", ["2030-06-25", "2030-6-5", "2028-02-29"])
+def test_parse_date_matches_strptime(text):
+    assert parse_date(text) == datetime.strptime(text, "%Y-%m-%d").date()
+
+
+@pytest.mark.parametrize("text", ["2030-02-30", "2030-13-01", "25-06-2030", "", "2030-06-25 "])
+def test_parse_date_rejects_what_strptime_rejects(text):
+    with pytest.raises(ValueError):
+        parse_date(text)
+
+
+@pytest.mark.parametrize("text, minute", [("00:00", 0), ("19:30", 1170), ("23:59", 1439), ("9:05", 545)])
+def test_parse_time(text, minute):
+    assert parse_time(text) == minute
+    assert format_time(minute) == datetime.strptime(text, "%H:%M").strftime("%H:%M")
+
+
+@pytest.mark.parametrize("text", ["24:00", "12:60", "noon", "12-30"])
+def test_parse_time_rejects_invalid_times(text):
+    with pytest.raises(ValueError):
+        parse_time(text)
+
+
+def test_is_open_includes_both_ends():
+    opening, closing = parse_time("11:00"), parse_time("23:00")
+    assert is_open(opening, closing, parse_time("11:00"))
+    assert is_open(opening, closing, parse_time("23:00"))
+    assert not is_open(opening, closing, parse_time("10:59"))
+
+
+def test_is_open_past_midnight():
+    opening, closing = parse_time("18:00"), parse_time("02:00")
+    assert is_open(opening, closing, parse_time("23:30"))
+    assert is_open(opening, closing, parse_time("01:00"))
+    assert not is_open(opening, closing, parse_time("12:00"))
@@ -0,0 +1,48 @@
+import pytest
+
+from llm_agent import TOOLS
+from tool_registry import ToolRegistry, ToolValidationError
+
+
+@pytest.fixture
+def registry():
+    return ToolRegistry(TOOLS)
+
+
+def test_empty_optional_numbers_and_formats_are_dropped(registry):
+    assert registry.validate("search_restaurants", {"cuisine": "Punjabi", "min_rating": "", "min_capacity": " "}) \
+        == {"cuisine": "Punjabi"}
+    args = registry.validate("recommend_restaurants", {"location": "Hauz Khas", "date": "", "time": ""})
+    assert "date" not in args and "time" not in args
+
+
+def test_empty_plain_strings_are_passed_through(registry):
+    args = registry.validate("modify_reservation", {"reservation_id": "RES-1", "special_requests": ""})
+    assert args == {"reservation_id": "RES-1", "special_requests": ""}
+
+
+def test_empty_string_does_not_satisfy_a_required_argument(registry):
+    with pytest.raises(ToolValidationError) as error:
+        registry.validate("get_reservation", {"reservation_id": ""})
+    assert error.value.errors == {"reservation_id": "is required"}
+
+
+@pytest.mark.parametrize("value, expected", [(4, 4), (4.0, 4), ("4", 4), (" 4 people", 4), ("4.0", 4)])
+def test_integers_are_coerced(registry, value, expected):
+    args = registry.validate("check_availability",
+                             {"restaurant_id": 1, "date": "2030-06-25", "time": "19:00", "party_size": value})
+    assert args["party_size"] == expected
+
+
+@pytest.mark.parametrize("value", ["4.9", 4.9, "four", True])
+def test_non_integers_are_rejected(registry, value):
+    with pytest.raises(ToolValidationError) as error:
+        registry.validate("check_availability",
+                          {"restaurant_id": 1, "date": "2030-06-25", "time": "19:00", "party_size": value})
+    assert "party_size" in error.value.errors
+
+
+def test_dates_and_times_are_normalized(registry):
+    args = registry.validate("check_availability",
+                             {"restaurant_id": "1", "date": "June 25, 2030", "time": "7 PM", "party_size": "2"})
+    assert args == {"restaurant_id": 1, "date": "2030-06-25", "time": "19:00", "party_size": 2}
@@ -0,0 +1,105 @@
+import json
+import time
+
+import pytest
+
+from conftest import fill_slot
+from database import RestaurantDatabase
+from events import EventBus, connect_event_socket
+from waitlist import WAITLIST_DROPPED, WAITLIST_PROMOTED
+
+SLOT = (5, "2030-07-01", "19:00")
+
+
+@pytest.fixture
+def full_slot(db):
+    return fill_slot(db, *SLOT)
+
+
+def join(db, email, party_size):
+    result = db.join_waitlist(email.split("@")[0], email, *SLOT, party_size)
+    assert result["success"], result
+    return result["entry"]
+
+
+def saved_ids(db):
+    with open(db.waitlist.path) as f:
+        return [entry["id"] for entry in json.load(f)]
+
+
+def test_cancellation_promotes_the_largest_party_that_fits(db, full_slot):
+    small = join(db, "small@example.com", 2)
+    large = join(db, "large@example.com", 6)
+    promoted = []
+    db.events.subscribe(WAITLIST_PROMOTED, promoted.append)
+
+    db.modify_reservation(full_slot["id"], party_size=full_slot["party_size"] - 6)
+
+    assert [event["payload"]["entry"]["id"] for event in promoted] == [large["id"]]
+    assert [r["customer_email"] for r in db.get_reservations_by_email("large@example.com")] == ["large@example.com"]
+    assert saved_ids(db) == [small["id"]]
+
+
+def test_failed_booking_keeps_the_party_queued(db, full_slot, monkeypatch):
+    entry = join(db, "alice@example.com", 2)
+    monkeypatch.setattr(db, "create_reservation",
+                        lambda *args, **kwargs: {"success": False, "message": "Not enough seats available"})
+
+    db.cancel_reservation(full_slot["id"])
+
+    assert db.get_waitlist_entry(entry["id"]) is not None
+    assert saved_ids(db) == [entry["id"]]
+
+    monkeypatch.undo()
+    assert [r["customer_email"] for r in db.waitlist.promote(*SLOT)] == ["alice@example.com"]
+    assert db.get_waitlist_entry(entry["id"]) is None
+
+
+def test_party_that_cannot_be_seated_is_dropped_persisted_and_announced(db, full_slot, monkeypatch):
+    entry = join(db, "alice@example.com", 2)
+    dropped = []
+    db.events.subscribe(WAITLIST_DROPPED, dropped.append)
+    monkeypatch.setattr(db, "create_reservation",
+                        lambda *args, **kwargs: {"success": False, "message": "Restaurant is closed at that time"})
+
+    db.cancel_reservation(full_slot["id"])
+
+    assert db.get_waitlist_entry(entry["id"]) is None
+    assert saved_ids(db) == []
+    assert dropped[0]["payload"]["entry"]["id"] == entry["id"]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the other process"
+        time.sleep(0.01)
+
+
+def test_waitlists_stay_in_step_across_processes(data_dir, tmp_path):
+    # Two databases on the same files, bridged like the Streamlit and API processes
+    first = RestaurantDatabase(data_dir, events=EventBus("first"))
+    second = RestaurantDatabase(data_dir, events=EventBus("second"))
+    server = connect_event_socket(first.events, str(tmp_path / "events.sock"))
+    client = connect_event_socket(second.events, str(tmp_path / "events.sock"))
+    try:
+        filler = fill_slot(first, *SLOT)
+        wait_for(lambda: second.get_reservation(filler["id"]) is not None)
+
+        joined = join(second, "carol@example.com", 2)
+        wait_for(lambda: first.get_waitlist_entry(joined["id"]) is not None)
+        left = join(second, "dave@example.com", 2)
+        wait_for(lambda: first.get_waitlist_entry(left["id"]) is not None)
+        second.leave_waitlist(left["id"])
+        wait_for(lambda: first.get_waitlist_entry(left["id"]) is None)
+
+        # A cancellation in the first process books the party that joined in the second
+        first.cancel_reservation(filler["id"])
+        assert [r["customer_email"] for r in first.get_reservations_by_email("carol@example.com")] \
+            == ["carol@example.com"]
+        wait_for(lambda: second.get_waitlist_entry(joined["id"]) is None)
+        assert len(second.waitlist) == 0
+        assert saved_ids(first) == []
+    finally:
+        client.close()
+        server.close()